@@ -0,0 +1,83 @@
+"""
+Access Log Tests for Wedding Invitation App - Queued Structured Logging Focus
+Drives the backend in-process with ACCESS_LOG_FILE set and checks:
+  - every request writes exactly one JSON record with its route, status and latency
+  - on shutdown the queue listener is drained and stopped, later records still reach the file
+
+Needs MongoDB at MONGO_URL (default mongodb://localhost:27017).
+
+Usage:
+    python -m pytest access_log_test.py
+"""
+
+import json
+import logging
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+@pytest.fixture(scope="module")
+def access_log(tmp_path_factory):
+    return tmp_path_factory.mktemp("logs") / "access.log"
+
+@pytest.fixture(scope="module")
+def backend_env(access_log):
+    return {"ACCESS_LOG_FILE": access_log, "ACCESS_LOG_PUBLIC_SAMPLE_RATE": "1"}
+
+def read_records(access_log):
+    return [json.loads(line) for line in access_log.read_text().splitlines() if line.strip()]
+
+def make_requests(tc):
+    """A mix of routes and outcomes; returns (method, route, status) per request sent"""
+    sent = []
+    response = tc.post("/api/auth/register", json={
+        "email": f"log_{uuid.uuid4().hex[:8]}@example.com", "password": "testpassword123", "name": "Log"
+    })
+    sent.append(("POST", "/api/auth/register", response.status_code))
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    for method, url, route, kwargs in (
+        ("GET", "/api/", "/api/", {}),
+        ("GET", "/api/invitations", "/api/invitations", {"headers": headers}),
+        ("GET", "/api/invitations", "/api/invitations", {}),
+        ("GET", f"/api/public/invitation/{uuid.uuid4()}", "/api/public/invitation/{invitation_id}", {}),
+        ("GET", "/api/tidak-ada", "/api/tidak-ada", {}),
+    ):
+        response = tc.request(method, url, **kwargs)
+        sent.append((method, route, response.status_code))
+    return sent
+
+@pytest.fixture(scope="module")
+def app_run(server, access_log):
+    """One app lifetime: the requests sent, the records written meanwhile and the listener used"""
+    with TestClient(server.app) as tc:
+        listener = server.log_queue_handler.listener
+        sent = make_requests(tc)
+        # Wait for the listener thread to write everything queued so far
+        listener.queue.join()
+        records = read_records(access_log)
+    # Leaving the client ran the shutdown hooks, which drain the queue to the file
+    return sent, records, listener
+
+def test_one_record_per_request(app_run):
+    """Each request gets exactly one record carrying its route, status and latency"""
+    sent, records, _ = app_run
+
+    assert [(r["method"], r["route"], r["status"]) for r in records] == sent
+    for record in records:
+        assert isinstance(record["latency_ms"], (int, float)) and record["latency_ms"] > 0, f"Missing latency in {record}"
+        assert record["ts"] and record["sample_rate"] == 1, f"Unexpected record {record}"
+    assert records[4]["invitation_id"] is not None, "Public route record lacks the invitation id"
+
+def test_listener_stopped_on_shutdown(server, access_log, app_run):
+    """Shutdown drained and stopped the listener; later records are written directly"""
+    _, _, listener = app_run
+    assert server.log_queue_handler.listener is None and listener._thread is None, "Queue listener still running after shutdown"
+    assert server.log_queue_handler not in logging.getLogger().handlers, "Queue handler still installed after shutdown"
+
+    records_before = len(read_records(access_log))
+    logging.getLogger("access").info({"method": "GET", "route": "/after-shutdown", "status": 200})
+    records = read_records(access_log)
+    assert len(records) == records_before + 1 and records[-1]["route"] == "/after-shutdown", \
+        f"Record after shutdown not written: {records[-1:]}"
@@ -0,0 +1,92 @@
+"""
+Activity Rollup Tests for Wedding Invitation App - Time Series Focus
+Drives the backend in-process and checks:
+  - creating, changing and deleting RSVPs/messages applies the right $inc deltas
+  - a date-only end bound includes the whole end day for hour buckets
+  - rebuilding from raw RSVPs/messages gives the same counters as the live updates
+
+Needs MongoDB at MONGO_URL (default mongodb://localhost:27017).
+
+Usage:
+    python -m pytest activity_rollup_test.py
+"""
+
+from datetime import datetime, timezone
+
+import pytest
+
+COUNTERS = ("total_rsvp", "attending", "not_attending", "uncertain", "total_guests", "total_messages")
+
+@pytest.fixture(scope="module")
+def owner(register):
+    return register("rollup")
+
+@pytest.fixture(scope="module")
+def invitation_id(create_invitation, owner):
+    return create_invitation(owner)["id"]
+
+def totals(tc, headers, invitation_id, granularity="day", **bounds):
+    response = tc.get(f"/api/invitations/{invitation_id}/timeseries",
+                      params={"granularity": granularity, **bounds}, headers=headers)
+    points = response.json()["points"]
+    return {counter: sum(point[counter] for point in points) for counter in COUNTERS}
+
+def rsvp(tc, invitation_id, name, attendance, guest_count=1):
+    return tc.post(f"/api/public/rsvp/{invitation_id}", json={
+        "guest_name": name, "phone": f"08{abs(hash(name)) % 10**9}", "attendance": attendance, "guest_count": guest_count
+    }).json()
+
+def test_live_deltas(client, owner, invitation_id):
+    """Create, change and delete each move exactly the counters they should"""
+    expected = dict.fromkeys(COUNTERS, 0)
+
+    budi = rsvp(client, invitation_id, "Budi", "hadir", 3)
+    rsvp(client, invitation_id, "Sari", "tidak_hadir")
+    tono = rsvp(client, invitation_id, "Tono", "belum_pasti")
+    messages = [client.post(f"/api/public/messages/{invitation_id}", json={"guest_name": "Budi", "message": f"Selamat {i}"}).json()
+                for i in range(3)]
+    expected.update(total_rsvp=3, attending=1, not_attending=1, uncertain=1, total_guests=3, total_messages=3)
+    assert totals(client, owner, invitation_id) == expected, "Counters wrong after create"
+
+    # Same answer again is a retry (no change), a changed answer moves the counters
+    rsvp(client, invitation_id, "Budi", "hadir", 3)
+    rsvp(client, invitation_id, "Budi", "hadir", 2)
+    rsvp(client, invitation_id, "Tono", "hadir", 1)
+    expected.update(attending=2, uncertain=0, total_guests=3)
+    assert totals(client, owner, invitation_id) == expected, "Counters wrong after update"
+
+    client.delete(f"/api/rsvps/{budi['id']}", headers=owner)
+    client.delete(f"/api/messages/{messages[0]['id']}", headers=owner)
+    expected.update(total_rsvp=2, attending=1, total_guests=1, total_messages=2)
+    assert totals(client, owner, invitation_id) == expected, "Counters wrong after delete"
+    assert rsvp(client, invitation_id, "Tono", "hadir", 1)["id"] == tono["id"], "Changed answer created a second RSVP"
+
+def test_bucket_bounds(client, owner, invitation_id):
+    """Date-only bounds cover whole days for hour buckets; invalid dates are a 400"""
+    today = datetime.now(timezone.utc).date().isoformat()
+    day = totals(client, owner, invitation_id)
+    hour = totals(client, owner, invitation_id, "hour", start=today, end=today)
+    assert hour["total_rsvp"] and hour == day, f"Hour buckets for {today}..{today} {hour} differ from day totals {day}"
+    assert totals(client, owner, invitation_id, "day", start=today, end=today) == day, "Day buckets with date-only bounds miss data"
+    assert not totals(client, owner, invitation_id, "hour", end="2000-01-01")["total_rsvp"], "End bound in the past still returned data"
+
+    response = client.get(f"/api/invitations/{invitation_id}/timeseries", params={"end": "kemarin"}, headers=owner)
+    assert response.status_code == 400
+
+def test_rebuild_matches_live(client, owner, invitation_id):
+    """Rebuilding from raw data reproduces the live hour and day buckets"""
+    def snapshot():
+        points = {}
+        for granularity in ("hour", "day"):
+            response = client.get(f"/api/invitations/{invitation_id}/timeseries",
+                                  params={"granularity": granularity}, headers=owner)
+            for point in response.json()["points"]:
+                # Live updates leave emptied buckets at zero, the rebuild omits them
+                if any(point[counter] for counter in COUNTERS):
+                    points[(granularity, point["bucket"])] = point
+        return points
+
+    live = snapshot()
+    response = client.post(f"/api/invitations/{invitation_id}/timeseries/rebuild", headers=owner)
+    assert response.status_code == 200, f"Rebuild HTTP {response.status_code}: {response.text}"
+    assert snapshot() == live
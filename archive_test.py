@@ -0,0 +1,160 @@
+"""
+Archive Tests for Wedding Invitation App - Post-Event Archival Focus
+Drives the backend in-process and checks:
+  - archiving moves past invitations with their RSVPs and messages out of the hot collections,
+    in batches, and leaves upcoming invitations alone
+  - invitations being archived refuse new guest RSVPs/messages, rows written or changed after the copy
+    are archived by a later pass, and an invitation still changing is left for the next run
+  - restoring brings back exactly what was archived (invitation, RSVPs, messages, stats, public page)
+
+Needs MongoDB at MONGO_URL (default mongodb://localhost:27017).
+
+Usage:
+    python -m pytest archive_test.py
+"""
+
+import uuid
+
+import pytest
+
+@pytest.fixture(scope="module")
+def owner(register):
+    return register("archive")
+
+@pytest.fixture(scope="module")
+def create_with_guests(client, create_invitation):
+    """Invitation for one event date with `guests` RSVPs and as many messages"""
+    def create_with_guests(headers, event_date, guests):
+        invitation_id = create_invitation(headers, event_date)["id"]
+        for i in range(guests):
+            client.post(f"/api/public/rsvp/{invitation_id}", json={
+                "guest_name": f"Tamu {i}", "phone": f"0812{i:06d}", "attendance": "hadir" if i % 2 else "tidak_hadir",
+                "guest_count": 2
+            })
+            client.post(f"/api/public/messages/{invitation_id}", json={"guest_name": f"Tamu {i}", "message": f"Selamat {i}"})
+        return invitation_id
+    return create_with_guests
+
+def snapshot(tc, headers, invitation_id):
+    """Everything the owner and guests can see of one invitation"""
+    by_id = lambda rows: sorted(rows, key=lambda row: row["id"])
+    invitation = tc.get(f"/api/invitations/{invitation_id}", headers=headers).json()
+    return {
+        "invitation": {k: v for k, v in invitation.items() if k not in ("updated_at", "restored_at")},
+        "rsvps": by_id(tc.get(f"/api/invitations/{invitation_id}/rsvps", headers=headers).json()),
+        "messages": by_id(tc.get(f"/api/invitations/{invitation_id}/messages", headers=headers).json()),
+        "stats": tc.get(f"/api/invitations/{invitation_id}/stats", headers=headers).json(),
+        "public_messages": by_id(tc.get(f"/api/public/messages/{invitation_id}").json()),
+    }
+
+def hot_rows(tc, server, invitation_id):
+    return (tc.portal.call(server.db.rsvps.count_documents, {"invitation_id": invitation_id})
+            + tc.portal.call(server.db.messages.count_documents, {"invitation_id": invitation_id}))
+
+@pytest.fixture(scope="module")
+def past_ids(owner, create_with_guests):
+    return [create_with_guests(owner, "2020-01-01", guests) for guests in (0, 2, 3, 5, 1)]
+
+@pytest.fixture(scope="module")
+def upcoming_id(owner, create_with_guests):
+    return create_with_guests(owner, "2099-01-01", guests=2)
+
+@pytest.fixture(scope="module")
+def before(client, owner, past_ids, upcoming_id):
+    """What the past invitations looked like before archiving"""
+    return {invitation_id: snapshot(client, owner, invitation_id) for invitation_id in past_ids}
+
+def test_archive_moves_past_invitations(client, server, owner, past_ids, upcoming_id, before):
+    """Past invitations leave the hot collections in batches; upcoming ones stay"""
+    archived = client.portal.call(server.archive_past_invitations, 180, 2)
+    assert archived == len(past_ids)
+
+    for invitation_id in past_ids:
+        assert client.get(f"/api/public/invitation/{invitation_id}").status_code == 404, f"{invitation_id} still public after archiving"
+        assert not hot_rows(client, server, invitation_id), f"RSVPs/messages left behind for {invitation_id}"
+    assert client.get(f"/api/invitations/{upcoming_id}", headers=owner).status_code == 200, "Upcoming invitation was archived"
+
+    listing = {a["id"]: a for a in client.get("/api/archives", headers=owner).json()}
+    for invitation_id in past_ids:
+        expected = (len(before[invitation_id]["rsvps"]), len(before[invitation_id]["messages"]))
+        assert (listing[invitation_id]["rsvp_count"], listing[invitation_id]["message_count"]) == expected
+
+def test_restore_round_trip(client, owner, past_ids, before):
+    """Restoring gives back exactly what the owner and guests saw before archiving"""
+    for invitation_id in past_ids:
+        response = client.post(f"/api/archives/{invitation_id}/restore", headers=owner)
+        assert response.status_code == 200, f"Restore HTTP {response.status_code}: {response.text}"
+        after = snapshot(client, owner, invitation_id)
+        for part in before[invitation_id]:
+            assert after[part] == before[invitation_id][part], f"{part} of {invitation_id} differs after restore"
+
+    assert not client.get("/api/archives", headers=owner).json(), "Restored invitations still listed as archived"
+    assert client.post(f"/api/archives/{past_ids[0]}/restore", headers=owner).status_code == 404
+
+def test_writes_during_archiving(client, server, owner, create_with_guests):
+    """A marked invitation refuses guest writes; rows written or changed after the copy are archived too"""
+    invitation_id = create_with_guests(owner, "2020-02-02", guests=1)
+    client.portal.call(server.db.invitations.update_one, {"id": invitation_id},
+                       {"$set": {"archiving_at": "2030-01-01T00:00:00+00:00"}})
+    rsvp = client.post(f"/api/public/rsvp/{invitation_id}", json={
+        "guest_name": "Telat", "phone": "0899", "attendance": "hadir", "guest_count": 1
+    })
+    message = client.post(f"/api/public/messages/{invitation_id}", json={"guest_name": "Telat", "message": "Hai"})
+    assert (rsvp.status_code, message.status_code) == (404, 404)
+
+    # Writes that passed their check just before the mark land after the job read the rows
+    original_pack = server.pack_archive
+    calls = []
+    def pack_then_late_writes(invitation, rsvps, messages):
+        # Runs in a worker thread between the job's reads and its deletes
+        if not calls:
+            client.portal.call(server.db.messages.insert_one, {
+                "id": "late-message", "invitation_id": invitation_id, "owner_id": invitation["user_id"],
+                "guest_name": "Telat", "message": "Masih sempat", "reply": "", "status": "approved",
+                "created_at": "2030-01-01T00:00:00+00:00"
+            })
+            client.portal.call(server.db.rsvps.update_one, {"invitation_id": invitation_id},
+                               {"$set": {"attendance": "hadir", "guest_count": 5}})
+        calls.append(invitation["id"])
+        return original_pack(invitation, rsvps, messages)
+    server.pack_archive = pack_then_late_writes
+    try:
+        archived = client.portal.call(server.archive_past_invitations, 180, 10)
+    finally:
+        server.pack_archive = original_pack
+
+    assert (archived, len(calls)) == (1, 2), "Expected one invitation archived in 2 passes"
+    assert not hot_rows(client, server, invitation_id), "Rows written during the run were left behind without their invitation"
+
+    client.post(f"/api/archives/{invitation_id}/restore", headers=owner)
+    messages = client.get(f"/api/invitations/{invitation_id}/messages", headers=owner).json()
+    assert sorted(m["guest_name"] for m in messages) == ["Tamu 0", "Telat"], "Restore lost messages"
+    rsvps = client.get(f"/api/invitations/{invitation_id}/rsvps", headers=owner).json()
+    assert [(r["attendance"], r["guest_count"]) for r in rsvps] == [("hadir", 5)], "RSVP change made during archiving was lost"
+    client.delete(f"/api/invitations/{invitation_id}", headers=owner)
+
+def test_busy_invitation_postponed(client, server, owner, create_with_guests):
+    """An invitation still changing after every pass is kept and finished by the next run"""
+    invitation_id = create_with_guests(owner, "2020-03-03", guests=2)
+    original_pack = server.pack_archive
+    def pack_then_new_message(invitation, rsvps, messages):
+        client.portal.call(server.db.messages.insert_one, {
+            "id": str(uuid.uuid4()), "invitation_id": invitation_id, "owner_id": invitation["user_id"],
+            "guest_name": "Ramai", "message": "Lagi", "reply": "", "status": "approved",
+            "created_at": "2030-01-01T00:00:00+00:00"
+        })
+        return original_pack(invitation, rsvps, messages)
+    server.pack_archive = pack_then_new_message
+    try:
+        archived = client.portal.call(server.archive_past_invitations, 180, 10)
+    finally:
+        server.pack_archive = original_pack
+
+    assert not archived, "Busy invitation archived"
+    assert client.portal.call(server.db.invitations.count_documents, {"id": invitation_id}) == 1, "Busy invitation deleted"
+    assert client.portal.call(server.archive_past_invitations, 180, 10) == 1, "Next run did not finish the postponed invitation"
+
+    client.post(f"/api/archives/{invitation_id}/restore", headers=owner)
+    messages = client.get(f"/api/invitations/{invitation_id}/messages", headers=owner).json()
+    assert len(messages) == 2 + server.ARCHIVE_MAX_PASSES
+    client.delete(f"/api/invitations/{invitation_id}", headers=owner)
@@ -0,0 +1,67 @@
+"""
+Batch jobs for the Wedding Invitation backend.
+
+Usage (from the backend directory):
+    python jobs.py rebuild-rollups [--invitation-id ID]
+    python jobs.py backfill-owners
+    python jobs.py dedupe-rsvps
+    python jobs.py archive-invitations [--retention-days N] [--batch-size N]
+    python jobs.py restore-invitation ID
+    python jobs.py clear-style-defaults
+"""
+import asyncio
+from typing import Optional
+
+import typer
+
+import server
+
+cli = typer.Typer(help="Wedding Invitation batch jobs")
+
+@cli.callback()
+def main():
+    """Wedding Invitation batch jobs"""
+
+@cli.command("rebuild-rollups")
+def rebuild_rollups(invitation_id: Optional[str] = typer.Option(None, help="Only rebuild this invitation")):
+    """Recompute RSVP/message time-series rollups from raw documents"""
+    count = asyncio.run(server.rebuild_activity_rollups(invitation_id))
+    typer.echo(f"Rebuilt rollups for {count} invitation(s)")
+
+@cli.command("backfill-owners")
+def backfill_owners():
+    """Store the invitation owner on RSVPs and messages created before owner_id existed"""
+    count = asyncio.run(server.backfill_owner_ids())
+    typer.echo(f"Backfilled owner_id on {count} document(s)")
+
+@cli.command("dedupe-rsvps")
+def dedupe_rsvps():
+    """Key existing RSVPs per guest and drop older duplicate submissions"""
+    count = asyncio.run(server.dedupe_rsvps())
+    typer.echo(f"Removed {count} duplicate RSVP(s)")
+
+@cli.command("archive-invitations")
+def archive_invitations(
+    retention_days: int = typer.Option(server.ARCHIVE_RETENTION_DAYS, help="Archive invitations whose last event is older than this"),
+    batch_size: int = typer.Option(server.ARCHIVE_BATCH_SIZE, help="Invitations moved per batch")
+):
+    """Move past invitations with their RSVPs and messages into compressed archives"""
+    count = asyncio.run(server.archive_past_invitations(retention_days, batch_size))
+    typer.echo(f"Archived {count} invitation(s)")
+
+@cli.command("restore-invitation")
+def restore_invitation(invitation_id: str):
+    """Restore an archived invitation with its RSVPs and messages"""
+    if not asyncio.run(server.restore_archived_invitation(invitation_id)):
+        typer.echo(f"No archive found for {invitation_id}", err=True)
+        raise typer.Exit(1)
+    typer.echo(f"Restored {invitation_id}")
+
+@cli.command("clear-style-defaults")
+def clear_style_defaults():
+    """Let invitations that still carry the old default colors/fonts follow their theme"""
+    count = asyncio.run(server.clear_legacy_style_defaults())
+    typer.echo(f"Cleared default styles on {count} invitation(s)/template(s)")
+
+if __name__ == "__main__":
+    cli()
@@ -1,19 +1,63 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Query, Request, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import Response, JSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne, ReplaceOne, DeleteOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError, BulkWriteError, ConnectionFailure, PyMongoError
+from pymongo.read_preferences import Primary, SecondaryPreferred
+from pymongo import monitoring
+import pymongo
 import os
 import logging
+import logging.handlers
+import atexit
+import queue
+import random
+import socket
+import sys
+import threading
+from contextvars import ContextVar
+from collections import OrderedDict, Counter, deque
 from pathlib import Path
-from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Literal
+from pydantic import BaseModel, Field, EmailStr, ValidationError, TypeAdapter
+from typing import List, Dict, Optional, Literal, get_args
 import uuid
 from datetime import datetime, timezone, timedelta
 import jwt
 import bcrypt
 import shutil
+import asyncio
+import base64
+import io
+import time
+import re
+import math
+import hashlib
+import ipaddress
+import gzip
+import json
+from functools import lru_cache
+from urllib.parse import urlsplit
+import unicodedata
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from PIL import Image, ImageOps, UnidentifiedImageError
+import boto3
+import requests
+import smtplib
+from email.message import EmailMessage
+from botocore.config import Config as BotoConfig
+from botocore.exceptions import ClientError
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -23,10 +67,138 @@ UPLOAD_DIR = ROOT_DIR / "uploads"
 UPLOAD_DIR.mkdir(exist_ok=True)
 MUSIC_DIR = UPLOAD_DIR / "music"
 MUSIC_DIR.mkdir(exist_ok=True)
+IMAGE_DIR = UPLOAD_DIR / "images"
+IMAGE_DIR.mkdir(exist_ok=True)
+
+# Image processing settings
+IMAGE_VARIANT_WIDTHS = [320, 640, 1280, 1920]
+IMAGE_MAX_UPLOAD_BYTES = int(os.environ.get('IMAGE_MAX_UPLOAD_MB', '20')) * 1024 * 1024
+IMAGE_MAX_PIXELS = 50_000_000
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', '2'))
+
+# Upload storage settings ("local" disk under UPLOAD_DIR, or "s3" for any S3-compatible store)
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'local')
+S3_BUCKET = os.environ.get('S3_BUCKET', '')
+S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL') or None
+S3_REGION = os.environ.get('S3_REGION') or None
+S3_PUBLIC_BASE_URL = os.environ.get('S3_PUBLIC_BASE_URL', '')
+MUSIC_MAX_UPLOAD_BYTES = int(os.environ.get('MUSIC_MAX_UPLOAD_MB', '30')) * 1024 * 1024
+PRESIGNED_UPLOAD_EXPIRES_SECONDS = 900
+
+# Message moderation settings
+MODERATION_BLOCKLIST_PATH = Path(os.environ.get('MODERATION_BLOCKLIST_PATH', str(ROOT_DIR / "moderation_blocklist.txt")))
+MODERATION_DEFAULT_ACTION = os.environ.get('MODERATION_DEFAULT_ACTION', 'hold')
+MODERATION_RELOAD_SECONDS = float(os.environ.get('MODERATION_RELOAD_SECONDS', '30'))
+
+# Response compression settings
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
+# Public payloads are re-encoded on every guest write, so favour speed over the last few percent
+PUBLIC_PAYLOAD_BROTLI_QUALITY = int(os.environ.get('PUBLIC_PAYLOAD_BROTLI_QUALITY', '5'))
+PUBLIC_PAYLOAD_GZIP_LEVEL = int(os.environ.get('PUBLIC_PAYLOAD_GZIP_LEVEL', '6'))
+
+# Read routing: guest-facing reads may use secondaries, owner reads stay on the primary
+MONGO_PUBLIC_READ_PREFERENCE = os.environ.get('MONGO_PUBLIC_READ_PREFERENCE', 'secondaryPreferred')
+MONGO_MAX_STALENESS_SECONDS = int(os.environ.get('MONGO_MAX_STALENESS_SECONDS', '90'))
+
+# MongoDB time budgets: all Mongo calls of a request share one deadline (sent as maxTimeMS), per route prefix
+MONGO_PUBLIC_TIME_BUDGET_SECONDS = float(os.environ.get('MONGO_PUBLIC_TIME_BUDGET_SECONDS', '2'))
+MONGO_DEFAULT_TIME_BUDGET_SECONDS = float(os.environ.get('MONGO_DEFAULT_TIME_BUDGET_SECONDS', '5'))
+MONGO_LONG_TIME_BUDGET_SECONDS = float(os.environ.get('MONGO_LONG_TIME_BUDGET_SECONDS', '30'))
+MONGO_ROUTE_TIME_BUDGETS = (
+    ("/api/public/", MONGO_PUBLIC_TIME_BUDGET_SECONDS),
+    ("/api/themes/css/", MONGO_PUBLIC_TIME_BUDGET_SECONDS),
+    # Image processing, bulk creation and restores do real work between Mongo calls
+    ("/api/upload/", MONGO_LONG_TIME_BUDGET_SECONDS),
+    ("/api/templates/", MONGO_LONG_TIME_BUDGET_SECONDS),
+    ("/api/archives/", MONGO_LONG_TIME_BUDGET_SECONDS),
+)
+
+# Circuit breaker: fail fast once too many recent requests hit Mongo timeouts or connection errors
+MONGO_BREAKER_FAILURE_RATIO = float(os.environ.get('MONGO_BREAKER_FAILURE_RATIO', '0.5'))
+MONGO_BREAKER_MIN_REQUESTS = int(os.environ.get('MONGO_BREAKER_MIN_REQUESTS', '10'))
+MONGO_BREAKER_WINDOW_SECONDS = float(os.environ.get('MONGO_BREAKER_WINDOW_SECONDS', '10'))
+MONGO_BREAKER_COOLDOWN_SECONDS = float(os.environ.get('MONGO_BREAKER_COOLDOWN_SECONDS', '5'))
+PUBLIC_STALE_CACHE_SIZE = int(os.environ.get('PUBLIC_STALE_CACHE_SIZE', '2000'))
+
+# Bulk invitation creation from templates
+BULK_INVITATION_MAX_ROWS = 1000
+
+# Archival: invitations whose last event is older than this move out of the hot collections
+ARCHIVE_RETENTION_DAYS = int(os.environ.get('ARCHIVE_RETENTION_DAYS', '180'))
+ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', '500'))
+# Copy passes per batch for rows written while archiving; invitations still changing wait for the next run
+ARCHIVE_MAX_PASSES = int(os.environ.get('ARCHIVE_MAX_PASSES', '5'))
+
+# Owner notifications: new RSVPs/messages are batched per owner into digests
+# Channels this server can deliver on; each owner picks theirs in the notification settings
+NOTIFY_CHANNELS = [c.strip() for c in os.environ.get('NOTIFY_CHANNELS', 'webhook,email').split(',') if c.strip()]
+NOTIFY_DIGEST_SECONDS = float(os.environ.get('NOTIFY_DIGEST_SECONDS', '300'))
+NOTIFY_DIGEST_MAX_EVENTS = int(os.environ.get('NOTIFY_DIGEST_MAX_EVENTS', '20'))
+NOTIFY_POLL_SECONDS = float(os.environ.get('NOTIFY_POLL_SECONDS', '10'))
+NOTIFY_MAX_ATTEMPTS = int(os.environ.get('NOTIFY_MAX_ATTEMPTS', '8'))
+NOTIFY_BACKOFF_BASE_SECONDS = float(os.environ.get('NOTIFY_BACKOFF_BASE_SECONDS', '30'))
+NOTIFY_DEAD_LETTER_TTL_DAYS = int(os.environ.get('NOTIFY_DEAD_LETTER_TTL_DAYS', '14'))
+# Webhook hosts exempt from the public-address check (e.g. an internal relay), comma-separated
+NOTIFY_WEBHOOK_ALLOWED_HOSTS = {
+    h.strip().lower() for h in os.environ.get('NOTIFY_WEBHOOK_ALLOWED_HOSTS', '').split(',') if h.strip()
+}
+NOTIFY_SEND_TIMEOUT_SECONDS = 10
+NOTIFY_CLAIM_LEASE_SECONDS = 600
+SMTP_HOST = os.environ.get('SMTP_HOST', 'localhost')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', '587'))
+SMTP_USER = os.environ.get('SMTP_USER', '')
+SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD', '')
+SMTP_FROM = os.environ.get('SMTP_FROM', 'noreply@undanganku.local')
+
+# Page-view analytics: counters and unique-visitor sketches are kept in memory and flushed periodically
+VIEW_FLUSH_SECONDS = float(os.environ.get('VIEW_FLUSH_SECONDS', '30'))
+VIEW_HLL_PRECISION = 12
+# Sketches serialized and written per bulk_write, bounds the memory a flush holds at once
+VIEW_FLUSH_CHUNK = int(os.environ.get('VIEW_FLUSH_CHUNK', '1000'))
+VIEW_WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+# Access log settings: public guest routes are sampled, errors and slow requests are always logged
+ACCESS_LOG_FILE = os.environ.get('ACCESS_LOG_FILE', '')
+ACCESS_LOG_PUBLIC_SAMPLE_RATE = float(os.environ.get('ACCESS_LOG_PUBLIC_SAMPLE_RATE', '0.1'))
+ACCESS_LOG_SLOW_MS = float(os.environ.get('ACCESS_LOG_SLOW_MS', '1000'))
+ACCESS_LOG_PUBLIC_PREFIXES = ("/api/public/", "/api/themes/css/", "/uploads/")
+LOG_QUEUE_SIZE = 10000
+
+# Request profiling: off unless a request carries an admin-issued token or falls in the sample rate
+ADMIN_EMAILS = {e.strip().lower() for e in os.environ.get('ADMIN_EMAILS', '').split(',') if e.strip()}
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_INTERVAL_SECONDS = float(os.environ.get('PROFILING_INTERVAL_MS', '2')) / 1000
+PROFILING_KEEP = int(os.environ.get('PROFILING_KEEP', '50'))
+PROFILING_TOKEN_MINUTES = 15
+
+# Search settings
+SEARCH_MIN_SIMILARITY = float(os.environ.get('SEARCH_MIN_SIMILARITY', '0.5'))
+SEARCH_MAX_LIMIT = 100
 
 # MongoDB connection
 import certifi
-import ssl
+
+# Per-request Mongo timing, filled in by the command listener below and read by the access log
+request_mongo_stats: ContextVar[Optional[dict]] = ContextVar("request_mongo_stats", default=None)
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Adds each command's server round-trip time to the current request's stats"""
+    
+    def started(self, event):
+        pass
+    
+    def succeeded(self, event):
+        self._record(event)
+    
+    def failed(self, event):
+        self._record(event)
+    
+    def _record(self, event):
+        # Motor copies the caller's context into its executor thread, so this sees the request's dict
+        stats = request_mongo_stats.get()
+        if stats is not None:
+            stats["ops"] += 1
+            stats["micros"] += event.duration_micros
 
 mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017/undanganku')
 
@@ -39,17 +211,28 @@ if 'mongodb+srv' in mongo_url or 'mongodb.net' in mongo_url:
         serverSelectionTimeoutMS=30000,
         connectTimeoutMS=30000,
         retryWrites=True,
-        w='majority'
+        w='majority',
+        event_listeners=[MongoCommandTimer()]
     )
 else:
     # Local MongoDB - no SSL needed
     client = AsyncIOMotorClient(
         mongo_url,
         serverSelectionTimeoutMS=5000,
-        connectTimeoutMS=5000
+        connectTimeoutMS=5000,
+        event_listeners=[MongoCommandTimer()]
     )
 
-db = client[os.environ.get('DB_NAME', 'undanganku')]
+db_name = os.environ.get('DB_NAME', 'undanganku')
+db = client[db_name]
+
+# Public read traffic (guest pages, stylesheets) goes to secondaries within a staleness bound.
+# Everything an owner reads after writing keeps using `db` (primary) for read-your-writes.
+if MONGO_PUBLIC_READ_PREFERENCE == 'secondaryPreferred':
+    public_read_preference = SecondaryPreferred(max_staleness=MONGO_MAX_STALENESS_SECONDS)
+else:
+    public_read_preference = Primary()
+public_db = client.get_database(db_name, read_preference=public_read_preference)
 
 # JWT Settings
 JWT_SECRET = os.environ.get('JWT_SECRET', 'wedding-secret-key-2024')
@@ -136,6 +319,10 @@ class UserResponse(BaseModel):
     email: str
     name: str
 
+class NotificationSettings(BaseModel):
+    webhook_url: Optional[str] = ""
+    email: bool = False
+
 class TokenResponse(BaseModel):
     access_token: str
     token_type: str = "bearer"
@@ -168,10 +355,20 @@ class LoveStoryItem(BaseModel):
     description: str
     image: Optional[str] = ""
 
+class ImageVariant(BaseModel):
+    url: str
+    width: int
+    height: int
+    format: Literal["webp", "jpeg"]
+
 class GalleryItem(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     url: str
     caption: Optional[str] = ""
+    width: Optional[int] = None
+    height: Optional[int] = None
+    variants: List[ImageVariant] = []
+    placeholder: Optional[str] = ""
 
 class GiftAccount(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -191,11 +388,12 @@ class InvitationSettings(BaseModel):
     music_url: Optional[str] = ""
     music_list: List[MusicItem] = []
     active_music_id: Optional[str] = ""
-    primary_color: Optional[str] = "#B76E79"
-    secondary_color: Optional[str] = "#F5E6E8"
-    accent_color: Optional[str] = "#D4AF37"
-    font_heading: Optional[str] = "Playfair Display"
-    font_body: Optional[str] = "Manrope"
+    # Empty means the theme's own color/font
+    primary_color: Optional[str] = ""
+    secondary_color: Optional[str] = ""
+    accent_color: Optional[str] = ""
+    font_heading: Optional[str] = ""
+    font_body: Optional[str] = ""
     auto_scroll: Optional[bool] = True
     show_countdown: Optional[bool] = True
     show_love_story: Optional[bool] = True
@@ -243,6 +441,53 @@ class InvitationResponse(BaseModel):
     created_at: str
     updated_at: str
 
+# Template Models
+class InvitationTemplateCreate(BaseModel):
+    name: str
+    # Any InvitationCreate fields; per-couple rows override them when instantiating
+    data: dict = {}
+
+class InvitationTemplateResponse(BaseModel):
+    id: str
+    user_id: str
+    name: str
+    data: dict
+    created_at: str
+    updated_at: str
+
+# Partial update models
+class InvitationItemsPatch(BaseModel):
+    # Changes to one array of items addressed by item id; new items are appended unless `order` says otherwise
+    add: List[dict] = []
+    update: Dict[str, dict] = {}
+    remove: List[str] = []
+    order: Optional[List[str]] = None
+
+class InvitationPatch(BaseModel):
+    # updated_at of the version being edited, the patch is rejected if the invitation changed since
+    updated_at: str
+    # JSON Merge Patch (RFC 7386) over InvitationCreate fields
+    changes: dict = {}
+    gallery: Optional[InvitationItemsPatch] = None
+    love_story: Optional[InvitationItemsPatch] = None
+    gifts: Optional[InvitationItemsPatch] = None
+    music_list: Optional[InvitationItemsPatch] = None
+
+class BulkInvitationCreate(BaseModel):
+    rows: List[dict] = Field(..., min_length=1, max_length=BULK_INVITATION_MAX_ROWS)
+
+class BulkInvitationRowError(BaseModel):
+    index: int
+    errors: List[dict]
+
+class BulkInvitationCreated(BaseModel):
+    index: int
+    id: str
+
+class BulkInvitationResponse(BaseModel):
+    created: List[BulkInvitationCreated]
+    errors: List[BulkInvitationRowError]
+
 # RSVP Model
 class RSVPCreate(BaseModel):
     guest_name: str
@@ -258,6 +503,16 @@ class RSVPResponse(BaseModel):
     attendance: str
     guest_count: int
     created_at: str
+    updated_at: Optional[str] = ""
+
+class RSVPSearchResult(RSVPResponse):
+    score: float = 0
+
+class RSVPSearchResponse(BaseModel):
+    items: List[RSVPSearchResult]
+    total: int
+    page: int
+    limit: int
 
 # Message/Ucapan Model
 class MessageCreate(BaseModel):
@@ -267,14 +522,91 @@ class MessageCreate(BaseModel):
 class MessageReply(BaseModel):
     reply: str
 
+class MessageModeration(BaseModel):
+    status: Literal["approved", "held"]
+
 class MessageResponse(BaseModel):
     id: str
     invitation_id: str
     guest_name: str
     message: str
     reply: Optional[str] = ""
+    status: Literal["approved", "flagged", "held"] = "approved"
+    flagged_terms: List[str] = []
     created_at: str
 
+class MessageSearchResult(MessageResponse):
+    score: float = 0
+
+class MessageSearchResponse(BaseModel):
+    items: List[MessageSearchResult]
+    total: int
+    page: int
+    limit: int
+
+# Time-series Models
+class TimeSeriesPoint(BaseModel):
+    bucket: str
+    total_rsvp: int = 0
+    attending: int = 0
+    not_attending: int = 0
+    uncertain: int = 0
+    total_guests: int = 0
+    total_messages: int = 0
+
+class TimeSeriesResponse(BaseModel):
+    granularity: Literal["hour", "day"]
+    points: List[TimeSeriesPoint]
+
+# Archive Model
+class ArchivedInvitation(BaseModel):
+    id: str
+    groom_name: str = ""
+    bride_name: str = ""
+    last_event_date: Optional[str] = None
+    rsvp_count: int = 0
+    message_count: int = 0
+    archived_at: str
+
+# View Analytics Models
+class ViewPoint(BaseModel):
+    day: str
+    views: int
+    unique_visitors: int
+
+class ViewStatsResponse(BaseModel):
+    total_views: int
+    unique_visitors: int
+    points: List[ViewPoint]
+
+# Request profiling models
+class ProfilingSettings(BaseModel):
+    sample_rate: float = Field(..., ge=0, le=1)
+
+class ProfilingToken(BaseModel):
+    header: str
+    token: str
+    expires_at: str
+
+class ProfileSummary(BaseModel):
+    id: str
+    trigger: Literal["token", "sample"]
+    method: str
+    path: str
+    route: str
+    status: int
+    started_at: str
+    wall_ms: float
+    mongo_ms: float
+    mongo_ops: int
+    on_loop_ms: float
+    phases: Dict[str, float]
+    samples: int
+
+class ProfilingStatus(BaseModel):
+    sample_rate: float
+    profiles: List[ProfileSummary]
+
 # Stats Model
 class StatsResponse(BaseModel):
     total_rsvp: int
@@ -315,6 +647,11 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+async def get_admin_user(user: dict = Depends(get_current_user)):
+    if user.get("email", "").lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
+
 # ============ UTILITY FUNCTIONS ============
 
 def convert_youtube_to_embed(url: str) -> str:
@@ -358,6 +695,86 @@ def get_youtube_audio_url(url: str) -> str:
     
     return ""
 
+def normalize_search_text(text: str) -> str:
+    """Lowercase, strip accents and punctuation for search indexing"""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    return " ".join(re.sub(r"[^\w]+", " ", text).split())
+
+def normalize_phone(phone: str) -> str:
+    """Keep digits only and use the local 08xx form for +62/62 numbers"""
+    digits = re.sub(r"\D", "", phone or "")
+    if digits.startswith("62"):
+        digits = "0" + digits[2:]
+    return digits
+
+def build_trigrams(text: str) -> List[str]:
+    """Word trigrams padded like pg_trgm ("  a", " an", "and", "nd ")"""
+    trigrams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            trigrams.add(padded[i:i + 3])
+    return sorted(trigrams)
+
+def rsvp_search_trigrams(guest_name: str, phone: str) -> List[str]:
+    return build_trigrams(f"{normalize_search_text(guest_name)} {normalize_phone(phone)}")
+
+def message_search_trigrams(guest_name: str, message: str) -> List[str]:
+    return build_trigrams(normalize_search_text(f"{guest_name} {message}"))
+
+def last_event_date(events: List[dict]) -> Optional[str]:
+    """Latest event date as "YYYY-MM-DD", ignoring dates that don't parse"""
+    dates = []
+    for event in events or []:
+        try:
+            dates.append(datetime.strptime((event.get("date") or "")[:10], "%Y-%m-%d").date().isoformat())
+        except ValueError:
+            continue
+    return max(dates) if dates else None
+
+def query_search_trigrams(q: str) -> List[str]:
+    """Trigrams for a search box query, phone-like queries are normalized as phone numbers"""
+    if re.fullmatch(r"[\d\s+\-()]+", q or "") and sum(c.isdigit() for c in q) >= 3:
+        return build_trigrams(normalize_phone(q))
+    return build_trigrams(normalize_search_text(q))
+
+async def search_collection(collection, base_filter: dict, q: str, page: int, limit: int) -> dict:
+    """Ranked trigram search within one invitation, paginated in a single aggregation"""
+    trigrams = query_search_trigrams(q)
+    skip = (page - 1) * limit
+    projection = {"_id": 0, "search_trigrams": 0}
+    
+    if not trigrams:
+        # Empty query: newest first
+        total = await collection.count_documents(base_filter)
+        items = await collection.find(base_filter, projection).sort("created_at", -1).skip(skip).to_list(limit)
+        return {"items": items, "total": total, "page": page, "limit": limit}
+    
+    # A document reaching the similarity threshold must contain at least one trigram of
+    # any (n - required + 1) subset, so only those go to the index; interior trigrams
+    # (no padding) are the most selective and go first.
+    required = max(1, math.ceil(len(trigrams) * SEARCH_MIN_SIMILARITY))
+    selective = sorted(trigrams, key=lambda t: t.count(" "))[:len(trigrams) - required + 1]
+    
+    pipeline = [
+        {"$match": {**base_filter, "search_trigrams": {"$in": selective}}},
+        {"$addFields": {"score": {"$divide": [
+            {"$size": {"$setIntersection": ["$search_trigrams", trigrams]}}, len(trigrams)
+        ]}}},
+        {"$match": {"score": {"$gte": SEARCH_MIN_SIMILARITY}}},
+        {"$sort": {"score": -1, "created_at": -1}},
+        {"$facet": {
+            "items": [{"$skip": skip}, {"$limit": limit}, {"$project": projection}],
+            "total": [{"$count": "count"}]
+        }}
+    ]
+    result = (await collection.aggregate(pipeline).to_list(1))[0]
+    total = result["total"][0]["count"] if result["total"] else 0
+    return {"items": result["items"], "total": total, "page": page, "limit": limit}
+
 # ============ AUTH ROUTES ============
 
 @api_router.post("/auth/register", response_model=TokenResponse)
@@ -398,6 +815,25 @@ async def login(data: UserLogin):
 async def get_me(user: dict = Depends(get_current_user)):
     return UserResponse(id=user["id"], email=user["email"], name=user["name"])
 
+@api_router.get("/auth/notifications", response_model=NotificationSettings)
+async def get_notification_settings(user: dict = Depends(get_current_user)):
+    return NotificationSettings(**user.get("notification_settings", {}))
+
+@api_router.put("/auth/notifications", response_model=NotificationSettings)
+async def update_notification_settings(data: NotificationSettings, user: dict = Depends(get_current_user)):
+    """Where RSVP/message digests are delivered (webhook URL and/or email)"""
+    if data.webhook_url:
+        if "webhook" not in notification_senders:
+            raise HTTPException(status_code=400, detail="Webhook notifications are not available")
+        try:
+            await asyncio.to_thread(check_webhook_url, data.webhook_url)
+        except UnsafeWebhookURL as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if data.email and "email" not in notification_senders:
+        raise HTTPException(status_code=400, detail="Email notifications are not available")
+    await db.users.update_one({"id": user["id"]}, {"$set": {"notification_settings": data.model_dump()}})
+    return data
+
 # ============ THEME ROUTES ============
 
 @api_router.get("/themes")
@@ -412,6 +848,254 @@ async def get_theme(theme_id: str):
         raise HTTPException(status_code=404, detail="Theme not found")
     return THEMES[theme_id]
 
+# ============ THEME STYLESHEETS ============
+
+THEME_CSS_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# No alpha: the page appends its own alpha digits to these colors
+CSS_COLOR_RE = re.compile(r"^#(?:[0-9a-fA-F]{3}|[0-9a-fA-F]{6})$")
+CSS_FONT_RE = re.compile(r"^[\w \-]+$")
+
+# Fingerprints of stylesheets already stored in Mongo by this worker
+persisted_theme_stylesheets: set = set()
+
+def css_url(value: str) -> str:
+    if not value:
+        return "none"
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "")
+    return f'url("{escaped}")'
+
+@lru_cache(maxsize=1024)
+def compile_theme_css(theme_id: str, primary: str, secondary: str, accent: str,
+                      font_heading: str, font_body: str) -> tuple:
+    """Compile a theme plus color/font overrides into a CSS-variables stylesheet, returns (fingerprint, css).
+    Variable names are the --theme-* ones ThemeProvider reads on the public page."""
+    theme = THEMES.get(theme_id, THEMES["floral"])
+    ornaments = theme["ornaments"]
+    css = (
+        f".invitation-container.theme-{theme['id']} {{\n"
+        f"  --theme-primary: {primary};\n"
+        f"  --theme-secondary: {secondary};\n"
+        f"  --theme-accent: {accent};\n"
+        f"  --theme-font-heading: '{font_heading}', serif;\n"
+        f"  --theme-font-body: '{font_body}', sans-serif;\n"
+        f"  --theme-ornament-top-left: {css_url(ornaments['top_left'])};\n"
+        f"  --theme-ornament-top-right: {css_url(ornaments['top_right'])};\n"
+        f"  --theme-ornament-bottom: {css_url(ornaments['bottom'])};\n"
+        f"  --theme-ornament-divider: {css_url(ornaments['divider'])};\n"
+        f"  --theme-background-pattern: {theme['background_pattern']};\n"
+        f"}}\n"
+    )
+    fingerprint = hashlib.sha256(css.encode()).hexdigest()[:16]
+    return fingerprint, css
+
+def resolve_theme_style(theme_id: str, settings: Optional[dict]) -> tuple:
+    """Theme values with the invitation's overrides; missing or empty settings use the theme's"""
+    theme = THEMES.get(theme_id, THEMES["floral"])
+    settings = settings or {}
+    
+    def pick(field: str, pattern) -> str:
+        value = (settings.get(field) or "").strip()
+        if not value or not pattern.match(value):
+            return theme[field]
+        if pattern is CSS_COLOR_RE and len(value) == 4:
+            # #abc -> #aabbcc
+            value = "#" + "".join(c * 2 for c in value[1:])
+        return value
+    
+    return (
+        theme["id"],
+        pick("primary_color", CSS_COLOR_RE),
+        pick("secondary_color", CSS_COLOR_RE),
+        pick("accent_color", CSS_COLOR_RE),
+        pick("font_heading", CSS_FONT_RE),
+        pick("font_body", CSS_FONT_RE),
+    )
+
+async def ensure_theme_stylesheet(theme_id: str, settings: Optional[dict]) -> str:
+    """Compile (once) and store the invitation's stylesheet, returns its fingerprinted URL"""
+    fingerprint, css = compile_theme_css(*resolve_theme_style(theme_id, settings))
+    if fingerprint not in persisted_theme_stylesheets:
+        await db.theme_stylesheets.update_one(
+            {"fingerprint": fingerprint},
+            {"$setOnInsert": {"fingerprint": fingerprint, "css": css,
+                              "created_at": datetime.now(timezone.utc).isoformat()}},
+            upsert=True
+        )
+        persisted_theme_stylesheets.add(fingerprint)
+    return f"/api/themes/css/{fingerprint}.css"
+
+# What InvitationSettings filled in for every invitation before empty meant "use the theme"
+LEGACY_STYLE_DEFAULTS = {
+    "primary_color": "#B76E79",
+    "secondary_color": "#F5E6E8",
+    "accent_color": "#D4AF37",
+    "font_heading": "Playfair Display",
+    "font_body": "Manrope",
+}
+
+async def clear_legacy_style_defaults() -> int:
+    """Empty style settings still holding the old floral defaults, so invitations follow their theme.
+    The public page never applied these settings before, so clearing them keeps what guests saw.
+    Returns invitations and templates changed."""
+    query = {"$or": [{f"settings.{field}": value} for field, value in LEGACY_STYLE_DEFAULTS.items()]}
+    changed = 0
+    for name in ("invitations", "invitation_templates"):
+        async for doc in db[name].find(query, {"_id": 0, "id": 1, "theme": 1, "settings": 1}):
+            settings = {
+                **doc["settings"],
+                **{field: "" for field, value in LEGACY_STYLE_DEFAULTS.items() if doc["settings"].get(field) == value}
+            }
+            updates = {f"settings.{field}": settings[field] for field in LEGACY_STYLE_DEFAULTS if field in settings}
+            if name == "invitations":
+                updates["theme_css_url"] = await ensure_theme_stylesheet(doc.get("theme", "floral"), settings)
+            await db[name].update_one({"id": doc["id"]}, {"$set": updates})
+            if name == "invitations":
+                await update_public_payload("invitation", doc["id"])
+            changed += 1
+    return changed
+
+@api_router.get("/themes/css/{fingerprint}.css")
+async def get_theme_stylesheet(fingerprint: str):
+    """Serve a compiled theme stylesheet; content never changes for a fingerprint"""
+    stylesheet = await public_db.theme_stylesheets.find_one({"fingerprint": fingerprint}, {"_id": 0, "css": 1})
+    if not stylesheet:
+        # Just created and not replicated yet
+        stylesheet = await db.theme_stylesheets.find_one({"fingerprint": fingerprint}, {"_id": 0, "css": 1})
+    if not stylesheet:
+        raise HTTPException(status_code=404, detail="Stylesheet not found")
+    return Response(
+        content=stylesheet["css"],
+        media_type="text/css",
+        headers={"Cache-Control": THEME_CSS_CACHE_CONTROL, "ETag": f'"{fingerprint}"'}
+    )
+
+# ============ UPLOAD STORAGE ============
+
+UPLOAD_EXTENSIONS = {
+    "music": ('.mp3', '.wav', '.ogg', '.m4a'),
+    "image": ('.jpg', '.jpeg', '.png', '.webp'),
+}
+UPLOAD_MAX_BYTES = {
+    "music": MUSIC_MAX_UPLOAD_BYTES,
+    "image": IMAGE_MAX_UPLOAD_BYTES,
+}
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+class LocalStorage:
+    """Uploads on local disk under UPLOAD_DIR, served by the /uploads static mount"""
+    supports_direct_upload = False
+    
+    def __init__(self, root: Path, base_url: str = "/uploads"):
+        self.root = root
+        self.base_url = base_url
+    
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+    
+    async def save(self, key: str, fileobj, content_type: str) -> str:
+        path = self.root / key
+        
+        def write():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "wb") as buffer:
+                shutil.copyfileobj(fileobj, buffer)
+        
+        await asyncio.to_thread(write)
+        return self.url(key)
+    
+    async def size(self, key: str) -> Optional[int]:
+        path = self.root / key
+        
+        def stat():
+            return path.stat().st_size if path.is_file() else None
+        
+        return await asyncio.to_thread(stat)
+    
+    async def read(self, key: str) -> bytes:
+        return await asyncio.to_thread((self.root / key).read_bytes)
+    
+    async def delete(self, key: str):
+        await asyncio.to_thread((self.root / key).unlink, missing_ok=True)
+
+class S3Storage:
+    """Uploads in an S3-compatible bucket (AWS S3, MinIO, R2...), browsers upload directly via presigned POST"""
+    supports_direct_upload = True
+    
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None, region: Optional[str] = None,
+                 public_base_url: str = ""):
+        self.bucket = bucket
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            # Path-style addressing works with MinIO and other self-hosted stores
+            config=BotoConfig(signature_version="s3v4", s3={"addressing_style": "path" if endpoint_url else "auto"})
+        )
+        if public_base_url:
+            self.public_base_url = public_base_url.rstrip("/")
+        elif endpoint_url:
+            self.public_base_url = f"{endpoint_url.rstrip('/')}/{bucket}"
+        else:
+            self.public_base_url = f"https://{bucket}.s3.{region or 'us-east-1'}.amazonaws.com"
+    
+    def url(self, key: str) -> str:
+        return f"{self.public_base_url}/{key}"
+    
+    async def save(self, key: str, fileobj, content_type: str) -> str:
+        await asyncio.to_thread(
+            self.client.upload_fileobj, fileobj, self.bucket, key,
+            ExtraArgs={"ContentType": content_type, "CacheControl": IMMUTABLE_CACHE_CONTROL}
+        )
+        return self.url(key)
+    
+    async def size(self, key: str) -> Optional[int]:
+        try:
+            head = await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return head["ContentLength"]
+    
+    async def read(self, key: str) -> bytes:
+        obj = await asyncio.to_thread(self.client.get_object, Bucket=self.bucket, Key=key)
+        return await asyncio.to_thread(obj["Body"].read)
+    
+    async def delete(self, key: str):
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=key)
+    
+    async def presign_upload(self, key: str, content_type: str, max_bytes: int) -> dict:
+        """Presigned POST restricted to this key, content type and size"""
+        return await asyncio.to_thread(
+            self.client.generate_presigned_post,
+            Bucket=self.bucket,
+            Key=key,
+            Fields={"Content-Type": content_type, "Cache-Control": IMMUTABLE_CACHE_CONTROL},
+            Conditions=[
+                {"Content-Type": content_type},
+                {"Cache-Control": IMMUTABLE_CACHE_CONTROL},
+                ["content-length-range", 1, max_bytes]
+            ],
+            ExpiresIn=PRESIGNED_UPLOAD_EXPIRES_SECONDS
+        )
+
+def build_storage():
+    if STORAGE_BACKEND == "s3":
+        return S3Storage(S3_BUCKET, endpoint_url=S3_ENDPOINT_URL, region=S3_REGION, public_base_url=S3_PUBLIC_BASE_URL)
+    return LocalStorage(UPLOAD_DIR)
+
+storage = build_storage()
+
+class UploadPresignRequest(BaseModel):
+    kind: Literal["music", "image"]
+    filename: str
+    content_type: str
+
+class UploadCompleteRequest(BaseModel):
+    kind: Literal["music", "image"]
+    key: str
+    filename: str
+
 # ============ MUSIC UPLOAD ROUTE ============
 
 @api_router.post("/upload/music")
@@ -420,40 +1104,234 @@ async def upload_music(
     user: dict = Depends(get_current_user)
 ):
     """Upload music file (MP3)"""
-    if not file.filename.lower().endswith(('.mp3', '.wav', '.ogg', '.m4a')):
+    if not file.filename.lower().endswith(UPLOAD_EXTENSIONS["music"]):
         raise HTTPException(status_code=400, detail="Only audio files are allowed")
     
     # Generate unique filename
     file_ext = file.filename.split('.')[-1]
     unique_filename = f"{uuid.uuid4()}.{file_ext}"
-    file_path = MUSIC_DIR / unique_filename
     
     # Save file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    url = await storage.save(f"music/{unique_filename}", file.file, file.content_type or "audio/mpeg")
     
     # Return URL
     return {
         "filename": file.filename,
-        "url": f"/uploads/music/{unique_filename}",
+        "url": url,
         "message": "Music uploaded successfully"
     }
 
-# ============ INVITATION ROUTES (ADMIN) ============
 
-@api_router.post("/invitations", response_model=InvitationResponse)
-async def create_invitation(data: InvitationCreate, user: dict = Depends(get_current_user)):
-    invitation_id = str(uuid.uuid4())
-    now = datetime.now(timezone.utc).isoformat()
+# ============ IMAGE UPLOAD ROUTE ============
+
+image_executor: Optional[ProcessPoolExecutor] = None
+
+def get_image_executor() -> ProcessPoolExecutor:
+    """Lazily start the process pool used for image decoding/resizing"""
+    global image_executor
+    if image_executor is None:
+        image_executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return image_executor
+
+def process_image(data: bytes) -> dict:
+    """Decode an image, strip EXIF and encode resized WebP/JPEG variants (runs in a worker process)"""
+    img = Image.open(io.BytesIO(data))
+    if img.width * img.height > IMAGE_MAX_PIXELS:
+        raise ValueError("Image is too large")
+    
+    # Let the JPEG decoder downscale while decoding when the source is much bigger than we need
+    max_width = max(IMAGE_VARIANT_WIDTHS)
+    img.draft("RGB", (max_width, max_width))
+    
+    # Apply camera orientation, then drop all metadata (EXIF, GPS) by re-encoding pixels only
+    img = ImageOps.exif_transpose(img)
+    if img.mode in ("RGBA", "LA", "P"):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        img = background
+    elif img.mode != "RGB":
+        img = img.convert("RGB")
+    
+    src_width, src_height = img.size
+    widths = sorted({min(w, src_width) for w in IMAGE_VARIANT_WIDTHS}, reverse=True)
+    
+    variants = []
+    source = img
+    for width in widths:
+        height = max(1, round(src_height * width / src_width))
+        # Resize from the previous (larger) variant so each step works on fewer pixels
+        resized = source if source.size == (width, height) else source.resize(
+            (width, height), Image.LANCZOS, reducing_gap=3.0
+        )
+        for fmt, ext, options in (
+            ("webp", "webp", {"quality": 80, "method": 4}),
+            ("jpeg", "jpg", {"quality": 82, "optimize": True, "progressive": True}),
+        ):
+            encoded = io.BytesIO()
+            resized.save(encoded, fmt.upper(), **options)
+            variants.append({
+                "suffix": f"{width}.{ext}",
+                "width": width,
+                "height": height,
+                "format": fmt,
+                "data": encoded.getvalue()
+            })
+        source = resized
+    
+    # Tiny blurred preview shown inline while the real image loads
+    thumb = source.copy()
+    thumb.thumbnail((16, 16))
+    buffer = io.BytesIO()
+    thumb.save(buffer, "JPEG", quality=50)
+    placeholder = "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode()
+    
+    variants.sort(key=lambda v: (v["format"], v["width"]))
+    return {"variants": variants, "placeholder": placeholder}
+
+async def store_image(data: bytes) -> dict:
+    """Resize an uploaded image in the worker pool and save every variant to upload storage"""
+    global image_executor
+    # Decoding and resizing is CPU-bound, keep it off the event loop
+    loop = asyncio.get_running_loop()
+    try:
+        result = await loop.run_in_executor(get_image_executor(), process_image, data)
+    except (UnidentifiedImageError, Image.DecompressionBombError, ValueError, OSError):
+        raise HTTPException(status_code=400, detail="Invalid image file")
+    except BrokenProcessPool:
+        image_executor = None
+        raise HTTPException(status_code=503, detail="Image processing unavailable, please retry")
+    
+    basename = str(uuid.uuid4())
+    variants = result["variants"]
+    urls = await asyncio.gather(*[
+        storage.save(
+            f"images/{basename}-{v['suffix']}", io.BytesIO(v["data"]),
+            "image/webp" if v["format"] == "webp" else "image/jpeg"
+        )
+        for v in variants
+    ])
+    variants = [
+        {"url": url, "width": v["width"], "height": v["height"], "format": v["format"]}
+        for url, v in zip(urls, variants)
+    ]
+    largest = max((v for v in variants if v["format"] == "jpeg"), key=lambda v: v["width"])
+    return {
+        "url": largest["url"],
+        "width": largest["width"],
+        "height": largest["height"],
+        "variants": variants,
+        "placeholder": result["placeholder"]
+    }
+
+@api_router.post("/upload/image")
+async def upload_image(
+    file: UploadFile = File(...),
+    user: dict = Depends(get_current_user)
+):
+    """Upload image (gallery, cover, couple photo) and generate responsive variants"""
+    if not file.filename.lower().endswith(UPLOAD_EXTENSIONS["image"]):
+        raise HTTPException(status_code=400, detail="Only image files are allowed")
+    
+    data = await file.read(IMAGE_MAX_UPLOAD_BYTES + 1)
+    if len(data) > IMAGE_MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Image file is too large")
+    
+    result = await store_image(data)
+    return {
+        "filename": file.filename,
+        **result,
+        "message": "Image uploaded successfully"
+    }
+
+# ============ DIRECT UPLOAD ROUTES ============
+
+def direct_upload_prefix(kind: str, user_id: str) -> str:
+    """Key prefix a user may upload to directly (images land in incoming/ until processed)"""
+    return f"music/{user_id}/" if kind == "music" else f"incoming/{user_id}/"
+
+def require_direct_uploads():
+    """Direct uploads need a storage backend that can presign (supports_direct_upload)"""
+    if not storage.supports_direct_upload:
+        raise HTTPException(
+            status_code=501, detail="Direct uploads are not enabled on this server, use /upload/music or /upload/image"
+        )
+
+@api_router.post("/upload/presign")
+async def presign_upload(data: UploadPresignRequest, user: dict = Depends(get_current_user)):
+    """Presigned POST so the browser uploads straight to object storage, bypassing the API"""
+    require_direct_uploads()
+    if not data.filename.lower().endswith(UPLOAD_EXTENSIONS[data.kind]):
+        raise HTTPException(status_code=400, detail=f"Only {data.kind} files are allowed")
+    if not data.content_type.startswith("audio/" if data.kind == "music" else "image/"):
+        raise HTTPException(status_code=400, detail="Invalid content type")
+    
+    file_ext = data.filename.rsplit('.', 1)[-1].lower()
+    key = f"{direct_upload_prefix(data.kind, user['id'])}{uuid.uuid4()}.{file_ext}"
+    presigned = await storage.presign_upload(key, data.content_type, UPLOAD_MAX_BYTES[data.kind])
+    return {
+        "key": key,
+        "upload_url": presigned["url"],
+        "fields": presigned["fields"],
+        "url": storage.url(key),
+        "max_bytes": UPLOAD_MAX_BYTES[data.kind],
+        "expires_in": PRESIGNED_UPLOAD_EXPIRES_SECONDS
+    }
+
+@api_router.post("/upload/complete")
+async def complete_upload(data: UploadCompleteRequest, user: dict = Depends(get_current_user)):
+    """Confirm a direct upload; images are resized into variants and the raw original removed"""
+    require_direct_uploads()
+    if not data.key.startswith(direct_upload_prefix(data.kind, user["id"])) or ".." in data.key:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    size = await storage.size(data.key)
+    if size is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if size > UPLOAD_MAX_BYTES[data.kind]:
+        await storage.delete(data.key)
+        raise HTTPException(status_code=413, detail="Uploaded file is too large")
     
+    if data.kind == "music":
+        result = {"url": storage.url(data.key)}
+    else:
+        # The original still carries EXIF/GPS metadata, only the re-encoded variants stay public
+        raw = await storage.read(data.key)
+        try:
+            result = await store_image(raw)
+        finally:
+            await storage.delete(data.key)
+    
+    await db.uploads.insert_one({
+        "id": str(uuid.uuid4()),
+        "owner_id": user["id"],
+        "kind": data.kind,
+        "key": data.key,
+        "filename": data.filename,
+        "size": size,
+        "url": result["url"],
+        "created_at": datetime.now(timezone.utc).isoformat()
+    })
+    return {
+        "filename": data.filename,
+        **result,
+        "message": "Upload completed successfully"
+    }
+
+# ============ INVITATION ROUTES (ADMIN) ============
+
+async def new_invitation_doc(data: InvitationCreate, user_id: str, now: str) -> dict:
+    """Invitation document ready to insert (embed URL, stylesheet, defaults filled in)"""
     # Convert video URL to embed
     video_embed = convert_youtube_to_embed(data.video_url)
+    fields = data.model_dump()
     
     doc = {
-        "id": invitation_id,
-        "user_id": user["id"],
-        **data.model_dump(),
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        **fields,
         "video_url": video_embed,
+        "last_event_date": last_event_date(fields["events"]),
         "created_at": now,
         "updated_at": now
     }
@@ -468,7 +1346,16 @@ async def create_invitation(data: InvitationCreate, user: dict = Depends(get_cur
     if "quran_surah" not in doc:
         doc["quran_surah"] = data.quran_surah or ""
     
+    doc["theme_css_url"] = await ensure_theme_stylesheet(doc["theme"], doc["settings"])
+    return doc
+
+@api_router.post("/invitations", response_model=InvitationResponse)
+async def create_invitation(data: InvitationCreate, user: dict = Depends(get_current_user)):
+    doc = await new_invitation_doc(data, user["id"], datetime.now(timezone.utc).isoformat())
+    invitation_id = doc["id"]
+    
     await db.invitations.insert_one(doc)
+    await update_public_payload("invitation", invitation_id)
     
     result = await db.invitations.find_one({"id": invitation_id}, {"_id": 0})
     return result
@@ -527,9 +1414,12 @@ async def update_invitation(invitation_id: str, data: InvitationCreate, user: di
     update_doc = {
         **data.model_dump(),
         "video_url": video_embed,
+        "theme_css_url": await ensure_theme_stylesheet(data.theme, data.settings.model_dump()),
+        "last_event_date": last_event_date(data.model_dump()["events"]),
         "updated_at": datetime.now(timezone.utc).isoformat()
     }
     await db.invitations.update_one({"id": invitation_id}, {"$set": update_doc})
+    await update_public_payload("invitation", invitation_id)
     
     result = await db.invitations.find_one({"id": invitation_id}, {"_id": 0})
     return result
@@ -543,16 +1433,341 @@ async def delete_invitation(invitation_id: str, user: dict = Depends(get_current
     # Also delete related RSVPs and messages
     await db.rsvps.delete_many({"invitation_id": invitation_id})
     await db.messages.delete_many({"invitation_id": invitation_id})
+    await db.activity_rollups.delete_many({"invitation_id": invitation_id})
+    await db.invitation_views.delete_many({"invitation_id": invitation_id})
+    await db.public_payloads.delete_many(
+        {"key": {"$in": [f"invitation:{invitation_id}", f"messages:{invitation_id}"]}}
+    )
     
     return {"message": "Invitation deleted successfully"}
 
-# ============ PUBLIC INVITATION ROUTE ============
+# ============ INVITATION TEMPLATES ============
+
+def merge_template(base: dict, overrides: dict) -> dict:
+    """Overlay a row on a template: nested objects merge key by key, anything else is replaced"""
+    merged = dict(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_template(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+def check_template_fields(data: dict):
+    unknown = sorted(set(data) - set(InvitationCreate.model_fields))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown invitation fields: {', '.join(unknown)}")
+
+def nested_model(annotation) -> Optional[type]:
+    """The model inside a field annotation (Model, List[Model], Optional[Model]), if any"""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in get_args(annotation):
+        model = nested_model(arg)
+        if model is not None:
+            return model
+    return None
+
+def unknown_field_errors(model: type, data: dict, prefix: str = "") -> List[dict]:
+    """Keys the model would silently drop on validation, at any depth, as {loc, msg} entries"""
+    errors = []
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        field = model.model_fields.get(key)
+        if field is None:
+            errors.append({"loc": path, "msg": "Unknown field"})
+            continue
+        nested = nested_model(field.annotation)
+        if nested is None:
+            continue
+        if isinstance(value, dict):
+            errors.extend(unknown_field_errors(nested, value, f"{path}."))
+        elif isinstance(value, list):
+            for index, item in enumerate(value):
+                if isinstance(item, dict):
+                    errors.extend(unknown_field_errors(nested, item, f"{path}.{index}."))
+    return errors
+
+async def get_owned_template(template_id: str, user_id: str) -> dict:
+    template = await db.invitation_templates.find_one({"id": template_id, "user_id": user_id}, {"_id": 0})
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return template
+
+@api_router.post("/templates", response_model=InvitationTemplateResponse)
+async def create_template(data: InvitationTemplateCreate, user: dict = Depends(get_current_user)):
+    """Save a reusable invitation template"""
+    check_template_fields(data.data)
+    now = datetime.now(timezone.utc).isoformat()
+    doc = {
+        "id": str(uuid.uuid4()),
+        "user_id": user["id"],
+        "name": data.name,
+        "data": data.data,
+        "created_at": now,
+        "updated_at": now
+    }
+    await db.invitation_templates.insert_one(doc)
+    doc.pop("_id", None)
+    return doc
+
+@api_router.get("/templates", response_model=List[InvitationTemplateResponse])
+async def get_templates(user: dict = Depends(get_current_user)):
+    return await db.invitation_templates.find({"user_id": user["id"]}, {"_id": 0}).to_list(100)
+
+@api_router.put("/templates/{template_id}", response_model=InvitationTemplateResponse)
+async def update_template(template_id: str, data: InvitationTemplateCreate, user: dict = Depends(get_current_user)):
+    check_template_fields(data.data)
+    result = await db.invitation_templates.find_one_and_update(
+        {"id": template_id, "user_id": user["id"]},
+        {"$set": {"name": data.name, "data": data.data, "updated_at": datetime.now(timezone.utc).isoformat()}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if not result:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return result
 
-@api_router.get("/public/invitation/{invitation_id}")
-async def get_public_invitation(invitation_id: str):
+@api_router.delete("/templates/{template_id}")
+async def delete_template(template_id: str, user: dict = Depends(get_current_user)):
+    result = await db.invitation_templates.delete_one({"id": template_id, "user_id": user["id"]})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return {"message": "Template deleted successfully"}
+
+@api_router.post("/templates/{template_id}/invitations", response_model=BulkInvitationResponse)
+async def bulk_create_invitations(template_id: str, data: BulkInvitationCreate, user: dict = Depends(get_current_user)):
+    """Create one invitation per row (template + row overrides); invalid rows are reported, valid ones created"""
+    template = await get_owned_template(template_id, user["id"])
+    now = datetime.now(timezone.utc).isoformat()
+    
+    docs = []
+    created = []
+    errors = []
+    for index, row in enumerate(data.rows):
+        # A misspelt key would otherwise be dropped without a trace, reject the row instead
+        row_errors = unknown_field_errors(InvitationCreate, row)
+        try:
+            invitation = InvitationCreate.model_validate(merge_template(template["data"], row))
+        except ValidationError as e:
+            row_errors.extend(
+                {"loc": ".".join(str(part) for part in error["loc"]), "msg": error["msg"]}
+                for error in e.errors()
+            )
+        if row_errors:
+            errors.append(BulkInvitationRowError(index=index, errors=row_errors))
+            continue
+        doc = await new_invitation_doc(invitation, user["id"], now)
+        docs.append(doc)
+        created.append(BulkInvitationCreated(index=index, id=doc["id"]))
+    
+    # Public payloads are built lazily on each invitation's first guest visit
+    if docs:
+        await db.invitations.insert_many(docs, ordered=False)
+    return BulkInvitationResponse(created=created, errors=errors)
+
+# ============ INVITATION PATCH ============
+
+# Patchable item arrays: document path and item model
+INVITATION_ITEM_ARRAYS = {
+    "gallery": ("gallery", GalleryItem),
+    "love_story": ("love_story", LoveStoryItem),
+    "gifts": ("gifts", GiftAccount),
+    "music_list": ("settings.music_list", MusicItem),
+}
+
+def error_entries(e: ValidationError, prefix: str) -> List[dict]:
+    return [
+        {"loc": ".".join([prefix, *(str(part) for part in error["loc"])]), "msg": error["msg"]}
+        for error in e.errors()
+    ]
+
+@lru_cache(maxsize=None)
+def field_adapter(model: type, name: str) -> TypeAdapter:
+    return TypeAdapter(model.model_fields[name].annotation)
+
+def merge_patch_updates(model: type, patch: dict, prefix: str, updates: dict, errors: list):
+    """Flatten a merge patch into dotted $set paths, validating only the fields it touches"""
+    for key, value in patch.items():
+        path = f"{prefix}{key}"
+        field = model.model_fields.get(key)
+        if field is None:
+            errors.append({"loc": path, "msg": "Unknown field"})
+            continue
+        if value is None:
+            # null removes a member in merge patch terms, here that means back to the default
+            if field.is_required():
+                errors.append({"loc": path, "msg": "Field required"})
+                continue
+            value = field.get_default(call_default_factory=True)
+        elif isinstance(value, dict) and isinstance(field.annotation, type) and issubclass(field.annotation, BaseModel):
+            merge_patch_updates(field.annotation, value, f"{path}.", updates, errors)
+            continue
+        adapter = field_adapter(model, key)
+        try:
+            updates[path] = adapter.dump_python(adapter.validate_python(value))
+        except ValidationError as e:
+            errors.extend(error_entries(e, path))
+
+def item_patch_update(name: str, ops: InvitationItemsPatch, current: list, errors: list):
+    """Mongo update for one item array: $push, $pull or filtered $set for a single kind of change,
+    $set of the whole new list when changes are combined or reordered. Returns (update, array_filters)."""
+    path, model = INVITATION_ITEM_ARRAYS[name]
+    error_count = len(errors)
+    items = {item.get("id"): item for item in current}
+    
+    added = []
+    for index, raw in enumerate(ops.add):
+        try:
+            item = model.model_validate(raw).model_dump()
+        except ValidationError as e:
+            errors.extend(error_entries(e, f"{name}.add.{index}"))
+            continue
+        if item["id"] in items or any(other["id"] == item["id"] for other in added):
+            errors.append({"loc": f"{name}.add.{index}.id", "msg": "Duplicate item id"})
+            continue
+        added.append(item)
+    
+    updated = {}
+    for item_id, patch in ops.update.items():
+        if item_id not in items:
+            errors.append({"loc": f"{name}.update.{item_id}", "msg": "Unknown item id"})
+            continue
+        merged = {k: v for k, v in merge_template(items[item_id], patch).items() if v is not None}
+        try:
+            updated[item_id] = model.model_validate({**merged, "id": item_id}).model_dump()
+        except ValidationError as e:
+            errors.extend(error_entries(e, f"{name}.update.{item_id}"))
+    
+    removed = set(ops.remove)
+    unknown = sorted(removed - set(items))
+    if unknown:
+        errors.append({"loc": f"{name}.remove", "msg": f"Unknown item ids: {', '.join(unknown)}"})
+    
+    result = [updated.get(item.get("id"), item) for item in current if item.get("id") not in removed] + added
+    if ops.order is not None:
+        if sorted(ops.order) != sorted(item["id"] for item in result):
+            errors.append({"loc": f"{name}.order", "msg": "Order must list every item id exactly once"})
+        else:
+            by_id = {item["id"]: item for item in result}
+            result = [by_id[item_id] for item_id in ops.order]
+    if len(errors) > error_count:
+        return {}, []
+    
+    kinds = [bool(added), bool(updated), bool(removed), ops.order is not None]
+    if sum(kinds) == 0:
+        return {}, []
+    if sum(kinds) > 1:
+        return {"$set": {path: result}}, []
+    if added:
+        return {"$push": {path: {"$each": added}}}, []
+    if removed:
+        return {"$pull": {path: {"id": {"$in": sorted(removed)}}}}, []
+    if updated:
+        alias = name.replace("_", "")
+        return (
+            {"$set": {f"{path}.$[{alias}{n}]": item for n, item in enumerate(updated.values())}},
+            [{f"{alias}{n}.id": item_id} for n, item_id in enumerate(updated)]
+        )
+    return {"$set": {path: result}}, []
+
+def set_dotted(doc: dict, path: str, value):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+@api_router.patch("/invitations/{invitation_id}", response_model=InvitationResponse)
+async def patch_invitation(invitation_id: str, data: InvitationPatch, user: dict = Depends(get_current_user)):
+    """Apply field-level changes as targeted update operators, guarded by the editor's updated_at"""
+    existing = await db.invitations.find_one({"id": invitation_id, "user_id": user["id"]}, {"_id": 0})
+    if not existing:
+        raise HTTPException(status_code=404, detail="Invitation not found")
+    if existing.get("updated_at") != data.updated_at:
+        raise HTTPException(status_code=409, detail="Invitation was changed elsewhere, reload and try again")
+    
+    errors = []
+    updates = {}
+    merge_patch_updates(InvitationCreate, data.changes, "", updates, errors)
+    
+    update = {}
+    array_filters = []
+    for name in INVITATION_ITEM_ARRAYS:
+        ops = getattr(data, name)
+        if ops is None:
+            continue
+        path = INVITATION_ITEM_ARRAYS[name][0]
+        if any(p == path or p.startswith(f"{path}.") or path.startswith(f"{p}.") for p in updates):
+            errors.append({"loc": name, "msg": f"Conflicts with changes to {path}"})
+            continue
+        current = (existing.get("settings") or {}).get("music_list", []) if name == "music_list" else existing.get(name, [])
+        item_update, item_filters = item_patch_update(name, ops, current or [], errors)
+        for operator, fields in item_update.items():
+            update.setdefault(operator, {}).update(fields)
+        array_filters.extend(item_filters)
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+    if not updates and not update:
+        return existing
+    
+    if "video_url" in updates:
+        updates["video_url"] = convert_youtube_to_embed(updates["video_url"])
+    if "events" in updates:
+        updates["last_event_date"] = last_event_date(updates["events"])
+    if any(p == "theme" or p == "settings" or p.startswith("settings.") for p in updates):
+        style = {"theme": existing.get("theme", "floral"), "settings": dict(existing.get("settings") or {})}
+        for p, value in updates.items():
+            if p == "theme" or p == "settings" or p.startswith("settings."):
+                set_dotted(style, p, value)
+        updates["theme_css_url"] = await ensure_theme_stylesheet(style["theme"], style["settings"])
+    updates["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update.setdefault("$set", {}).update(updates)
+    
+    result = await db.invitations.find_one_and_update(
+        {"id": invitation_id, "user_id": user["id"], "updated_at": data.updated_at},
+        update,
+        projection={"_id": 0},
+        array_filters=array_filters or None,
+        return_document=ReturnDocument.AFTER
+    )
+    if result is None:
+        # Another tab saved between our read and the update
+        raise HTTPException(status_code=409, detail="Invitation was changed elsewhere, reload and try again")
+    await update_public_payload("invitation", invitation_id)
+    return result
+
+# ============ PRECOMPRESSED PUBLIC PAYLOADS ============
+
+def pick_encoding(accept_encoding: str) -> str:
+    """Best stored variant for an Accept-Encoding header: br, gzip or identity"""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return "identity"
+
+def compress_payload(body: bytes) -> dict:
+    """Encode once at write time, reads just pick a variant"""
+    variants = {"identity": body, "gzip": gzip.compress(body, compresslevel=PUBLIC_PAYLOAD_GZIP_LEVEL)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=PUBLIC_PAYLOAD_BROTLI_QUALITY)
+    return variants
+
+async def build_public_invitation(invitation_id: str) -> Optional[dict]:
     invitation = await db.invitations.find_one({"id": invitation_id}, {"_id": 0})
     if not invitation:
-        raise HTTPException(status_code=404, detail="Invitation not found")
+        return None
     
     # Add default values for old invitations
     if "theme" not in invitation:
@@ -569,32 +1784,255 @@ async def get_public_invitation(invitation_id: str):
         invitation["settings"]["music_list"] = []
         invitation["settings"]["active_music_id"] = ""
     
-    # Get theme data
-    theme_data = THEMES.get(invitation["theme"], THEMES["floral"])
-    invitation["theme_data"] = theme_data
+    # Styling is served as a cacheable stylesheet instead of embedding theme data
+    if "theme_css_url" not in invitation:
+        invitation["theme_css_url"] = await ensure_theme_stylesheet(invitation["theme"], invitation["settings"])
+        await db.invitations.update_one(
+            {"id": invitation_id}, {"$set": {"theme_css_url": invitation["theme_css_url"]}}
+        )
     
     return invitation
 
+async def build_public_messages(invitation_id: str) -> list:
+    # Held messages stay hidden until the owner approves them
+    messages = await db.messages.find(
+        {"invitation_id": invitation_id, "status": {"$ne": "held"}},
+        {"_id": 0, "flagged_terms": 0, "search_trigrams": 0}
+    ).sort("created_at", -1).to_list(1000)
+    return [MessageResponse(**m).model_dump() for m in messages]
+
+PUBLIC_PAYLOAD_BUILDERS = {
+    "invitation": build_public_invitation,
+    "messages": build_public_messages,
+}
+
+async def refresh_public_payload(kind: str, invitation_id: str) -> Optional[dict]:
+    """Rebuild and store the JSON + compressed variants of a public payload after its data changed"""
+    key = f"{kind}:{invitation_id}"
+    # Taken before reading, so a refresh that read older data can never overwrite a newer one
+    generation = time.time_ns()
+    try:
+        data = await PUBLIC_PAYLOAD_BUILDERS[kind](invitation_id)
+        if data is None:
+            await db.public_payloads.delete_one({"key": key})
+            return None
+        
+        body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+        variants = await asyncio.to_thread(compress_payload, body)
+        doc = {
+            "key": key,
+            "generation": generation,
+            "etag": f'"{hashlib.sha256(body).hexdigest()[:20]}"',
+            **variants
+        }
+        try:
+            await db.public_payloads.update_one(
+                {"key": key, "generation": {"$lt": generation}}, {"$set": doc}, upsert=True
+            )
+        except DuplicateKeyError:
+            pass  # A newer payload was stored concurrently
+        return doc
+    except Exception as e:
+        # Never leave a stale payload behind, the next read rebuilds it
+        logger.warning(f"Refreshing public payload {key} failed: {e}")
+        await db.public_payloads.delete_one({"key": key})
+        raise
+
+async def update_public_payload(kind: str, invitation_id: str):
+    """Refresh after a write; a failure is logged and left to the next read, the write itself already succeeded"""
+    try:
+        await refresh_public_payload(kind, invitation_id)
+    except Exception as e:
+        logger.error(f"Public payload {kind}:{invitation_id} not refreshed after write: {e}")
+
+async def serve_public_payload(request: Request, kind: str, invitation_id: str) -> Response:
+    encoding = pick_encoding(request.headers.get("accept-encoding", ""))
+    query = {"key": f"{kind}:{invitation_id}"}
+    projection = {"_id": 0, "etag": 1, encoding: 1}
+    payload = await public_db.public_payloads.find_one(query, projection)
+    if not payload or encoding not in payload:
+        # Secondaries may lag right after a write, check the primary before rebuilding
+        payload = await db.public_payloads.find_one(query, projection)
+    if not payload or encoding not in payload:
+        payload = await refresh_public_payload(kind, invitation_id)
+        if payload is None:
+            raise HTTPException(status_code=404, detail="Invitation not found")
+        if encoding not in payload:
+            encoding = "identity"
+    
+    stale_payloads.put(query["key"], encoding, payload)
+    return payload_response(request, payload, encoding)
+
+def payload_response(request: Request, payload: dict, encoding: str, stale: bool = False) -> Response:
+    headers = {"ETag": payload["etag"], "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if stale:
+        headers["Warning"] = '110 - "Response is Stale"'
+    if request.headers.get("if-none-match") == payload["etag"]:
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=payload[encoding], media_type="application/json", headers=headers)
+
+# ============ PUBLIC INVITATION ROUTE ============
+
+@api_router.get("/public/invitation/{invitation_id}")
+async def get_public_invitation(invitation_id: str, request: Request):
+    response = await serve_public_payload(request, "invitation", invitation_id)
+    view_tracker.record(invitation_id, visitor_key(request))
+    return response
+
+# ============ OWNERSHIP ============
+
+async def resolve_item_owner(collection, item_id: str, user_id: str, not_found: str):
+    """Slow path of the single-query owner mutations: raise 404/403, or backfill owner_id
+    on RSVPs/messages created before it was stored (the caller then retries)"""
+    item = await collection.find_one({"id": item_id}, {"_id": 0, "invitation_id": 1, "owner_id": 1})
+    if not item:
+        raise HTTPException(status_code=404, detail=not_found)
+    
+    if "owner_id" not in item:
+        invitation = await db.invitations.find_one(
+            {"id": item["invitation_id"], "user_id": user_id}, {"_id": 0, "id": 1}
+        )
+        if invitation:
+            await collection.update_many(
+                {"invitation_id": item["invitation_id"], "owner_id": {"$exists": False}},
+                {"$set": {"owner_id": user_id}}
+            )
+            return
+    
+    raise HTTPException(status_code=403, detail="Not authorized")
+
+async def backfill_owner_ids() -> int:
+    """Copy invitation ownership onto RSVPs and messages that predate owner_id. Returns documents updated."""
+    updated = 0
+    async for invitation in db.invitations.find({}, {"_id": 0, "id": 1, "user_id": 1}):
+        for collection in (db.rsvps, db.messages):
+            result = await collection.update_many(
+                {"invitation_id": invitation["id"], "owner_id": {"$exists": False}},
+                {"$set": {"owner_id": invitation["user_id"]}}
+            )
+            updated += result.modified_count
+    return updated
+
+async def dedupe_rsvps() -> int:
+    """Assign guest_key to RSVPs created before it existed, keeping only each guest's latest
+    answer (older duplicates are deleted and rollups rebuilt). Returns documents removed."""
+    removed = 0
+    for invitation_id in await db.rsvps.distinct("invitation_id", {"guest_key": {"$exists": False}}):
+        rsvps = await db.rsvps.find(
+            {"invitation_id": invitation_id}, {"_id": 1, "guest_name": 1, "phone": 1, "guest_key": 1, "created_at": 1}
+        ).sort("created_at", -1).to_list(None)
+        
+        seen = set()
+        duplicates = []
+        updates = []
+        for rsvp in rsvps:
+            key = rsvp.get("guest_key") or rsvp_guest_key(rsvp.get("guest_name", ""), rsvp.get("phone", ""))
+            if key in seen:
+                duplicates.append(rsvp["_id"])
+                continue
+            seen.add(key)
+            if "guest_key" not in rsvp:
+                updates.append(UpdateOne({"_id": rsvp["_id"]}, {"$set": {"guest_key": key}}))
+        
+        if duplicates:
+            result = await db.rsvps.delete_many({"_id": {"$in": duplicates}})
+            removed += result.deleted_count
+        if updates:
+            await db.rsvps.bulk_write(updates, ordered=False)
+        if duplicates:
+            await rebuild_activity_rollups(invitation_id)
+    return removed
+
 # ============ RSVP ROUTES ============
 
+def rsvp_guest_key(guest_name: str, phone: str) -> str:
+    """Natural key of a guest within an invitation: phone number when given, otherwise the name"""
+    phone_digits = normalize_phone(phone)
+    if len(phone_digits) >= 6:
+        return f"phone:{phone_digits}"
+    return f"name:{normalize_search_text(guest_name)}"
+
 @api_router.post("/public/rsvp/{invitation_id}", response_model=RSVPResponse)
-async def create_rsvp(invitation_id: str, data: RSVPCreate):
-    invitation = await db.invitations.find_one({"id": invitation_id})
+async def create_rsvp(
+    invitation_id: str,
+    data: RSVPCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """Create or update the guest's RSVP; retries and changed answers update the same record"""
+    invitation = await db.invitations.find_one(
+        {"id": invitation_id, "archiving_at": {"$exists": False}}, {"_id": 0, "user_id": 1}
+    )
     if not invitation:
         raise HTTPException(status_code=404, detail="Invitation not found")
     
-    rsvp_id = str(uuid.uuid4())
     now = datetime.now(timezone.utc).isoformat()
-    
-    doc = {
-        "id": rsvp_id,
-        "invitation_id": invitation_id,
+    answer = {
         **data.model_dump(),
+        "guest_key": rsvp_guest_key(data.guest_name, data.phone),
+        "search_trigrams": rsvp_search_trigrams(data.guest_name, data.phone),
+        "updated_at": now
+    }
+    new_fields = {
+        "id": str(uuid.uuid4()),
+        "invitation_id": invitation_id,
+        "owner_id": invitation["user_id"],
         "created_at": now
     }
-    await db.rsvps.insert_one(doc)
     
-    result = await db.rsvps.find_one({"id": rsvp_id}, {"_id": 0})
+    # The guest (natural key) picks the document; an Idempotency-Key only ever identifies a retry
+    # of that guest's submission and must never redirect the write to another guest's RSVP.
+    # The key is claimed by the same write: the unique index on idempotency_keys refuses it when
+    # another guest's RSVP holds it, a replay by the same guest just finds it already there
+    update = {"$set": answer, "$setOnInsert": new_fields}
+    key = idempotency_key[:200] if idempotency_key else None
+    if key:
+        update["$addToSet"] = {"idempotency_keys": key}
+    
+    async def reject_foreign_key():
+        if key and await db.rsvps.find_one(
+            {"invitation_id": invitation_id, "idempotency_keys": key, "guest_key": {"$ne": answer["guest_key"]}},
+            {"_id": 1}
+        ):
+            raise HTTPException(status_code=409, detail="Idempotency-Key was already used for a different RSVP")
+    
+    async def upsert():
+        return await db.rsvps.find_one_and_update(
+            {"invitation_id": invitation_id, "guest_key": answer["guest_key"]},
+            update,
+            projection={"_id": 0, "search_trigrams": 0, "idempotency_keys": 0},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE
+        )
+    
+    try:
+        previous = await upsert()
+    except DuplicateKeyError:
+        await reject_foreign_key()
+        # A concurrent duplicate submission inserted first, this attempt now updates it
+        try:
+            previous = await upsert()
+        except DuplicateKeyError:
+            await reject_foreign_key()
+            raise HTTPException(status_code=409, detail="Conflicting RSVP submission, please try again")
+    
+    if previous is None:
+        result = {**new_fields, **answer}
+        await update_activity_rollups(invitation_id, now, rsvp_rollup_inc(result))
+        await enqueue_notification(invitation["user_id"], invitation_id, "rsvp", rsvp_notification_summary(result), now)
+    else:
+        result = {**previous, **answer}
+        old_inc, new_inc = rsvp_rollup_inc(previous), rsvp_rollup_inc(result)
+        delta = {k: new_inc.get(k, 0) - old_inc.get(k, 0) for k in set(old_inc) | set(new_inc)}
+        delta = {k: v for k, v in delta.items() if v}
+        if delta:
+            await update_activity_rollups(invitation_id, previous["created_at"], delta)
+            # Changed answer (not a retry of the same one)
+            await enqueue_notification(
+                invitation["user_id"], invitation_id, "rsvp_updated", rsvp_notification_summary(result), now
+            )
+    
     return result
 
 @api_router.get("/invitations/{invitation_id}/rsvps", response_model=List[RSVPResponse])
@@ -603,27 +2041,157 @@ async def get_invitation_rsvps(invitation_id: str, user: dict = Depends(get_curr
     if not invitation:
         raise HTTPException(status_code=404, detail="Invitation not found")
     
-    rsvps = await db.rsvps.find({"invitation_id": invitation_id}, {"_id": 0}).to_list(1000)
+    rsvps = await db.rsvps.find({"invitation_id": invitation_id}, {"_id": 0, "search_trigrams": 0}).to_list(1000)
     return rsvps
 
+@api_router.get("/invitations/{invitation_id}/rsvps/search", response_model=RSVPSearchResponse)
+async def search_invitation_rsvps(
+    invitation_id: str,
+    q: str = "",
+    attendance: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=SEARCH_MAX_LIMIT),
+    user: dict = Depends(get_current_user)
+):
+    """Search RSVPs by guest name or phone (partial/fuzzy), ranked and paginated"""
+    invitation = await db.invitations.find_one({"id": invitation_id, "user_id": user["id"]})
+    if not invitation:
+        raise HTTPException(status_code=404, detail="Invitation not found")
+    
+    base_filter = {"invitation_id": invitation_id}
+    if attendance:
+        base_filter["attendance"] = attendance
+    return await search_collection(db.rsvps, base_filter, q, page, limit)
+
 @api_router.delete("/rsvps/{rsvp_id}")
 async def delete_rsvp(rsvp_id: str, user: dict = Depends(get_current_user)):
-    rsvp = await db.rsvps.find_one({"id": rsvp_id})
+    owned = {"id": rsvp_id, "owner_id": user["id"]}
+    rsvp = await db.rsvps.find_one_and_delete(owned, projection={"_id": 0, "search_trigrams": 0})
     if not rsvp:
-        raise HTTPException(status_code=404, detail="RSVP not found")
+        await resolve_item_owner(db.rsvps, rsvp_id, user["id"], "RSVP not found")
+        rsvp = await db.rsvps.find_one_and_delete(owned, projection={"_id": 0, "search_trigrams": 0})
+        if not rsvp:
+            raise HTTPException(status_code=404, detail="RSVP not found")
     
-    invitation = await db.invitations.find_one({"id": rsvp["invitation_id"], "user_id": user["id"]})
-    if not invitation:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
-    await db.rsvps.delete_one({"id": rsvp_id})
+    await update_activity_rollups(rsvp["invitation_id"], rsvp["created_at"], rsvp_rollup_inc(rsvp, -1))
     return {"message": "RSVP deleted successfully"}
 
+# ============ MESSAGE MODERATION ============
+
+class BlocklistMatcher:
+    """Aho-Corasick automaton over blocklist terms, scan cost is linear in text length"""
+    
+    def __init__(self, terms: dict):
+        # terms: {term: action}, action is "flag" or "hold"
+        self.terms = list(terms.items())
+        self.goto: List[dict] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[int]] = [[]]
+        
+        for index, (term, _) in enumerate(self.terms):
+            node = 0
+            for char in term:
+                next_node = self.goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self.goto)
+                    self.goto[node][char] = next_node
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                node = next_node
+            self.output[node].append(index)
+        
+        # Breadth-first pass to compute failure links and merge outputs of suffixes
+        queue = list(self.goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and char not in self.goto[state]:
+                    state = self.fail[state]
+                target = self.goto[state].get(char, 0)
+                self.fail[child] = target if target != child else 0
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+    
+    def scan(self, text: str) -> List[tuple]:
+        """Return (term, action) pairs found in text"""
+        text = text.casefold()
+        goto, fail, output = self.goto, self.fail, self.output
+        found = {}
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for index in output[node]:
+                if index in found:
+                    continue
+                term, action = self.terms[index]
+                start = position - len(term) + 1
+                # Word terms only match whole words; URL/phrase fragments match anywhere
+                if term[0].isalnum() and start > 0 and text[start - 1].isalnum():
+                    continue
+                if term[-1].isalnum() and position + 1 < len(text) and text[position + 1].isalnum():
+                    continue
+                found[index] = (term, action)
+        return list(found.values())
+
+def load_blocklist(path: Path) -> dict:
+    """Parse blocklist file: one term per line, optional "flag:" / "hold:" prefix, # comments"""
+    terms = {}
+    if not path.exists():
+        return terms
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        action = MODERATION_DEFAULT_ACTION
+        prefix, _, rest = line.partition(":")
+        if prefix in ("flag", "hold") and rest:
+            action, line = prefix, rest.strip()
+        terms[line.casefold()] = action
+    return terms
+
+moderation_state = {"matcher": None, "mtime": None, "checked_at": 0.0}
+
+async def get_blocklist_matcher() -> BlocklistMatcher:
+    """Return the compiled blocklist, rebuilding it when the file changes on disk"""
+    now = time.monotonic()
+    if moderation_state["matcher"] is not None and now - moderation_state["checked_at"] < MODERATION_RELOAD_SECONDS:
+        return moderation_state["matcher"]
+    
+    moderation_state["checked_at"] = now
+    try:
+        mtime = MODERATION_BLOCKLIST_PATH.stat().st_mtime
+    except FileNotFoundError:
+        mtime = None
+    if moderation_state["matcher"] is None or mtime != moderation_state["mtime"]:
+        # Building thousands of terms takes a moment, do it off the event loop
+        terms = await asyncio.to_thread(load_blocklist, MODERATION_BLOCKLIST_PATH)
+        moderation_state["matcher"] = await asyncio.to_thread(BlocklistMatcher, terms)
+        moderation_state["mtime"] = mtime
+        logger.info("Loaded moderation blocklist with %d terms", len(terms))
+    return moderation_state["matcher"]
+
+async def moderate_message(guest_name: str, message: str) -> dict:
+    """Scan a guest message and decide whether it is shown, flagged or held for review"""
+    matcher = await get_blocklist_matcher()
+    matches = matcher.scan(f"{guest_name}\n{message}")
+    if not matches:
+        return {"status": "approved", "flagged_terms": []}
+    status_value = "held" if any(action == "hold" for _, action in matches) else "flagged"
+    return {"status": status_value, "flagged_terms": sorted(term for term, _ in matches)}
+
 # ============ MESSAGE ROUTES ============
 
 @api_router.post("/public/messages/{invitation_id}", response_model=MessageResponse)
 async def create_message(invitation_id: str, data: MessageCreate):
-    invitation = await db.invitations.find_one({"id": invitation_id})
+    invitation = await db.invitations.find_one(
+        {"id": invitation_id, "archiving_at": {"$exists": False}}, {"_id": 0, "user_id": 1}
+    )
     if not invitation:
         raise HTTPException(status_code=404, detail="Invitation not found")
     
@@ -633,21 +2201,29 @@ async def create_message(invitation_id: str, data: MessageCreate):
     doc = {
         "id": message_id,
         "invitation_id": invitation_id,
+        "owner_id": invitation["user_id"],
         **data.model_dump(),
         "reply": "",
+        **await moderate_message(data.guest_name, data.message),
+        "search_trigrams": message_search_trigrams(data.guest_name, data.message),
         "created_at": now
     }
     await db.messages.insert_one(doc)
+    await update_activity_rollups(invitation_id, now, {"total_messages": 1})
+    await enqueue_notification(invitation["user_id"], invitation_id, "message", {
+        "guest_name": doc["guest_name"],
+        "message": doc["message"][:280],
+        "status": doc["status"]
+    }, now)
+    if doc["status"] != "held":
+        await update_public_payload("messages", invitation_id)
     
     result = await db.messages.find_one({"id": message_id}, {"_id": 0})
     return result
 
 @api_router.get("/public/messages/{invitation_id}", response_model=List[MessageResponse])
-async def get_public_messages(invitation_id: str):
-    messages = await db.messages.find(
-        {"invitation_id": invitation_id}, {"_id": 0}
-    ).sort("created_at", -1).to_list(1000)
-    return messages
+async def get_public_messages(invitation_id: str, request: Request):
+    return await serve_public_payload(request, "messages", invitation_id)
 
 @api_router.get("/invitations/{invitation_id}/messages", response_model=List[MessageResponse])
 async def get_invitation_messages(invitation_id: str, user: dict = Depends(get_current_user)):
@@ -656,38 +2232,169 @@ async def get_invitation_messages(invitation_id: str, user: dict = Depends(get_c
         raise HTTPException(status_code=404, detail="Invitation not found")
     
     messages = await db.messages.find(
-        {"invitation_id": invitation_id}, {"_id": 0}
+        {"invitation_id": invitation_id}, {"_id": 0, "search_trigrams": 0}
     ).sort("created_at", -1).to_list(1000)
     return messages
 
-@api_router.put("/messages/{message_id}/reply", response_model=MessageResponse)
-async def reply_message(message_id: str, data: MessageReply, user: dict = Depends(get_current_user)):
-    message = await db.messages.find_one({"id": message_id})
-    if not message:
-        raise HTTPException(status_code=404, detail="Message not found")
-    
-    invitation = await db.invitations.find_one({"id": message["invitation_id"], "user_id": user["id"]})
+@api_router.get("/invitations/{invitation_id}/messages/search", response_model=MessageSearchResponse)
+async def search_invitation_messages(
+    invitation_id: str,
+    q: str = "",
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=SEARCH_MAX_LIMIT),
+    user: dict = Depends(get_current_user)
+):
+    """Search guestbook messages by guest name or text (partial/fuzzy), ranked and paginated"""
+    invitation = await db.invitations.find_one({"id": invitation_id, "user_id": user["id"]})
     if not invitation:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
-    await db.messages.update_one({"id": message_id}, {"$set": {"reply": data.reply}})
+        raise HTTPException(status_code=404, detail="Invitation not found")
     
-    result = await db.messages.find_one({"id": message_id}, {"_id": 0})
+    return await search_collection(db.messages, {"invitation_id": invitation_id}, q, page, limit)
+
+@api_router.put("/messages/{message_id}/reply", response_model=MessageResponse)
+async def reply_message(message_id: str, data: MessageReply, user: dict = Depends(get_current_user)):
+    result = await update_owned_message(message_id, user["id"], {"reply": data.reply})
+    await update_public_payload("messages", result["invitation_id"])
+    return result
+
+@api_router.put("/messages/{message_id}/moderation", response_model=MessageResponse)
+async def moderate_message_status(message_id: str, data: MessageModeration, user: dict = Depends(get_current_user)):
+    result = await update_owned_message(message_id, user["id"], {"status": data.status})
+    await update_public_payload("messages", result["invitation_id"])
     return result
 
 @api_router.delete("/messages/{message_id}")
 async def delete_message(message_id: str, user: dict = Depends(get_current_user)):
-    message = await db.messages.find_one({"id": message_id})
+    owned = {"id": message_id, "owner_id": user["id"]}
+    message = await db.messages.find_one_and_delete(owned, projection={"_id": 0, "invitation_id": 1, "created_at": 1})
     if not message:
-        raise HTTPException(status_code=404, detail="Message not found")
+        await resolve_item_owner(db.messages, message_id, user["id"], "Message not found")
+        message = await db.messages.find_one_and_delete(owned, projection={"_id": 0, "invitation_id": 1, "created_at": 1})
+        if not message:
+            raise HTTPException(status_code=404, detail="Message not found")
     
-    invitation = await db.invitations.find_one({"id": message["invitation_id"], "user_id": user["id"]})
-    if not invitation:
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
-    await db.messages.delete_one({"id": message_id})
+    await asyncio.gather(
+        update_activity_rollups(message["invitation_id"], message["created_at"], {"total_messages": -1}),
+        update_public_payload("messages", message["invitation_id"])
+    )
     return {"message": "Message deleted successfully"}
 
+async def update_owned_message(message_id: str, user_id: str, fields: dict) -> dict:
+    """Authorize and update an owner's message in one round trip, returns the updated message"""
+    owned = {"id": message_id, "owner_id": user_id}
+    update = {"$set": fields}
+    projection = {"_id": 0, "search_trigrams": 0}
+    result = await db.messages.find_one_and_update(
+        owned, update, projection=projection, return_document=ReturnDocument.AFTER
+    )
+    if not result:
+        await resolve_item_owner(db.messages, message_id, user_id, "Message not found")
+        result = await db.messages.find_one_and_update(
+            owned, update, projection=projection, return_document=ReturnDocument.AFTER
+        )
+        if not result:
+            raise HTTPException(status_code=404, detail="Message not found")
+    return result
+
+# ============ ACTIVITY ROLLUPS ============
+
+ROLLUP_GRANULARITIES = ("hour", "day")
+ROLLUP_COUNTERS = ("total_rsvp", "attending", "not_attending", "uncertain", "total_guests", "total_messages")
+ATTENDANCE_COUNTERS = {"hadir": "attending", "tidak_hadir": "not_attending", "belum_pasti": "uncertain"}
+
+def activity_bucket(created_at: str, granularity: str) -> str:
+    """UTC bucket key from an ISO timestamp: "2025-01-31T14:00" (hour) or "2025-01-31" (day)"""
+    return created_at[:13] + ":00" if granularity == "hour" else created_at[:10]
+
+def activity_bucket_bound(value: str, granularity: str, end: bool = False) -> str:
+    """Bucket key for a timeseries start/end; a date-only end includes that whole day"""
+    try:
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {value}")
+    if moment.tzinfo:
+        moment = moment.astimezone(timezone.utc)
+    if granularity == "day":
+        return moment.strftime("%Y-%m-%d")
+    if end and len(value) == 10:
+        return moment.strftime("%Y-%m-%dT23:00")
+    return moment.strftime("%Y-%m-%dT%H:00")
+
+def rsvp_rollup_inc(rsvp: dict, sign: int = 1) -> dict:
+    inc = {"total_rsvp": sign}
+    counter = ATTENDANCE_COUNTERS.get(rsvp.get("attendance"))
+    if counter:
+        inc[counter] = sign
+    if rsvp.get("attendance") == "hadir":
+        inc["total_guests"] = sign * rsvp.get("guest_count", 0)
+    return inc
+
+async def update_activity_rollups(invitation_id: str, created_at: str, inc: dict):
+    """Apply counter deltas to the hour and day buckets of an RSVP/message"""
+    ops = [
+        UpdateOne(
+            {"invitation_id": invitation_id, "granularity": granularity, "bucket": activity_bucket(created_at, granularity)},
+            {"$inc": inc},
+            upsert=True
+        )
+        for granularity in ROLLUP_GRANULARITIES
+    ]
+    try:
+        await db.activity_rollups.bulk_write(ops, ordered=False)
+    except Exception as e:
+        # Rollups can be rebuilt from raw data, never fail the guest's request over them
+        logger.warning(f"Rollup update failed for {invitation_id}: {e}")
+
+async def rebuild_activity_rollups(invitation_id: Optional[str] = None) -> int:
+    """Recompute rollups from raw RSVPs and messages (one invitation, or all). Returns invitations processed."""
+    if invitation_id:
+        invitation_ids = [invitation_id]
+    else:
+        invitation_ids = await db.invitations.distinct("id")
+    
+    hour_key = {"$concat": [{"$substrCP": ["$created_at", 0, 13]}, ":00"]}
+    is_attending = {"$eq": ["$attendance", "hadir"]}
+    
+    for inv_id in invitation_ids:
+        hourly = {}
+        rsvp_rows = await db.rsvps.aggregate([
+            {"$match": {"invitation_id": inv_id}},
+            {"$group": {
+                "_id": hour_key,
+                "total_rsvp": {"$sum": 1},
+                "attending": {"$sum": {"$cond": [is_attending, 1, 0]}},
+                "not_attending": {"$sum": {"$cond": [{"$eq": ["$attendance", "tidak_hadir"]}, 1, 0]}},
+                "uncertain": {"$sum": {"$cond": [{"$eq": ["$attendance", "belum_pasti"]}, 1, 0]}},
+                "total_guests": {"$sum": {"$cond": [is_attending, "$guest_count", 0]}}
+            }}
+        ]).to_list(None)
+        message_rows = await db.messages.aggregate([
+            {"$match": {"invitation_id": inv_id}},
+            {"$group": {"_id": hour_key, "total_messages": {"$sum": 1}}}
+        ]).to_list(None)
+        
+        for row in rsvp_rows + message_rows:
+            bucket = hourly.setdefault(row["_id"], dict.fromkeys(ROLLUP_COUNTERS, 0))
+            for counter in ROLLUP_COUNTERS:
+                bucket[counter] += row.get(counter, 0)
+        
+        daily = {}
+        for hour, counts in hourly.items():
+            day = daily.setdefault(hour[:10], dict.fromkeys(ROLLUP_COUNTERS, 0))
+            for counter in ROLLUP_COUNTERS:
+                day[counter] += counts[counter]
+        
+        docs = [
+            {"invitation_id": inv_id, "granularity": granularity, "bucket": bucket, **counts}
+            for granularity, buckets in (("hour", hourly), ("day", daily))
+            for bucket, counts in buckets.items()
+        ]
+        await db.activity_rollups.delete_many({"invitation_id": inv_id})
+        if docs:
+            await db.activity_rollups.insert_many(docs)
+    
+    return len(invitation_ids)
+
 # ============ STATS ROUTE ============
 
 @api_router.get("/invitations/{invitation_id}/stats", response_model=StatsResponse)
@@ -713,6 +2420,1114 @@ async def get_invitation_stats(invitation_id: str, user: dict = Depends(get_curr
         total_messages=messages
     )
 
+@api_router.get("/invitations/{invitation_id}/timeseries", response_model=TimeSeriesResponse)
+async def get_invitation_timeseries(
+    invitation_id: str,
+    granularity: Literal["hour", "day"] = "day",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    user: dict = Depends(get_current_user)
+):
+    """RSVP/message counts per UTC hour or day bucket; empty buckets are omitted"""
+    invitation = await db.invitations.find_one({"id": invitation_id, "user_id": user["id"]})
+    if not invitation:
+        raise HTTPException(status_code=404, detail="Invitation not found")
+    
+    query = {"invitation_id": invitation_id, "granularity": granularity}
+    bucket_range = {}
+    if start:
+        bucket_range["$gte"] = activity_bucket_bound(start, granularity)
+    if end:
+        bucket_range["$lte"] = activity_bucket_bound(end, granularity, end=True)
+    if bucket_range:
+        query["bucket"] = bucket_range
+    
+    points = await db.activity_rollups.find(query, {"_id": 0}).sort("bucket", 1).to_list(5000)
+    return TimeSeriesResponse(granularity=granularity, points=points)
+
+@api_router.post("/invitations/{invitation_id}/timeseries/rebuild")
+async def rebuild_invitation_timeseries(invitation_id: str, user: dict = Depends(get_current_user)):
+    """Recompute this invitation's rollups from raw RSVPs and messages"""
+    invitation = await db.invitations.find_one({"id": invitation_id, "user_id": user["id"]})
+    if not invitation:
+        raise HTTPException(status_code=404, detail="Invitation not found")
+    
+    await rebuild_activity_rollups(invitation_id)
+    return {"message": "Time series rebuilt successfully"}
+
+# ============ ARCHIVAL ============
+
+def pack_archive(invitation: dict, rsvps: List[dict], messages: List[dict]) -> dict:
+    """Archive document: listing metadata plus the gzipped invitation, RSVPs and messages"""
+    body = json.dumps(
+        {"invitation": invitation, "rsvps": rsvps, "messages": messages},
+        separators=(",", ":"), default=str
+    ).encode()
+    return {
+        "id": invitation["id"],
+        "user_id": invitation["user_id"],
+        "groom_name": invitation.get("groom", {}).get("name", ""),
+        "bride_name": invitation.get("bride", {}).get("name", ""),
+        "last_event_date": invitation.get("last_event_date"),
+        "rsvp_count": len(rsvps),
+        "message_count": len(messages),
+        "archived_at": datetime.now(timezone.utc).isoformat(),
+        "payload": gzip.compress(body, compresslevel=6)
+    }
+
+def ignore_duplicate_keys(e: BulkWriteError):
+    """Re-raise a bulk write error unless every failure is a duplicate key"""
+    if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+        raise e
+
+async def backfill_last_event_dates() -> int:
+    """Store last_event_date on invitations created before it existed. Returns invitations updated."""
+    batch = []
+    updated = 0
+    async for invitation in db.invitations.find({"last_event_date": {"$exists": False}}, {"_id": 1, "events": 1}):
+        batch.append(UpdateOne({"_id": invitation["_id"]}, {"$set": {"last_event_date": last_event_date(invitation.get("events"))}}))
+        if len(batch) >= 500:
+            updated += (await db.invitations.bulk_write(batch, ordered=False)).modified_count
+            batch = []
+    if batch:
+        updated += (await db.invitations.bulk_write(batch, ordered=False)).modified_count
+    return updated
+
+def unpack_archive(archive: dict) -> dict:
+    return json.loads(gzip.decompress(archive["payload"]))
+
+async def archive_pass(ids: List[str], contents: dict) -> set:
+    """Copy the invitations' current RSVPs and messages into their archives, then delete the rows
+    still identical to their copy. Returns the invitations that have rows left (written or changed meanwhile)."""
+    invitations = await db.invitations.find({"id": {"$in": ids}}, {"_id": 0, "archiving_at": 0}).to_list(None)
+    rsvps, messages = await asyncio.gather(
+        db.rsvps.find({"invitation_id": {"$in": ids}}, {"_id": 0, "search_trigrams": 0}).to_list(None),
+        db.messages.find({"invitation_id": {"$in": ids}}, {"_id": 0, "search_trigrams": 0}).to_list(None)
+    )
+    for invitation in invitations:
+        contents[invitation["id"]]["invitation"] = invitation
+    for rsvp in rsvps:
+        contents[rsvp["invitation_id"]]["rsvps"][rsvp["id"]] = rsvp
+    for message in messages:
+        contents[message["invitation_id"]]["messages"][message["id"]] = message
+    
+    # Compression is CPU-bound, keep it off the event loop
+    archives = await asyncio.to_thread(lambda: [
+        pack_archive(c["invitation"], list(c["rsvps"].values()), list(c["messages"].values()))
+        for c in (contents[invitation["id"]] for invitation in invitations)
+    ])
+    if archives:
+        await db.invitation_archives.bulk_write(
+            [ReplaceOne({"id": archive["id"]}, archive, upsert=True) for archive in archives], ordered=False
+        )
+    
+    # The copy itself is the filter: a row changed after the read no longer matches and stays for the next pass
+    await asyncio.gather(*[
+        collection.bulk_write([DeleteOne(row) for row in rows], ordered=False)
+        for collection, rows in ((db.rsvps, rsvps), (db.messages, messages)) if rows
+    ])
+    left = await asyncio.gather(
+        db.rsvps.distinct("invitation_id", {"invitation_id": {"$in": ids}}),
+        db.messages.distinct("invitation_id", {"invitation_id": {"$in": ids}})
+    )
+    return set(left[0]) | set(left[1])
+
+async def archive_past_invitations(retention_days: int = ARCHIVE_RETENTION_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Move invitations whose last event is past the retention window, with their RSVPs and messages,
+    into compressed archives, one batch at a time. Returns invitations archived."""
+    await backfill_last_event_dates()
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    query = {
+        "last_event_date": {"$lt": cutoff.date().isoformat()},
+        # A restored invitation gets a fresh retention window
+        "$or": [{"restored_at": {"$exists": False}}, {"restored_at": {"$lt": cutoff.isoformat()}}]
+    }
+    
+    archived = 0
+    # Invitations still receiving writes after every pass, retried by the next run
+    postponed = []
+    while True:
+        batch = await db.invitations.find(
+            {**query, "id": {"$nin": postponed}}, {"_id": 0, "id": 1}
+        ).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        ids = [inv["id"] for inv in batch]
+        
+        # Guest RSVPs/messages are refused from here on; writes already in flight are picked up by later passes
+        await db.invitations.update_many(
+            {"id": {"$in": ids}}, {"$set": {"archiving_at": datetime.now(timezone.utc).isoformat()}}
+        )
+        contents = {inv_id: {"rsvps": {}, "messages": {}} for inv_id in ids}
+        # An interrupted earlier run may have archived (and deleted) rows already, start from its copy
+        async for archive in db.invitation_archives.find({"id": {"$in": ids}}, {"_id": 0, "id": 1, "payload": 1}):
+            data = await asyncio.to_thread(unpack_archive, archive)
+            contents[archive["id"]]["rsvps"].update((rsvp["id"], rsvp) for rsvp in data["rsvps"])
+            contents[archive["id"]]["messages"].update((message["id"], message) for message in data["messages"])
+        
+        pending = ids
+        for _ in range(ARCHIVE_MAX_PASSES):
+            pending = [inv_id for inv_id in pending if inv_id in await archive_pass(pending, contents)]
+            if not pending:
+                break
+        if pending:
+            logger.warning("%d invitations kept changing while archiving, retried on the next run", len(pending))
+            postponed.extend(pending)
+        
+        done = [inv_id for inv_id in ids if inv_id not in pending]
+        payload_keys = [f"{kind}:{inv_id}" for inv_id in done for kind in PUBLIC_PAYLOAD_BUILDERS]
+        await asyncio.gather(
+            db.invitations.delete_many({"id": {"$in": done}}),
+            db.activity_rollups.delete_many({"invitation_id": {"$in": done}}),
+            db.invitation_views.delete_many({"invitation_id": {"$in": done}}),
+            db.public_payloads.delete_many({"key": {"$in": payload_keys}})
+        )
+        archived += len(done)
+        logger.info("Archived %d invitations (%d so far)", len(done), archived)
+    
+    return archived
+
+async def restore_archived_invitation(invitation_id: str, user_id: Optional[str] = None) -> bool:
+    """Put an archived invitation, its RSVPs and messages back into the hot collections"""
+    query = {"id": invitation_id}
+    if user_id:
+        query["user_id"] = user_id
+    archive = await db.invitation_archives.find_one(query)
+    if not archive:
+        return False
+    
+    data = await asyncio.to_thread(unpack_archive, archive)
+    invitation = {**data["invitation"], "restored_at": datetime.now(timezone.utc).isoformat()}
+    await db.invitations.replace_one({"id": invitation_id}, invitation, upsert=True)
+    
+    for collection, docs, build, fields in (
+        (db.rsvps, data["rsvps"], rsvp_search_trigrams, ("guest_name", "phone")),
+        (db.messages, data["messages"], message_search_trigrams, ("guest_name", "message")),
+    ):
+        for doc in docs:
+            doc["search_trigrams"] = build(*(doc.get(f, "") for f in fields))
+        if docs:
+            try:
+                await collection.insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                # Partially restored before, the rest still goes in
+                ignore_duplicate_keys(e)
+    
+    await rebuild_activity_rollups(invitation_id)
+    await asyncio.gather(*[update_public_payload(kind, invitation_id) for kind in PUBLIC_PAYLOAD_BUILDERS])
+    await db.invitation_archives.delete_one({"id": invitation_id})
+    return True
+
+@api_router.get("/archives", response_model=List[ArchivedInvitation])
+async def get_archived_invitations(user: dict = Depends(get_current_user)):
+    """The user's archived invitations (past events moved out of the dashboard)"""
+    return await db.invitation_archives.find(
+        {"user_id": user["id"]}, {"_id": 0, "payload": 0}
+    ).sort("last_event_date", -1).to_list(100)
+
+@api_router.post("/archives/{invitation_id}/restore")
+async def restore_invitation(invitation_id: str, user: dict = Depends(get_current_user)):
+    """Bring an archived invitation back with its RSVPs and messages"""
+    if not await restore_archived_invitation(invitation_id, user["id"]):
+        raise HTTPException(status_code=404, detail="Archived invitation not found")
+    return {"message": "Invitation restored successfully"}
+
+# ============ OWNER NOTIFICATIONS ============
+
+def rsvp_notification_summary(rsvp: dict) -> dict:
+    return {
+        "guest_name": rsvp["guest_name"],
+        "attendance": rsvp["attendance"],
+        "guest_count": rsvp.get("guest_count", 0)
+    }
+
+async def enqueue_notification(owner_id: str, invitation_id: str, kind: str, summary: dict, now: str):
+    """Record an owner notification in the outbox; the background worker batches and delivers it"""
+    try:
+        await db.notification_outbox.insert_one({
+            "id": str(uuid.uuid4()),
+            "owner_id": owner_id,
+            "invitation_id": invitation_id,
+            "kind": kind,
+            **summary,
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now
+        })
+    except Exception as e:
+        # Notifications are best effort, never fail the guest's request over them
+        logger.warning(f"Could not enqueue notification for {invitation_id}: {e}")
+
+class UnsafeWebhookURL(ValueError):
+    """Webhook URL that is not http(s) or does not resolve to public addresses only"""
+
+def check_webhook_url(url: str):
+    """Resolve the webhook host and refuse private, loopback, link-local and reserved addresses (SSRF)"""
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise UnsafeWebhookURL("Webhook URL must be http(s)")
+    if parts.hostname.lower() in NOTIFY_WEBHOOK_ALLOWED_HOSTS:
+        return
+    try:
+        infos = socket.getaddrinfo(parts.hostname, parts.port or None, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, ValueError):
+        raise UnsafeWebhookURL("Webhook host does not resolve")
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise UnsafeWebhookURL("Webhook URL must point to a public address")
+
+class WebhookSender:
+    """POSTs the digest as JSON to the owner's webhook URL"""
+    
+    def destination(self, owner: dict) -> Optional[str]:
+        return (owner.get("notification_settings") or {}).get("webhook_url") or None
+    
+    async def send(self, destination: str, digest: dict):
+        await asyncio.to_thread(self._send, destination, digest)
+    
+    def _send(self, destination: str, digest: dict):
+        # Checked again on every send, the host may resolve elsewhere than when the URL was saved
+        check_webhook_url(destination)
+        response = requests.post(
+            destination, json=digest,
+            # Same events keep the same digest id across retries, so receivers can dedupe
+            headers={"X-Undanganku-Digest": digest["id"]},
+            timeout=NOTIFY_SEND_TIMEOUT_SECONDS,
+            # A redirect could point anywhere, including internal addresses
+            allow_redirects=False
+        )
+        if response.is_redirect:
+            raise requests.HTTPError(f"Webhook answered {response.status_code} redirect, redirects are not followed")
+        response.raise_for_status()
+
+class EmailSender:
+    """Emails a plain-text digest to the owner's account address over SMTP"""
+    
+    def destination(self, owner: dict) -> Optional[str]:
+        return owner["email"] if (owner.get("notification_settings") or {}).get("email") else None
+    
+    async def send(self, destination: str, digest: dict):
+        await asyncio.to_thread(self._send, destination, digest)
+    
+    def _send(self, destination: str, digest: dict):
+        lines = []
+        for event in digest["events"]:
+            if event["kind"] == "message":
+                lines.append(f"- {event['guest_name']}: {event['message']}")
+            else:
+                lines.append(f"- {event['guest_name']} ({event['attendance']}, {event['guest_count']} orang)")
+        
+        email = EmailMessage()
+        email["Subject"] = f"{digest['counts']['rsvp']} RSVP baru, {digest['counts']['message']} ucapan baru"
+        email["From"] = SMTP_FROM
+        email["To"] = destination
+        email.set_content("\n".join(lines))
+        with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=NOTIFY_SEND_TIMEOUT_SECONDS) as smtp:
+            if SMTP_USER:
+                smtp.starttls()
+                smtp.login(SMTP_USER, SMTP_PASSWORD)
+            smtp.send_message(email)
+
+NOTIFICATION_SENDERS = {
+    "webhook": WebhookSender,
+    "email": EmailSender,
+}
+unknown_channels = sorted(set(NOTIFY_CHANNELS) - set(NOTIFICATION_SENDERS))
+if unknown_channels:
+    raise RuntimeError(
+        f"NOTIFY_CHANNELS has unknown channel(s) {', '.join(unknown_channels)}; "
+        f"valid channels are {', '.join(NOTIFICATION_SENDERS)}"
+    )
+notification_senders = {channel: NOTIFICATION_SENDERS[channel]() for channel in NOTIFY_CHANNELS}
+
+OUTBOX_BOOKKEEPING_FIELDS = (
+    "owner_id", "status", "attempts", "next_attempt_at", "digest_id", "claimed_at",
+    "delivered_channels", "last_error", "expires_at"
+)
+
+def build_digest(owner_id: str, events: List[dict]) -> dict:
+    event_ids = sorted(event["id"] for event in events)
+    return {
+        "id": hashlib.sha1("".join(event_ids).encode()).hexdigest(),
+        "owner_id": owner_id,
+        "counts": {
+            "rsvp": sum(1 for e in events if e["kind"] != "message"),
+            "message": sum(1 for e in events if e["kind"] == "message")
+        },
+        "events": [
+            {k: v for k, v in event.items() if k not in OUTBOX_BOOKKEEPING_FIELDS}
+            for event in sorted(events, key=lambda e: e["created_at"])
+        ]
+    }
+
+async def deliver_owner_digest(owner_id: str, now: datetime) -> int:
+    """Claim the owner's due events, send them as one digest, then drop them or schedule a retry.
+    Returns events delivered."""
+    now_iso = now.isoformat()
+    pending = {"owner_id": owner_id, "status": "pending", "next_attempt_at": {"$lte": now_iso}}
+    candidate_ids = [
+        e["id"] for e in await db.notification_outbox.find(pending, {"_id": 0, "id": 1})
+        .sort("created_at", 1).limit(NOTIFY_DIGEST_MAX_EVENTS * 5).to_list(None)
+    ]
+    if not candidate_ids:
+        return 0
+    
+    # Claim first, so another API worker polling at the same time can't send the same events
+    claim_id = str(uuid.uuid4())
+    await db.notification_outbox.update_many(
+        {"id": {"$in": candidate_ids}, "status": "pending"},
+        {"$set": {"status": "sending", "digest_id": claim_id, "claimed_at": now_iso}}
+    )
+    events = await db.notification_outbox.find({"digest_id": claim_id}, {"_id": 0}).to_list(None)
+    if not events:
+        return 0
+    
+    owner = await db.users.find_one({"id": owner_id}, {"_id": 0, "email": 1, "notification_settings": 1})
+    destinations = {
+        channel: sender.destination(owner) for channel, sender in notification_senders.items()
+    } if owner else {}
+    destinations = {channel: destination for channel, destination in destinations.items() if destination}
+    if not destinations:
+        # Nothing to deliver to, don't let the outbox grow
+        await db.notification_outbox.delete_many({"digest_id": claim_id})
+        return 0
+    
+    errors = {}
+    for channel, destination in destinations.items():
+        # After a partial failure, retries only go to the channels that still miss the events
+        todo = [event for event in events if channel not in event.get("delivered_channels", [])]
+        if not todo:
+            continue
+        try:
+            await notification_senders[channel].send(destination, build_digest(owner_id, todo))
+        except Exception as e:
+            errors[channel] = e
+            continue
+        await db.notification_outbox.update_many(
+            {"id": {"$in": [event["id"] for event in todo]}}, {"$addToSet": {"delivered_channels": channel}}
+        )
+    
+    if errors:
+        attempts = max(event["attempts"] for event in events) + 1
+        if attempts >= NOTIFY_MAX_ATTEMPTS or any(isinstance(e, UnsafeWebhookURL) for e in errors.values()):
+            # Dead letters stay for inspection until the TTL index removes them
+            retry = {"status": "dead", "expires_at": now + timedelta(days=NOTIFY_DEAD_LETTER_TTL_DAYS)}
+        else:
+            retry = {
+                "status": "pending",
+                "next_attempt_at": (now + timedelta(
+                    seconds=NOTIFY_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1) * random.uniform(0.8, 1.2)
+                )).isoformat()
+            }
+        last_error = "; ".join(f"{channel}: {e}" for channel, e in errors.items())
+        await db.notification_outbox.update_many(
+            {"digest_id": claim_id},
+            {"$set": {"attempts": attempts, "last_error": last_error[:500], **retry}, "$unset": {"digest_id": "", "claimed_at": ""}}
+        )
+        logger.warning(f"Digest delivery to {owner_id} failed (attempt {attempts}): {last_error}")
+        return 0
+    
+    await db.notification_outbox.delete_many({"digest_id": claim_id})
+    return len(events)
+
+async def deliver_due_digests() -> int:
+    """One worker pass: send a digest to every owner with enough events or events old enough.
+    Returns events delivered."""
+    now = datetime.now(timezone.utc)
+    
+    # Events claimed by a worker that died mid-send go back to pending
+    await db.notification_outbox.update_many(
+        {"status": "sending", "claimed_at": {"$lt": (now - timedelta(seconds=NOTIFY_CLAIM_LEASE_SECONDS)).isoformat()}},
+        {"$set": {"status": "pending"}, "$unset": {"digest_id": "", "claimed_at": ""}}
+    )
+    
+    owners = await db.notification_outbox.aggregate([
+        {"$match": {"status": "pending", "next_attempt_at": {"$lte": now.isoformat()}}},
+        {"$group": {"_id": "$owner_id", "count": {"$sum": 1}, "oldest": {"$min": "$created_at"}}}
+    ]).to_list(None)
+    
+    digest_cutoff = (now - timedelta(seconds=NOTIFY_DIGEST_SECONDS)).isoformat()
+    due = [o["_id"] for o in owners if o["count"] >= NOTIFY_DIGEST_MAX_EVENTS or o["oldest"] <= digest_cutoff]
+    delivered = await asyncio.gather(*[deliver_owner_digest(owner_id, now) for owner_id in due])
+    return sum(delivered)
+
+async def run_notification_worker():
+    while True:
+        try:
+            await deliver_due_digests()
+        except Exception as e:
+            logger.warning(f"Notification worker pass failed: {e}")
+        await asyncio.sleep(NOTIFY_POLL_SECONDS)
+
+# ============ VIEW ANALYTICS ============
+
+class HyperLogLog:
+    """Unique-count sketch: ~1.6% standard error at precision 12, 4 KB when dense.
+    Starts sparse (a small dict) since most invitations see few visitors per day."""
+    SPARSE_MAX = 32
+    
+    def __init__(self, precision: int = VIEW_HLL_PRECISION):
+        self.p = precision
+        self.m = 1 << precision
+        self.sparse = {}
+        self.dense = None
+    
+    def add(self, key: bytes):
+        h = int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "big")
+        index = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        self._set(index, rank)
+    
+    def _set(self, index: int, rank: int):
+        if self.dense is not None:
+            if rank > self.dense[index]:
+                self.dense[index] = rank
+        elif rank > self.sparse.get(index, 0):
+            self.sparse[index] = rank
+            if len(self.sparse) > self.SPARSE_MAX:
+                self._densify()
+    
+    def _densify(self):
+        # Filled before it is published, to_bytes may be reading from another thread
+        dense = np.zeros(self.m, dtype=np.uint8)
+        if self.sparse:
+            dense[list(self.sparse)] = list(self.sparse.values())
+        self.dense = dense
+        self.sparse = {}
+    
+    def merge(self, other: "HyperLogLog"):
+        if other.dense is None:
+            for index, rank in other.sparse.items():
+                self._set(index, rank)
+            return
+        if self.dense is None:
+            self._densify()
+        np.maximum(self.dense, other.dense, out=self.dense)
+    
+    def estimate(self) -> int:
+        if self.dense is not None:
+            set_ranks = self.dense[self.dense > 0].astype(np.float64)
+        else:
+            set_ranks = np.array(list(self.sparse.values()), dtype=np.float64)
+        zeros = self.m - len(set_ranks)
+        harmonic = zeros + float(np.exp2(-set_ranks).sum())
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / harmonic
+        if estimate <= 2.5 * self.m and zeros:
+            # Small range: linear counting is more accurate
+            estimate = self.m * math.log(self.m / zeros)
+        return round(estimate)
+    
+    def to_bytes(self) -> bytes:
+        # Views keep being added on the event loop while a flush serializes in a worker thread:
+        # _densify publishes dense before it drops sparse, so reading sparse first always finds one of them whole
+        sparse, dense = self.sparse, self.dense
+        # Set registers only (big-endian uint16 indexes, then ranks) is smaller until a third are set
+        if dense is not None:
+            indexes = np.flatnonzero(dense)
+            if len(indexes) * 3 >= self.m:
+                return b"D" + dense.tobytes()
+            ranks = dense[indexes]
+        else:
+            items = sorted(sparse.items())
+            indexes = np.array([index for index, _ in items], dtype=np.int64)
+            ranks = np.array([rank for _, rank in items], dtype=np.uint8)
+        return b"S" + indexes.astype(">u2").tobytes() + ranks.tobytes()
+    
+    @classmethod
+    def from_bytes(cls, data: bytes, precision: int = VIEW_HLL_PRECISION) -> "HyperLogLog":
+        sketch = cls(precision)
+        if data[:1] == b"D":
+            sketch.dense = np.frombuffer(data, dtype=np.uint8, offset=1).copy()
+            return sketch
+        count = (len(data) - 1) // 3
+        indexes = np.frombuffer(data, dtype=">u2", count=count, offset=1)
+        ranks = np.frombuffer(data, dtype=np.uint8, offset=1 + 2 * count)
+        if count > cls.SPARSE_MAX:
+            sketch.dense = np.zeros(sketch.m, dtype=np.uint8)
+            sketch.dense[indexes] = ranks
+        else:
+            sketch.sparse = dict(zip(indexes.tolist(), ranks.tolist()))
+        return sketch
+
+def visitor_key(request: Request) -> bytes:
+    """Anonymous per-day visitor identity: a salted hash of client IP and user agent, never stored"""
+    forwarded = request.headers.get("x-forwarded-for", "")
+    ip = forwarded.split(",")[0].strip() or (request.client.host if request.client else "")
+    day = datetime.now(timezone.utc).date().isoformat()
+    return hashlib.sha256(f"{JWT_SECRET}|{day}|{ip}|{request.headers.get('user-agent', '')}".encode()).digest()
+
+class ViewTracker:
+    """Per-process view counters and unique-visitor sketches per (invitation, UTC day)"""
+    
+    def __init__(self):
+        # (invitation_id, day) -> [views not yet flushed, sketch of the day's visitors, sketch changed]
+        self.entries = {}
+    
+    def record(self, invitation_id: str, visitor: bytes, day: Optional[str] = None):
+        day = day or datetime.now(timezone.utc).date().isoformat()
+        entry = self.entries.get((invitation_id, day))
+        if entry is None:
+            entry = self.entries[(invitation_id, day)] = [0, HyperLogLog(), False]
+        entry[0] += 1
+        entry[1].add(visitor)
+        entry[2] = True
+    
+    def pending(self) -> list:
+        """What changed since the last flush as (key, views, sketch); cheap, no serialization"""
+        return [(key, entry[0], entry[1]) for key, entry in self.entries.items() if entry[2]]
+    
+    @staticmethod
+    def build_updates(pending: list) -> list:
+        """Bulk-write ops for part of pending(); serializes the sketches, so it runs off the event loop"""
+        now = datetime.now(timezone.utc).isoformat()
+        # Each process owns its document per day, so its cumulative sketch can simply overwrite it
+        return [
+            UpdateOne(
+                {"invitation_id": invitation_id, "day": day, "worker_id": VIEW_WORKER_ID},
+                {"$inc": {"views": views}, "$set": {"sketch": sketch.to_bytes(), "updated_at": now}},
+                upsert=True
+            )
+            for (invitation_id, day), views, sketch in pending
+        ]
+    
+    def mark_flushed(self, flushed: list):
+        today = datetime.now(timezone.utc).date().isoformat()
+        for key, views in flushed:
+            entry = self.entries[key]
+            # Views recorded while the write was in flight stay pending
+            entry[0] -= views
+            entry[2] = entry[0] > 0
+            if key[1] < today and not entry[2]:
+                del self.entries[key]
+
+view_tracker = ViewTracker()
+
+async def flush_view_counters() -> int:
+    """Write pending view counts and sketches, one bulk_write per chunk. Returns documents written."""
+    pending = view_tracker.pending()
+    written = 0
+    for start in range(0, len(pending), VIEW_FLUSH_CHUNK):
+        chunk = pending[start:start + VIEW_FLUSH_CHUNK]
+        ops = await asyncio.to_thread(ViewTracker.build_updates, chunk)
+        await db.invitation_views.bulk_write(ops, ordered=False)
+        # Chunks already written stay flushed if a later one fails
+        view_tracker.mark_flushed([(key, views) for key, views, _ in chunk])
+        written += len(ops)
+    return written
+
+async def run_view_flusher():
+    while True:
+        await asyncio.sleep(VIEW_FLUSH_SECONDS)
+        try:
+            await flush_view_counters()
+        except Exception as e:
+            # Counts stay in memory and go out with the next flush
+            logger.warning(f"View counter flush failed: {e}")
+
+@api_router.get("/invitations/{invitation_id}/views", response_model=ViewStatsResponse)
+async def get_invitation_views(
+    invitation_id: str,
+    days: int = Query(30, ge=1, le=366),
+    user: dict = Depends(get_current_user)
+):
+    """Page views and unique visitors per UTC day (up to one flush interval behind)"""
+    invitation = await db.invitations.find_one({"id": invitation_id, "user_id": user["id"]})
+    if not invitation:
+        raise HTTPException(status_code=404, detail="Invitation not found")
+    
+    start = (datetime.now(timezone.utc) - timedelta(days=days - 1)).date().isoformat()
+    docs = await db.invitation_views.find(
+        {"invitation_id": invitation_id, "day": {"$gte": start}}, {"_id": 0, "day": 1, "views": 1, "sketch": 1}
+    ).to_list(None)
+    
+    per_day = {}
+    for doc in docs:
+        entry = per_day.setdefault(doc["day"], [0, HyperLogLog()])
+        entry[0] += doc["views"]
+        entry[1].merge(HyperLogLog.from_bytes(doc["sketch"]))
+    
+    # Visitor keys are salted per day, so the range total is a union of independent daily visitors
+    total = HyperLogLog()
+    points = []
+    for day in sorted(per_day):
+        views, sketch = per_day[day]
+        total.merge(sketch)
+        points.append(ViewPoint(day=day, views=views, unique_visitors=sketch.estimate()))
+    
+    return ViewStatsResponse(
+        total_views=sum(p.views for p in points),
+        unique_visitors=total.estimate(),
+        points=points
+    )
+
+# ============ MONGO TIME BUDGETS & CIRCUIT BREAKER ============
+
+PUBLIC_PAYLOAD_PATH = re.compile(r"^/api/public/(invitation|messages)/([^/]+)$")
+# Routes that never touch Mongo (API root, static theme catalogue, breaker health) bypass the guard
+MONGO_FREE_PATH = re.compile(r"^/api/(themes(/(?!css/)[^/]+)?|health/mongo)?$")
+
+def is_mongo_unavailable(error: Exception) -> bool:
+    """Timeouts and connection failures, as opposed to errors in the operation itself"""
+    return isinstance(error, ConnectionFailure) or (isinstance(error, PyMongoError) and error.timeout)
+
+def route_time_budget(path: str) -> float:
+    for prefix, budget in MONGO_ROUTE_TIME_BUDGETS:
+        if path.startswith(prefix):
+            return budget
+    return MONGO_DEFAULT_TIME_BUDGET_SECONDS
+
+class CircuitBreaker:
+    """Closed -> open when the failure ratio over a sliding window is too high, half-open probes after a cooldown"""
+    
+    def __init__(self, failure_ratio: float, min_requests: int, window_seconds: float, cooldown_seconds: float):
+        self.failure_ratio = failure_ratio
+        self.min_requests = min_requests
+        self.window_seconds = window_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.state = "closed"
+        self.outcomes = deque()  # (monotonic time, ok)
+        self.opened_at = 0.0
+        self.probing = False
+        self.trips = 0
+        self.recoveries = 0
+        self.failures = 0
+        self.rejected = 0
+        self.last_trip_at: Optional[str] = None
+        self.last_recovery_at: Optional[str] = None
+    
+    def allow(self) -> bool:
+        """Whether a request may go to Mongo; in half-open state only one probe at a time does"""
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown_seconds:
+            self.state = "half_open"
+        if self.state == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        self.rejected += 1
+        return False
+    
+    def record_success(self):
+        if self.state == "half_open":
+            self.state = "closed"
+            self.probing = False
+            self.outcomes.clear()
+            self.recoveries += 1
+            self.last_recovery_at = datetime.now(timezone.utc).isoformat()
+            logger.info("MongoDB circuit breaker closed, probe request succeeded")
+        elif self.state == "closed":
+            self._add(True)
+    
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open":
+            self._trip()
+        elif self.state == "closed":
+            self._add(False)
+            total = len(self.outcomes)
+            failed = sum(1 for _, ok in self.outcomes if not ok)
+            if total >= self.min_requests and failed / total >= self.failure_ratio:
+                self._trip()
+    
+    def release(self):
+        """The request made no Mongo calls, so a half-open probe gives no verdict"""
+        if self.state == "half_open":
+            self.probing = False
+    
+    def _add(self, ok: bool):
+        now = time.monotonic()
+        self.outcomes.append((now, ok))
+        while self.outcomes and self.outcomes[0][0] < now - self.window_seconds:
+            self.outcomes.popleft()
+    
+    def _trip(self):
+        was_probe = self.state == "half_open"
+        self.state = "open"
+        self.probing = False
+        self.opened_at = time.monotonic()
+        self.outcomes.clear()
+        if not was_probe:
+            self.trips += 1
+            self.last_trip_at = datetime.now(timezone.utc).isoformat()
+        logger.warning(f"MongoDB circuit breaker open for {self.cooldown_seconds}s"
+                       f"{' (probe failed)' if was_probe else ''}")
+    
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "trips": self.trips,
+            "recoveries": self.recoveries,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "window_requests": len(self.outcomes),
+            "window_failures": sum(1 for _, ok in self.outcomes if not ok),
+            "last_trip_at": self.last_trip_at,
+            "last_recovery_at": self.last_recovery_at
+        }
+
+class StalePayloadCache:
+    """Last public payload served per key, used to answer guests while Mongo is unavailable"""
+    
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: OrderedDict = OrderedDict()
+        self.served = 0
+    
+    def put(self, key: str, encoding: str, payload: dict):
+        entry = self.entries.get(key)
+        if entry is None or entry["etag"] != payload["etag"]:
+            entry = self.entries[key] = {"etag": payload["etag"]}
+        entry[encoding] = payload[encoding]
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+    
+    def get(self, key: str, encoding: str):
+        """(payload, encoding) in the requested encoding or identity, (None, None) if not cached"""
+        entry = self.entries.get(key)
+        if entry is not None:
+            for candidate in (encoding, "identity"):
+                if candidate in entry:
+                    self.served += 1
+                    return entry, candidate
+        return None, None
+    
+    def snapshot(self) -> dict:
+        return {"entries": len(self.entries), "served": self.served}
+
+mongo_breaker = CircuitBreaker(
+    MONGO_BREAKER_FAILURE_RATIO, MONGO_BREAKER_MIN_REQUESTS,
+    MONGO_BREAKER_WINDOW_SECONDS, MONGO_BREAKER_COOLDOWN_SECONDS
+)
+stale_payloads = StalePayloadCache(PUBLIC_STALE_CACHE_SIZE)
+
+class MongoGuardMiddleware:
+    """Runs each API request under its route's Mongo time budget and fails fast while the breaker is open"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or not path.startswith("/api/") or MONGO_FREE_PATH.match(path):
+            await self.app(scope, receive, send)
+            return
+        
+        if not mongo_breaker.allow():
+            await self.unavailable(scope, receive, send)
+            return
+        
+        # Filled in by the command listener, set up by the access log middleware around this one
+        stats = request_mongo_stats.get()
+        ops_before = stats["ops"] if stats else 0
+        response_started = False
+        
+        async def send_wrapper(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+        
+        try:
+            # pymongo's client-side timeout: sets maxTimeMS on every command and bounds server selection
+            with pymongo.timeout(route_time_budget(path)):
+                await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            if not is_mongo_unavailable(e):
+                self.record(stats, ops_before)
+                raise
+            mongo_breaker.record_failure()
+            logger.warning(f"MongoDB unavailable for {scope['method']} {path}: {e}")
+            if response_started:
+                raise
+            await self.unavailable(scope, receive, send)
+            return
+        self.record(stats, ops_before)
+    
+    def record(self, stats, ops_before):
+        if stats and stats["ops"] > ops_before:
+            mongo_breaker.record_success()
+        else:
+            mongo_breaker.release()
+    
+    async def unavailable(self, scope, receive, send):
+        """Stale public payload when there is one, otherwise 503"""
+        match = PUBLIC_PAYLOAD_PATH.match(scope["path"])
+        if match and scope["method"] == "GET":
+            request = Request(scope)
+            encoding = pick_encoding(request.headers.get("accept-encoding", ""))
+            payload, encoding = stale_payloads.get(f"{match[1]}:{match[2]}", encoding)
+            if payload is not None:
+                await payload_response(request, payload, encoding, stale=True)(scope, receive, send)
+                return
+        response = JSONResponse(
+            {"detail": "Database temporarily unavailable, please retry"}, status_code=503,
+            headers={"Retry-After": str(math.ceil(MONGO_BREAKER_COOLDOWN_SECONDS))}
+        )
+        await response(scope, receive, send)
+
+# Inside CORS and compression so 503s still carry CORS headers
+app.add_middleware(MongoGuardMiddleware)
+
+@api_router.get("/health/mongo")
+async def mongo_health():
+    """Circuit breaker state, trip/recovery counters and stale cache usage"""
+    return {"breaker": mongo_breaker.snapshot(), "stale_cache": stale_payloads.snapshot()}
+
+# ============ REQUEST PROFILING ============
+
+PROFILE_TOKEN_HEADER = "X-Profile-Token"
+PROFILE_TOKEN_HEADER_KEY = PROFILE_TOKEN_HEADER.lower().encode()
+PROFILING_ROUTE_PREFIX = "/api/admin/profiling"
+
+# Where a sample's time goes: the innermost frame matching one of these decides
+PROFILE_PHASES = (
+    ("mongo_driver", ("/pymongo/", "/motor/", "/bson/")),
+    ("validation", ("/pydantic/", "/pydantic_core/", "/fastapi/_compat.py", "/fastapi/dependencies/")),
+    ("json_encoding", ("/fastapi/encoders.py", "/json/", "/starlette/responses.py")),
+    ("compression", ("/gzip.py", "/starlette/middleware/gzip.py", "/brotli")),
+)
+# Middleware plumbing in this file is framework time, not route code
+PROFILE_PLUMBING_NAMES = {"__call__", "send_wrapper"}
+
+class RequestProfile:
+    """Samples and timings for one profiled request"""
+    
+    def __init__(self, trigger: str, scope: dict):
+        self.id = str(uuid.uuid4())
+        self.trigger = trigger
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.route = scope["path"]
+        self.status = 500
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.wall_ms = 0.0
+        self.mongo_ms = 0.0
+        self.mongo_ops = 0
+        self.samples = 0
+        self.on_loop_seconds = 0.0
+        self.phases = Counter()
+        self.stacks = Counter()
+    
+    def add_sample(self, labels: tuple, phase: str, seconds: float):
+        self.samples += 1
+        self.on_loop_seconds += seconds
+        self.phases[phase] += seconds
+        self.stacks[labels] += seconds
+    
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "trigger": self.trigger,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "started_at": self.started_at,
+            "wall_ms": round(self.wall_ms, 2),
+            "mongo_ms": round(self.mongo_ms, 2),
+            "mongo_ops": self.mongo_ops,
+            "on_loop_ms": round(self.on_loop_seconds * 1000, 2),
+            # Wall time not spent running on the event loop: awaiting Mongo, storage, the threadpool or other requests
+            "phases": {
+                **{phase: round(seconds * 1000, 2) for phase, seconds in self.phases.most_common()},
+                "awaiting": round(max(self.wall_ms - self.on_loop_seconds * 1000, 0), 2)
+            },
+            "samples": self.samples
+        }
+    
+    def folded(self) -> str:
+        """Collapsed stacks (root;...;leaf microseconds), the input format of flamegraph tools"""
+        return "".join(
+            f"{';'.join(labels)} {round(seconds * 1e6)}\n" for labels, seconds in self.stacks.most_common()
+        )
+
+class RequestProfiler:
+    """Samples the event loop thread's stack while profiled requests are in flight.
+    
+    The sampler thread only runs while at least one request is being profiled. A sample belongs to a
+    request when that request's middleware frame is on the stack, so concurrent requests don't mix.
+    """
+    
+    def __init__(self, interval: float, keep: int, sample_rate: float):
+        self.interval = interval
+        self.sample_rate = sample_rate
+        self.profiles: deque = deque(maxlen=keep)
+        self.active = {}  # id(root frame) -> (root frame, profile)
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self.loop_thread_id = None
+        self.code_info = {}  # code object -> (label, phase)
+    
+    def begin(self, root_frame, profile: RequestProfile):
+        with self.lock:
+            self.active[id(root_frame)] = (root_frame, profile)
+            if self.thread is None:
+                self.loop_thread_id = threading.get_ident()
+                self.thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self.thread.start()
+    
+    def end(self, root_frame, profile: RequestProfile):
+        with self.lock:
+            self.active.pop(id(root_frame), None)
+        self.profiles.append(profile)
+    
+    def find(self, profile_id: str) -> Optional[RequestProfile]:
+        return next((p for p in self.profiles if p.id == profile_id), None)
+    
+    def _run(self):
+        last = time.perf_counter()
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                if not self.active:
+                    self.thread = None
+                    return
+                active = list(self.active.values())
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            
+            frame = sys._current_frames().get(self.loop_thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame)
+                frame = frame.f_back
+            for root_frame, profile in active:
+                for depth, candidate in enumerate(stack):
+                    if candidate is root_frame:
+                        self._record(profile, stack[:depth], elapsed)
+                        break
+            del stack, frame
+    
+    def _record(self, profile: RequestProfile, frames: list, elapsed: float):
+        labels = []
+        phase = None
+        for frame in frames:  # innermost first
+            label, frame_phase = self._describe(frame.f_code)
+            labels.append(label)
+            if phase is None:
+                phase = frame_phase
+        profile.add_sample(tuple(reversed(labels)), phase or "framework", elapsed)
+    
+    def _describe(self, code) -> tuple:
+        info = self.code_info.get(code)
+        if info is None:
+            filename = code.co_filename
+            if "site-packages/" in filename:
+                short = filename.split("site-packages/", 1)[1]
+            elif filename.startswith(str(ROOT_DIR)):
+                short = os.path.relpath(filename, ROOT_DIR)
+            else:
+                short = os.path.basename(filename)
+            phase = next((name for name, markers in PROFILE_PHASES if any(m in filename for m in markers)), None)
+            if phase is None and filename == __file__ and code.co_name not in PROFILE_PLUMBING_NAMES:
+                phase = "app_code"
+            info = self.code_info[code] = (f"{short}:{code.co_name}", phase)
+        return info
+
+request_profiler = RequestProfiler(PROFILING_INTERVAL_SECONDS, PROFILING_KEEP, PROFILING_SAMPLE_RATE)
+
+def create_profiling_token(user_id: str, expires: datetime) -> str:
+    payload = {"purpose": "profile", "sub": user_id, "exp": expires}
+    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+def valid_profiling_token(token: bytes) -> bool:
+    try:
+        payload = jwt.decode(token.decode("latin-1"), JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    except jwt.InvalidTokenError:
+        return False
+    return payload.get("purpose") == "profile"
+
+class RequestProfilerMiddleware:
+    """Profiles requests that carry a valid X-Profile-Token or fall in the sample rate; a pass-through otherwise"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        trigger = self.trigger(scope) if scope["type"] == "http" else None
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+        
+        profile = RequestProfile(trigger, scope)
+        root_frame = sys._getframe()
+        stats = request_mongo_stats.get()
+        ops_before, micros_before = (stats["ops"], stats["micros"]) if stats else (0, 0)
+        
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile.id.encode())]
+            await send(message)
+        
+        start = time.perf_counter()
+        request_profiler.begin(root_frame, profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.wall_ms = (time.perf_counter() - start) * 1000
+            route = scope.get("route")
+            profile.route = getattr(route, "path", profile.path)
+            if stats:
+                profile.mongo_ops = stats["ops"] - ops_before
+                profile.mongo_ms = (stats["micros"] - micros_before) / 1000
+            request_profiler.end(root_frame, profile)
+            del root_frame
+    
+    def trigger(self, scope) -> Optional[str]:
+        rate = request_profiler.sample_rate
+        for name, value in scope["headers"]:
+            if name == PROFILE_TOKEN_HEADER_KEY:
+                return "token" if valid_profiling_token(value) else None
+        if rate and random.random() < rate and not scope["path"].startswith(PROFILING_ROUTE_PREFIX):
+            return "sample"
+        return None
+
+@api_router.post("/admin/profiling/token", response_model=ProfilingToken)
+async def issue_profiling_token(admin: dict = Depends(get_admin_user)):
+    """Short-lived token; send it as X-Profile-Token to profile that request"""
+    expires = datetime.now(timezone.utc) + timedelta(minutes=PROFILING_TOKEN_MINUTES)
+    return ProfilingToken(
+        header=PROFILE_TOKEN_HEADER, token=create_profiling_token(admin["id"], expires), expires_at=expires.isoformat()
+    )
+
+@api_router.get("/admin/profiling", response_model=ProfilingStatus)
+async def get_profiling_status(admin: dict = Depends(get_admin_user)):
+    """Sample rate and the most recent profiles kept by this worker, newest first"""
+    return ProfilingStatus(
+        sample_rate=request_profiler.sample_rate,
+        profiles=[profile.summary() for profile in reversed(request_profiler.profiles)]
+    )
+
+@api_router.put("/admin/profiling", response_model=ProfilingStatus)
+async def update_profiling_settings(data: ProfilingSettings, admin: dict = Depends(get_admin_user)):
+    # Per worker process and not persisted, a restart goes back to PROFILING_SAMPLE_RATE
+    request_profiler.sample_rate = data.sample_rate
+    return await get_profiling_status(admin)
+
+@api_router.get("/admin/profiling/{profile_id}")
+async def download_profile(
+    profile_id: str,
+    fmt: Literal["json", "folded"] = Query("json", alias="format"),
+    admin: dict = Depends(get_admin_user)
+):
+    profile = request_profiler.find(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found (only the most recent ones are kept)")
+    if fmt == "folded":
+        return Response(
+            content=profile.folded(), media_type="text/plain",
+            headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.folded"'}
+        )
+    return {**profile.summary(), "stacks": profile.folded().splitlines()}
+
 # ============ ROOT ============
 
 @api_router.get("/")
@@ -722,6 +3537,19 @@ async def root():
 # Include router
 app.include_router(api_router)
 
+class APICompressionMiddleware:
+    """Gzip /api responses only; /uploads serves media (mp3, jpg, webp) that is already compressed"""
+    
+    def __init__(self, app, **gzip_options):
+        self.app = app
+        self.gzip = GZipMiddleware(app, **gzip_options)
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith("/api/"):
+            await self.gzip(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -730,12 +3558,227 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress API responses that are big enough; precompressed public payloads pass through untouched
+app.add_middleware(APICompressionMiddleware, minimum_size=COMPRESSION_MIN_BYTES, compresslevel=6)
+
+# Outside compression and CORS so profiles include them, inside the access log for its Mongo stats
+app.add_middleware(RequestProfilerMiddleware)
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
+# ============ ACCESS LOG ============
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that never blocks the event loop: records are dropped when the queue is full"""
+    
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record):
+        # Formatting happens on the listener thread; the queue is in-process so the record can go as is
+        return record
+    
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class JsonAccessFormatter(logging.Formatter):
+    """One JSON object per line, built from the dict passed as the log message"""
+    
+    def format(self, record):
+        entry = {"ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat()}
+        entry.update(record.msg)
+        return json.dumps(entry, separators=(",", ":"), default=str)
+
+def setup_queued_logging():
+    """Move every log handler behind one queue drained by a background thread"""
+    root = logging.getLogger()
+    for handler in root.handlers:
+        if isinstance(handler, logging.handlers.QueueHandler):
+            # Already set up (module imported twice), don't queue into our own queue
+            return handler
+    
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    root_handlers = list(root.handlers)
+    
+    if ACCESS_LOG_FILE:
+        access_handler = logging.handlers.WatchedFileHandler(ACCESS_LOG_FILE)
+    else:
+        access_handler = logging.StreamHandler()
+    access_handler.setFormatter(JsonAccessFormatter())
+    access_handler.addFilter(lambda record: record.name == "access")
+    for handler in root_handlers:
+        handler.addFilter(lambda record: record.name != "access")
+    
+    queue_handler = DroppingQueueHandler(log_queue)
+    for handler in root_handlers:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    
+    listener = logging.handlers.QueueListener(
+        log_queue, *root_handlers, access_handler, respect_handler_level=True
+    )
+    listener.start()
+    queue_handler.listener = listener
+    atexit.register(stop_queued_logging)
+    return queue_handler
+
+def stop_queued_logging():
+    """Drain the queue and stop the listener thread; later records go straight to the handlers"""
+    listener = getattr(log_queue_handler, "listener", None)
+    if listener is None:
+        return
+    log_queue_handler.listener = None
+    root = logging.getLogger()
+    root.removeHandler(log_queue_handler)
+    for handler in listener.handlers:
+        root.addHandler(handler)
+    listener.stop()
+
+log_queue_handler = setup_queued_logging()
+access_logger = logging.getLogger("access")
+
+class AccessLogMiddleware:
+    """Structured access log: route, status, latency, invitation id and Mongo time per request"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        stats = {"ops": 0, "micros": 0}
+        token = request_mongo_stats.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+        
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_mongo_stats.reset(token)
+            latency_ms = (time.perf_counter() - start) * 1000
+            self.log(scope, status_code, latency_ms, stats)
+    
+    def log(self, scope, status_code, latency_ms, stats):
+        path = scope["path"]
+        slow = latency_ms >= ACCESS_LOG_SLOW_MS
+        if status_code < 500 and not slow and path.startswith(ACCESS_LOG_PUBLIC_PREFIXES):
+            if random.random() >= ACCESS_LOG_PUBLIC_SAMPLE_RATE:
+                return
+            sample_rate = ACCESS_LOG_PUBLIC_SAMPLE_RATE
+        else:
+            sample_rate = 1.0
+        
+        # The router fills in the matched route and path params on the shared scope
+        route = scope.get("route")
+        path_params = scope.get("path_params") or {}
+        access_logger.info({
+            "method": scope["method"],
+            "route": getattr(route, "path", path),
+            "path": path,
+            "status": status_code,
+            "latency_ms": round(latency_ms, 2),
+            "invitation_id": path_params.get("invitation_id"),
+            "mongo_ms": round(stats["micros"] / 1000, 2),
+            "mongo_ops": stats["ops"],
+            "slow": slow,
+            "sample_rate": sample_rate
+        })
+
+# Outermost middleware, so latency covers CORS and compression too
+app.add_middleware(AccessLogMiddleware)
+
+async def backfill_search_trigrams():
+    """Add search trigrams to RSVPs/messages created before search existed"""
+    for collection, fields, build in (
+        (db.rsvps, ("guest_name", "phone"), rsvp_search_trigrams),
+        (db.messages, ("guest_name", "message"), message_search_trigrams),
+    ):
+        cursor = collection.find({"search_trigrams": {"$exists": False}}, {"_id": 1, **{f: 1 for f in fields}})
+        batch = []
+        async for doc in cursor:
+            trigrams = build(*(doc.get(f, "") for f in fields))
+            batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"search_trigrams": trigrams}}))
+            if len(batch) >= 500:
+                await collection.bulk_write(batch, ordered=False)
+                batch = []
+        if batch:
+            await collection.bulk_write(batch, ordered=False)
+
+DB_INDEXES = [
+    ("rsvps", [("invitation_id", 1), ("created_at", -1)], {}),
+    ("rsvps", [("invitation_id", 1), ("search_trigrams", 1)], {}),
+    ("rsvps", "id", {"unique": True}),
+    ("rsvps", [("invitation_id", 1), ("guest_key", 1)],
+     {"unique": True, "partialFilterExpression": {"guest_key": {"$type": "string"}}}),
+    ("rsvps", [("invitation_id", 1), ("idempotency_keys", 1)],
+     {"unique": True, "partialFilterExpression": {"idempotency_keys": {"$type": "string"}}}),
+    ("messages", "id", {"unique": True}),
+    ("messages", [("invitation_id", 1), ("created_at", -1)], {}),
+    ("messages", [("invitation_id", 1), ("search_trigrams", 1)], {}),
+    ("theme_stylesheets", "fingerprint", {"unique": True}),
+    ("public_payloads", "key", {"unique": True}),
+    ("activity_rollups", [("invitation_id", 1), ("granularity", 1), ("bucket", 1)], {"unique": True}),
+    ("invitation_templates", [("user_id", 1), ("id", 1)], {}),
+    ("notification_outbox", [("status", 1), ("next_attempt_at", 1)], {}),
+    ("notification_outbox", [("owner_id", 1), ("status", 1), ("created_at", 1)], {}),
+    ("notification_outbox", "digest_id", {"sparse": True}),
+    ("notification_outbox", "expires_at", {"expireAfterSeconds": 0}),
+    ("invitation_views", [("invitation_id", 1), ("day", 1), ("worker_id", 1)], {"unique": True}),
+    ("invitation_archives", "id", {"unique": True}),
+    ("invitation_archives", [("user_id", 1), ("last_event_date", -1)], {}),
+    ("invitations", "last_event_date", {}),
+    ("invitations", "id", {"unique": True}),
+]
+
+@app.on_event("startup")
+async def create_db_indexes():
+    for collection, keys, options in DB_INDEXES:
+        try:
+            await db[collection].create_index(keys, **options)
+        except Exception as e:
+            # One conflicting index must not keep the ones after it from being built
+            logger.warning(f"Could not create index {keys} on {collection}: {e}")
+    backfill_task = asyncio.create_task(backfill_search_trigrams())
+    backfill_task.add_done_callback(
+        lambda t: t.cancelled() or t.exception() is None or logger.warning(f"Search backfill failed: {t.exception()}")
+    )
+
+notification_task: Optional[asyncio.Task] = None
+view_flush_task: Optional[asyncio.Task] = None
+
+@app.on_event("startup")
+async def start_background_workers():
+    global notification_task, view_flush_task
+    notification_task = asyncio.create_task(run_notification_worker())
+    view_flush_task = asyncio.create_task(run_view_flusher())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if notification_task is not None:
+        notification_task.cancel()
+    if view_flush_task is not None:
+        view_flush_task.cancel()
+    try:
+        await flush_view_counters()
+    except Exception as e:
+        logger.warning(f"Final view counter flush failed: {e}")
     client.close()
+    if image_executor is not None:
+        image_executor.shutdown(wait=False, cancel_futures=True)
+    stop_queued_logging()
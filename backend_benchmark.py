@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Backend Benchmarks for Wedding Invitation App
+Micro-benchmarks for CPU-bound helpers in backend/server.py, plus batch-job throughput
+against MongoDB at MONGO_URL (skipped when it isn't reachable). Run from the repo root:
+    python backend_benchmark.py
+"""
+
+import asyncio
+import os
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+import server  # noqa: E402
+
+def timed(func, repeat=5):
+    """Return best-of-N wall time in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def random_word(rng, length):
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+def bench_moderation_scan():
+    """Scan time must grow with message length, not with blocklist size"""
+    rng = random.Random(42)
+    message = " ".join(random_word(rng, rng.randint(3, 9)) for _ in range(400))
+    
+    print("Message moderation scan (Aho-Corasick)")
+    print(f"  message length: {len(message)} chars")
+    results = {}
+    for size in (100, 1_000, 10_000, 50_000):
+        terms = {random_word(rng, rng.randint(4, 12)): "hold" for _ in range(size)}
+        build_ms = timed(lambda: server.BlocklistMatcher(terms), repeat=1)
+        matcher = server.BlocklistMatcher(terms)
+        scan_ms = timed(lambda: matcher.scan(message), repeat=20)
+        results[size] = scan_ms
+        print(f"  {size:>6} terms: build {build_ms:8.1f} ms, scan {scan_ms:6.3f} ms")
+    
+    for length in (1_000, 4_000, 16_000):
+        text = (message * (length // len(message) + 1))[:length]
+        scan_ms = timed(lambda: matcher.scan(text), repeat=20)
+        print(f"  {length:>6} chars (50k terms): scan {scan_ms:6.3f} ms")
+    
+    # 500x more terms should not make scanning meaningfully slower
+    ratio = results[50_000] / results[100]
+    print(f"  scan time ratio 50k/100 terms: {ratio:.2f}x")
+    return ratio < 3
+
+def synthetic_invitation(rng, index, event_date):
+    couple = {"name": random_word(rng, 6), "full_name": random_word(rng, 12), "father_name": "Bapak",
+              "mother_name": "Ibu", "child_order": "1", "instagram": ""}
+    invitation_id = f"bench-{index}"
+    return {
+        "id": invitation_id,
+        "user_id": f"user-{index % 5000}",
+        "theme": "floral",
+        "groom": couple,
+        "bride": {**couple, "name": random_word(rng, 6)},
+        "events": [{"name": "Akad", "date": event_date, "time_start": "08:00", "time_end": "10:00",
+                    "venue_name": "Masjid", "address": random_word(rng, 30)}],
+        "opening_text": random_word(rng, 200),
+        "last_event_date": event_date,
+        "created_at": "2024-01-01T00:00:00+00:00",
+        "updated_at": "2024-01-01T00:00:00+00:00"
+    }
+
+async def seed_archive_dataset(db, count, rng):
+    """Insert `count` invitations (80% with past events) with a few RSVPs and messages each"""
+    past, future = "2023-06-01", "2099-01-01"
+    for start in range(0, count, 5000):
+        invitations, rsvps, messages = [], [], []
+        for i in range(start, min(start + 5000, count)):
+            invitation = synthetic_invitation(rng, i, past if i % 5 else future)
+            invitations.append(invitation)
+            for j in range(rng.randint(0, 6)):
+                rsvps.append({"id": f"r-{i}-{j}", "invitation_id": invitation["id"], "owner_id": invitation["user_id"],
+                              "guest_name": random_word(rng, 8), "phone": "", "attendance": "hadir", "guest_count": 2,
+                              "guest_key": f"k-{j}", "created_at": "2023-05-01T10:00:00+00:00"})
+            for j in range(rng.randint(0, 3)):
+                messages.append({"id": f"m-{i}-{j}", "invitation_id": invitation["id"], "owner_id": invitation["user_id"],
+                                 "guest_name": random_word(rng, 8), "message": random_word(rng, 80),
+                                 "status": "approved", "created_at": "2023-05-01T10:00:00+00:00"})
+        await db.invitations.insert_many(invitations)
+        if rsvps:
+            await db.rsvps.insert_many(rsvps)
+        if messages:
+            await db.messages.insert_many(messages)
+
+def bench_archive_throughput():
+    """Archive job throughput on a synthetic dataset (ARCHIVE_BENCH_INVITATIONS, default 100k)"""
+    count = int(os.environ.get("ARCHIVE_BENCH_INVITATIONS", "100000"))
+    
+    async def run():
+        try:
+            await server.client.admin.command("ping")
+        except Exception as e:
+            print(f"  skipped: MongoDB not reachable ({e})")
+            return None
+        
+        db_name = f"undanganku_bench_{random.randrange(16 ** 8):08x}"
+        server.db = server.client[db_name]
+        try:
+            await server.create_db_indexes()
+            rng = random.Random(7)
+            seed_start = time.perf_counter()
+            await seed_archive_dataset(server.db, count, rng)
+            print(f"  seeded {count} invitations in {time.perf_counter() - seed_start:.1f} s")
+            hot_rsvps = await server.db.rsvps.count_documents({})
+            
+            start = time.perf_counter()
+            archived = await server.archive_past_invitations(retention_days=180)
+            elapsed = time.perf_counter() - start
+            print(f"  archived {archived} invitations in {elapsed:.1f} s ({archived / elapsed:,.0f} invitations/s)")
+            
+            remaining = await server.db.invitations.count_documents({})
+            archived_rsvps = sum([
+                doc["rsvp_count"] async for doc in server.db.invitation_archives.find({}, {"rsvp_count": 1})
+            ])
+            remaining_rsvps = await server.db.rsvps.count_documents({})
+            stats = await server.db.command("collStats", "invitation_archives")
+            print(f"  archive size: {stats['size'] / 1e6:.1f} MB for {archived} invitations")
+            
+            restore_ids = [f"bench-{i}" for i in range(1, 501) if i % 5][:100]
+            start = time.perf_counter()
+            for invitation_id in restore_ids:
+                await server.restore_archived_invitation(invitation_id)
+            restore_ms = (time.perf_counter() - start) * 1000 / len(restore_ids)
+            print(f"  restore: {restore_ms:.1f} ms per invitation")
+            
+            return (
+                archived == sum(1 for i in range(count) if i % 5)
+                and remaining == count - archived
+                and archived_rsvps + remaining_rsvps == hot_rsvps
+                and await server.db.invitations.count_documents({"id": {"$in": restore_ids}}) == len(restore_ids)
+            )
+        finally:
+            await server.client.drop_database(db_name)
+    
+    print("Post-event archival job")
+    return asyncio.run(run())
+
+INDONESIAN_NAMES = (
+    "Budi", "Siti", "Agus", "Dewi", "Rina", "Andi", "Putri", "Wahyu", "Sri", "Eko", "Nur", "Indah", "Bayu",
+    "Ratna", "Hendra", "Lestari", "Fajar", "Ayu", "Rizky", "Wulandari", "Joko", "Kurniawan", "Santoso",
+    "Pratama", "Hidayat", "Saputra", "Permata", "Setiawan", "Nugroho", "Rahmawati", "Susanti", "Gunawan"
+)
+
+def bench_search_latency():
+    """Ranked RSVP/message search on one invitation with SEARCH_BENCH_ROWS (default 30k) of each"""
+    count = int(os.environ.get("SEARCH_BENCH_ROWS", "30000"))
+    queries = ["budi", "dewi lestari", "wahyu nugroho", "rahmawti", "pratam", "0812 3456", "selamat menempuh"]
+    
+    async def run():
+        try:
+            await server.client.admin.command("ping")
+        except Exception as e:
+            print(f"  skipped: MongoDB not reachable ({e})")
+            return None
+        
+        db_name = f"undanganku_bench_{random.randrange(16 ** 8):08x}"
+        server.db = server.client[db_name]
+        try:
+            await server.create_db_indexes()
+            rng = random.Random(11)
+            for start in range(0, count, 5000):
+                rsvps, messages = [], []
+                for i in range(start, min(start + 5000, count)):
+                    name = " ".join(rng.sample(INDONESIAN_NAMES, rng.randint(1, 3)))
+                    phone = f"08{rng.randrange(10 ** 10):010d}"
+                    text = f"Selamat menempuh hidup baru {random_word(rng, 40)}"
+                    rsvps.append({"id": f"r-{i}", "invitation_id": "bench-search", "guest_name": name, "phone": phone,
+                                  "attendance": "hadir", "guest_count": 2, "created_at": f"2024-01-01T00:00:{i % 60:02d}",
+                                  "search_trigrams": server.rsvp_search_trigrams(name, phone)})
+                    messages.append({"id": f"m-{i}", "invitation_id": "bench-search", "guest_name": name, "message": text,
+                                     "status": "approved", "created_at": f"2024-01-01T00:00:{i % 60:02d}",
+                                     "search_trigrams": server.message_search_trigrams(name, text)})
+                await server.db.rsvps.insert_many(rsvps)
+                await server.db.messages.insert_many(messages)
+            
+            results = {}
+            for name, collection in (("rsvps", server.db.rsvps), ("messages", server.db.messages)):
+                latencies = []
+                for _ in range(5):
+                    for q in queries:
+                        start = time.perf_counter()
+                        await server.search_collection(collection, {"invitation_id": "bench-search"}, q, 1, 20)
+                        latencies.append((time.perf_counter() - start) * 1000)
+                latencies.sort()
+                p50, p95 = latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)]
+                results[name] = p95
+                print(f"  {name}: p50 {p50:.1f} ms, p95 {p95:.1f} ms over {len(latencies)} queries ({count:,} rows)")
+            return all(p95 < 10 for p95 in results.values())
+        finally:
+            await server.client.drop_database(db_name)
+    
+    print("RSVP/message search latency (trigram index)")
+    return asyncio.run(run())
+
+def bench_archive_packing():
+    """CPU side of the archive job (JSON + gzip per invitation) at ARCHIVE_BENCH_INVITATIONS, no MongoDB needed"""
+    count = int(os.environ.get("ARCHIVE_BENCH_INVITATIONS", "100000"))
+    rng = random.Random(7)
+    rows = []
+    for i in range(count):
+        invitation = synthetic_invitation(rng, i, "2023-06-01")
+        rsvps = [{"id": f"r-{i}-{j}", "invitation_id": invitation["id"], "guest_name": random_word(rng, 8),
+                  "attendance": "hadir", "guest_count": 2, "created_at": "2023-05-01T10:00:00+00:00"}
+                 for j in range(rng.randint(0, 6))]
+        messages = [{"id": f"m-{i}-{j}", "invitation_id": invitation["id"], "guest_name": random_word(rng, 8),
+                     "message": random_word(rng, 80), "created_at": "2023-05-01T10:00:00+00:00"}
+                    for j in range(rng.randint(0, 3))]
+        rows.append((invitation, rsvps, messages))
+    
+    print("Archive packing (per-invitation JSON + gzip)")
+    start = time.perf_counter()
+    archives = [server.pack_archive(*row) for row in rows]
+    elapsed = time.perf_counter() - start
+    size = sum(len(archive["payload"]) for archive in archives)
+    print(f"  packed {count} invitations in {elapsed:.1f} s ({count / elapsed:,.0f} invitations/s), "
+          f"{size / 1e6:.1f} MB compressed")
+    return all(archive["rsvp_count"] == len(row[1]) for archive, row in zip(archives, rows))
+
+def bench_view_tracking():
+    """Recording a view must be cheap enough for the hottest read route; flushing keeps sketch serialization off the event loop"""
+    rng = random.Random(3)
+    invitations = [f"inv-{i}" for i in range(10_000)]
+    visitors = [rng.randbytes(32) for _ in range(50_000)]
+    views = [(rng.choice(invitations), rng.choice(visitors)) for _ in range(1_000_000)]
+    
+    print("Page-view tracking (in-memory counters + HyperLogLog)")
+    tracker = server.ViewTracker()
+    start = time.perf_counter()
+    for invitation_id, visitor in views:
+        tracker.record(invitation_id, visitor, day="2030-01-01")
+    record_us = (time.perf_counter() - start) / len(views) * 1e6
+    print(f"  record: {record_us:.2f} µs per view ({len(views):,} views, {len(invitations):,} invitations)")
+    
+    loop_ms = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        pending = tracker.pending()
+        loop_ms = min(loop_ms, (time.perf_counter() - start) * 1000)
+    build_ms, ops, chunks, chunk_kb = 0.0, 0, 0, 0.0
+    for i in range(0, len(pending), server.VIEW_FLUSH_CHUNK):
+        start = time.perf_counter()
+        chunk = tracker.build_updates(pending[i:i + server.VIEW_FLUSH_CHUNK])
+        build_ms += (time.perf_counter() - start) * 1000
+        ops, chunks = ops + len(chunk), chunks + 1
+        chunk_kb = max(chunk_kb, sum(len(op._doc["$set"]["sketch"]) for op in chunk) / 1024)
+    print(f"  flush: {ops:,} upserts in {chunks} bulk_write(s) of up to {server.VIEW_FLUSH_CHUNK:,} "
+          f"(vs {len(views):,} per-view $inc), {loop_ms:.1f} ms on the event loop, "
+          f"{build_ms:.1f} ms serializing in a worker thread, at most {chunk_kb:,.0f} KB of sketches per chunk")
+    
+    sketch_kb = sum(
+        len(entry[1].dense) if entry[1].dense is not None else len(entry[1].sparse) * 100
+        for entry in tracker.entries.values()
+    ) / 1024
+    print(f"  memory: ~{sketch_kb:,.0f} KB of sketches for {len(tracker.entries):,} invitation-days")
+    return record_us < 20 and ops == len(invitations) and loop_ms < 20
+
+def bench_profiler_disabled_overhead():
+    """With no token and a zero sample rate the profiling middleware is a pass-through"""
+    async def app(scope, receive, send):
+        pass
+    
+    middleware = server.RequestProfilerMiddleware(app)
+    scope = {
+        "type": "http", "method": "GET", "path": "/api/public/invitation/abc",
+        "headers": [(b"host", b"example.com"), (b"user-agent", b"Mozilla/5.0"), (b"accept", b"*/*"),
+                    (b"accept-encoding", b"gzip, br"), (b"x-forwarded-for", b"10.0.0.1")]
+    }
+    count = 200_000
+    
+    async def run(target):
+        start = time.perf_counter()
+        for _ in range(count):
+            await target(scope, None, None)
+        return (time.perf_counter() - start) / count * 1e6
+    
+    print("Request profiler, disabled")
+    server.request_profiler.sample_rate = 0
+    direct_us = min(asyncio.run(run(app)) for _ in range(3))
+    wrapped_us = min(asyncio.run(run(middleware)) for _ in range(3))
+    print(f"  app alone {direct_us:.3f} µs, behind the middleware {wrapped_us:.3f} µs per request "
+          f"(+{wrapped_us - direct_us:.3f} µs)")
+    return wrapped_us - direct_us < 2 and not server.request_profiler.profiles
+
+BENCHMARKS = [
+    ("Moderation scan is independent of blocklist size", bench_moderation_scan),
+    ("Search stays in single-digit milliseconds on tens of thousands of rows", bench_search_latency),
+    ("View tracking records in microseconds and flushes in chunked bulk writes", bench_view_tracking),
+    ("Archive packing keeps up with the archive job", bench_archive_packing),
+    ("Archival moves past invitations without losing RSVPs", bench_archive_throughput),
+    ("Request profiler adds no measurable overhead when disabled", bench_profiler_disabled_overhead),
+]
+
+if __name__ == "__main__":
+    failed = 0
+    for name, bench in BENCHMARKS:
+        ok = bench()
+        if ok is None:
+            print(f"⏭️  {name} (skipped)\n")
+            continue
+        print(f"{'✅' if ok else '❌'} {name}\n")
+        failed += 0 if ok else 1
+    exit(1 if failed else 0)
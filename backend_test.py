@@ -6,7 +6,10 @@ Tests the core backend APIs focusing on the new theme system features.
 
 import requests
 import json
+import os
+import re
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # Configuration
@@ -214,7 +217,7 @@ def test_create_invitation_with_theme(auth_token):
         return False, f"Request failed: {str(e)}", None
 
 def test_public_invitation_with_theme_data(invitation_id):
-    """Test GET /api/public/invitation/{id} - should return theme_data with ornaments and colors"""
+    """Test GET /api/public/invitation/{id} - should reference a fingerprinted, immutable theme stylesheet"""
     try:
         response = requests.get(f"{BACKEND_URL}/public/invitation/{invitation_id}", timeout=10)
         
@@ -223,42 +226,31 @@ def test_public_invitation_with_theme_data(invitation_id):
             
         data = response.json()
         
-        # Check if theme_data is present
-        if "theme_data" not in data:
-            return False, "theme_data field not found in response"
+        # Theme data is no longer embedded, only the stylesheet URL
+        if "theme_data" in data:
+            return False, "theme_data should not be embedded in the public payload"
+        css_path = data.get("theme_css_url", "")
+        if not css_path.startswith("/api/themes/css/") or not css_path.endswith(".css"):
+            return False, f"Unexpected theme_css_url: {css_path}"
             
-        theme_data = data["theme_data"]
-        
-        # Check theme_data structure for adat theme
-        required_fields = ["id", "name", "description", "primary_color", "secondary_color", 
-                         "accent_color", "font_heading", "font_body", "ornaments", "background_pattern"]
-        
-        for field in required_fields:
-            if field not in theme_data:
-                return False, f"theme_data missing field: {field}"
-                
-        # Check that it's the adat theme
-        if theme_data.get("id") != "adat":
-            return False, f"Expected adat theme_data, got {theme_data.get('id')}"
-            
-        # Check ornaments structure
-        ornaments = theme_data.get("ornaments", {})
-        ornament_keys = ["top_left", "top_right", "bottom", "divider"]
-        for key in ornament_keys:
-            if key not in ornaments:
-                return False, f"ornaments missing key: {key}"
-                
-        # Check colors are present
-        colors = ["primary_color", "secondary_color", "accent_color"]
-        for color in colors:
-            if not theme_data.get(color):
-                return False, f"theme_data missing color: {color}"
-                
         # Verify the invitation data itself
         if data.get("theme") != "adat":
             return False, f"Invitation theme should be 'adat', got '{data.get('theme')}'"
+        
+        css_url = BACKEND_URL[:-len("/api")] + css_path
+        css_response = requests.get(css_url, timeout=10)
+        if css_response.status_code != 200:
+            return False, f"Stylesheet HTTP {css_response.status_code}"
+        if "immutable" not in css_response.headers.get("Cache-Control", ""):
+            return False, f"Stylesheet not served with immutable caching: {css_response.headers.get('Cache-Control')}"
+            
+        # Check the adat theme colors and ornaments made it into the stylesheet
+        css = css_response.text
+        for expected in [".theme-adat", "--theme-primary: #8B4513", "--theme-accent: #D4AF37", "--theme-ornament-top-left: url("]:
+            if expected not in css:
+                return False, f"Stylesheet missing: {expected}"
             
-        return True, f"Public invitation returns complete theme_data with ornaments and colors for adat theme"
+        return True, f"Public invitation references immutable adat theme stylesheet {css_path}"
         
     except Exception as e:
         return False, f"Request failed: {str(e)}"
@@ -285,6 +277,250 @@ def test_youtube_url_conversions():
     except Exception as e:
         return False, f"YouTube conversion test failed: {str(e)}"
 
+def test_rsvp_search(auth_token, invitation_id):
+    """Test GET /api/invitations/{id}/rsvps/search - partial, fuzzy and phone matches"""
+    try:
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        guests = [
+            {"guest_name": "Siti Nurhaliza", "phone": "+62 812-3456-789", "attendance": "hadir", "guest_count": 2},
+            {"guest_name": "Budi Santoso", "phone": "0813999888", "attendance": "tidak_hadir", "guest_count": 1},
+        ]
+        for guest in guests:
+            response = requests.post(f"{BACKEND_URL}/public/rsvp/{invitation_id}", json=guest, timeout=10)
+            if response.status_code != 200:
+                return False, f"RSVP create failed: HTTP {response.status_code}"
+        
+        cases = [
+            ("sity", "Siti Nurhaliza"),       # fuzzy
+            ("santos", "Budi Santoso"),       # partial
+            ("0812345", "Siti Nurhaliza"),    # phone, local form of +62
+        ]
+        for query, expected in cases:
+            response = requests.get(
+                f"{BACKEND_URL}/invitations/{invitation_id}/rsvps/search",
+                params={"q": query}, headers=headers, timeout=10
+            )
+            if response.status_code != 200:
+                return False, f"HTTP {response.status_code}: {response.text}"
+            data = response.json()
+            for field in ["items", "total", "page", "limit"]:
+                if field not in data:
+                    return False, f"Search response missing field: {field}"
+            if not data["items"] or data["items"][0]["guest_name"] != expected:
+                return False, f"Query '{query}' expected top result {expected}, got {data['items']}"
+            if "search_trigrams" in data["items"][0]:
+                return False, "search_trigrams leaked into search results"
+        
+        return True, f"RSVP search returns ranked partial, fuzzy and phone matches"
+        
+    except Exception as e:
+        return False, f"Request failed: {str(e)}"
+
+def test_rsvp_idempotency(auth_token, invitation_id):
+    """Test POST /api/public/rsvp/{id} - concurrent duplicates and changed answers keep one record"""
+    try:
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        phone = f"0857{uuid.uuid4().int % 10**8:08d}"
+        rsvp = {"guest_name": "Rina Kurnia", "phone": phone, "attendance": "hadir", "guest_count": 2}
+        key = str(uuid.uuid4())
+        
+        def submit(_):
+            return requests.post(
+                f"{BACKEND_URL}/public/rsvp/{invitation_id}", json=rsvp,
+                headers={"Idempotency-Key": key}, timeout=15
+            )
+        
+        # Flaky-connection retries arriving at the same time
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            responses = list(pool.map(submit, range(10)))
+        if any(r.status_code != 200 for r in responses):
+            return False, f"Concurrent submissions failed: {[r.status_code for r in responses]}"
+        ids = {r.json()["id"] for r in responses}
+        if len(ids) != 1:
+            return False, f"Concurrent duplicates created {len(ids)} RSVPs"
+        
+        # Changed answer from the same guest (same phone, new key, +62 format)
+        changed = {**rsvp, "phone": "+62" + phone[1:], "attendance": "tidak_hadir", "guest_count": 1}
+        response = requests.post(f"{BACKEND_URL}/public/rsvp/{invitation_id}", json=changed, timeout=10)
+        if response.status_code != 200 or response.json()["id"] not in ids:
+            return False, f"Changed answer did not update the existing RSVP: {response.text}"
+        
+        response = requests.get(f"{BACKEND_URL}/invitations/{invitation_id}/rsvps", headers=headers, timeout=10)
+        matching = [r for r in response.json() if r["guest_name"] == "Rina Kurnia"]
+        if len(matching) != 1:
+            return False, f"Expected 1 RSVP for the guest, found {len(matching)}"
+        if matching[0]["attendance"] != "tidak_hadir":
+            return False, f"RSVP not updated: {matching[0]}"
+        
+        # A second guest reusing the first guest's key must not replace their RSVP
+        other = {"guest_name": "Dewi Lestari", "phone": f"0858{uuid.uuid4().int % 10**8:08d}",
+                 "attendance": "hadir", "guest_count": 1}
+        response = requests.post(f"{BACKEND_URL}/public/rsvp/{invitation_id}", json=other,
+                                 headers={"Idempotency-Key": key}, timeout=10)
+        if response.status_code != 409:
+            return False, f"Reused key for another guest should be 409, got {response.status_code}"
+        response = requests.post(f"{BACKEND_URL}/public/rsvp/{invitation_id}", json=other,
+                                 headers={"Idempotency-Key": str(uuid.uuid4())}, timeout=10)
+        if response.status_code != 200 or response.json()["id"] in ids:
+            return False, f"Second guest with a fresh key did not get their own RSVP: {response.text}"
+        
+        # Different guests racing with one fresh key: exactly one of them claims it
+        shared_key = str(uuid.uuid4())
+        def submit_guest(i):
+            guest = {"guest_name": f"Tamu Serentak {i}", "phone": f"0859{i:08d}", "attendance": "hadir", "guest_count": 1}
+            return requests.post(
+                f"{BACKEND_URL}/public/rsvp/{invitation_id}", json=guest,
+                headers={"Idempotency-Key": shared_key}, timeout=15
+            )
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            statuses = sorted(r.status_code for r in pool.map(submit_guest, range(5)))
+        if statuses != [200, 409, 409, 409, 409]:
+            return False, f"Concurrent guests sharing a key: {statuses}"
+        
+        response = requests.get(f"{BACKEND_URL}/invitations/{invitation_id}/rsvps", headers=headers, timeout=10)
+        names = [r["guest_name"] for r in response.json()]
+        if names.count("Rina Kurnia") != 1 or names.count("Dewi Lestari") != 1:
+            return False, f"Guests on one device overwrote each other: {names}"
+        if sum(name.startswith("Tamu Serentak") for name in names) != 1:
+            return False, f"More than one guest claimed the shared key: {names}"
+        
+        return True, "10 concurrent duplicates and a changed answer kept a single RSVP, a key is claimed by one guest only"
+        
+    except Exception as e:
+        return False, f"Request failed: {str(e)}"
+
+def test_bulk_invitations_from_template(auth_token):
+    """Test POST /api/templates/{id}/invitations - one request creates many invitations, bad rows reported"""
+    try:
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        template = {
+            "name": "Paket Floral",
+            "data": {
+                "theme": "floral",
+                "events": [{
+                    "name": "Resepsi", "date": "2030-06-01", "time_start": "11:00", "time_end": "14:00",
+                    "venue_name": "Gedung Serbaguna", "address": "Jakarta"
+                }],
+                "settings": {"show_gift": False}
+            }
+        }
+        response = requests.post(f"{BACKEND_URL}/templates", json=template, headers=headers, timeout=10)
+        if response.status_code != 200:
+            return False, f"Template HTTP {response.status_code}: {response.text}"
+        template_id = response.json()["id"]
+        
+        def couple(name):
+            return {"name": name, "full_name": f"{name} Lengkap", "father_name": "Bapak", "mother_name": "Ibu", "child_order": "1"}
+        rows = [{"groom": couple(f"Pria{i}"), "bride": couple(f"Wanita{i}")} for i in range(200)]
+        rows[7] = {"groom": couple("Tanpa Pasangan")}
+        # Misspelt keys must be reported, not silently dropped
+        rows[9]["bride"]["nmae"] = "Typo"
+        rows[12]["weding_date"] = "2030-06-01"
+        
+        start = datetime.now()
+        response = requests.post(
+            f"{BACKEND_URL}/templates/{template_id}/invitations", json={"rows": rows}, headers=headers, timeout=60
+        )
+        elapsed = (datetime.now() - start).total_seconds()
+        if response.status_code != 200:
+            return False, f"Bulk HTTP {response.status_code}: {response.text}"
+        data = response.json()
+        
+        if len(data["created"]) != 197:
+            return False, f"Expected 197 invitations, created {len(data['created'])}"
+        errors = {e["index"]: [(err["loc"], err["msg"]) for err in e["errors"]] for e in data["errors"]}
+        if list(errors) != [7, 9, 12] or errors[7][0][0] != "bride":
+            return False, f"Expected errors for rows 7 (missing bride), 9 and 12 (unknown fields), got {data['errors']}"
+        if errors[9] != [("bride.nmae", "Unknown field")] or errors[12] != [("weding_date", "Unknown field")]:
+            return False, f"Unknown fields not reported per row: {errors[9]}, {errors[12]}"
+        
+        created = requests.get(f"{BACKEND_URL}/invitations/{data['created'][0]['id']}", headers=headers, timeout=10).json()
+        if created["groom"]["name"] != "Pria0" or created["settings"]["show_gift"] is not False:
+            return False, f"Template and row were not merged: {created['groom']}, {created['settings']}"
+        public = requests.get(f"{BACKEND_URL}/public/invitation/{data['created'][0]['id']}", timeout=10)
+        if public.status_code != 200:
+            return False, f"Bulk-created invitation not public: HTTP {public.status_code}"
+        
+        return True, f"197 invitations created and 3 rows rejected (missing/unknown fields) in {elapsed:.2f}s"
+        
+    except Exception as e:
+        return False, f"Request failed: {str(e)}"
+
+def test_patch_invitation(auth_token, invitation_id):
+    """Test PATCH /api/invitations/{id} - merge patch, gallery item ops and stale-version rejection"""
+    try:
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        url = f"{BACKEND_URL}/invitations/{invitation_id}"
+        version = requests.get(url, headers=headers, timeout=10).json()["updated_at"]
+        
+        response = requests.patch(url, json={
+            "updated_at": version,
+            "changes": {"settings": {"show_gift": False}},
+            "gallery": {"add": [{"id": "foto-1", "url": "/uploads/images/a.webp"}, {"id": "foto-2", "url": "/uploads/images/b.webp"}]}
+        }, headers=headers, timeout=10)
+        if response.status_code != 200:
+            return False, f"HTTP {response.status_code}: {response.text}"
+        data = response.json()
+        if data["settings"]["show_gift"] is not False or data["settings"]["show_gallery"] is not True:
+            return False, f"Settings not merged: {data['settings']}"
+        if data["theme"] != "adat" or data["groom"]["name"] != "Ahmad":
+            return False, "Untouched fields changed"
+        
+        response = requests.patch(url, json={
+            "updated_at": data["updated_at"],
+            "gallery": {"update": {"foto-2": {"caption": "Lamaran"}}, "order": ["foto-2", "foto-1"]}
+        }, headers=headers, timeout=10)
+        gallery = response.json()["gallery"]
+        if [item["id"] for item in gallery] != ["foto-2", "foto-1"] or gallery[0]["caption"] != "Lamaran":
+            return False, f"Gallery update/reorder not applied: {gallery}"
+        
+        # A second editor tab still holding the first version must not overwrite
+        response = requests.patch(url, json={"updated_at": version, "changes": {"opening_text": "Lama"}}, headers=headers, timeout=10)
+        if response.status_code != 409:
+            return False, f"Stale version should be 409, got {response.status_code}"
+        
+        return True, "Settings merged, gallery items added/updated/reordered, stale version rejected"
+        
+    except Exception as e:
+        return False, f"Request failed: {str(e)}"
+
+def test_theme_overrides_reach_page(auth_token):
+    """Test that settings overrides land in the stylesheet under the variable names ThemeProvider reads"""
+    try:
+        headers = {"Authorization": f"Bearer {auth_token}"}
+        
+        # #B76E79 was the old settings default; it is still an override on a modern invitation
+        response = requests.post(f"{BACKEND_URL}/invitations", json={
+            "theme": "modern",
+            "groom": {"name": "Budi", "full_name": "Budi Santoso", "father_name": "A", "mother_name": "B", "child_order": "Putra pertama"},
+            "bride": {"name": "Rina", "full_name": "Rina Wati", "father_name": "C", "mother_name": "D", "child_order": "Putri kedua"},
+            "events": [],
+            "settings": {"primary_color": "#B76E79", "font_heading": ""}
+        }, headers=headers, timeout=15)
+        if response.status_code != 200:
+            return False, f"HTTP {response.status_code}: {response.text}"
+        
+        public = requests.get(f"{BACKEND_URL}/public/invitation/{response.json()['id']}", timeout=10).json()
+        css = requests.get(BACKEND_URL[:-len("/api")] + public["theme_css_url"], timeout=10).text
+        for expected in [".invitation-container.theme-modern", "--theme-primary: #B76E79",
+                         "--theme-secondary: #ECF0F1", "--theme-font-heading: 'Montserrat', serif"]:
+            if expected not in css:
+                return False, f"Stylesheet missing: {expected}"
+        
+        # Every variable the page reads must be set by the stylesheet
+        provider = os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend", "src", "themes", "ThemeProvider.js")
+        with open(provider) as f:
+            block = re.search(r"THEME_CSS_VARIABLES = \{(.*?)\}", f.read(), re.S).group(1)
+        names = re.findall(r"'(--theme-[a-z-]+)'", block)
+        missing = [name for name in names if f"{name}: " not in css]
+        if not names or missing:
+            return False, f"Variables read by ThemeProvider not in stylesheet: {missing or 'none found'}"
+        
+        return True, f"Overrides compiled into {len(names)} --theme-* variables the page reads"
+        
+    except Exception as e:
+        return False, f"Request failed: {str(e)}"
+
 def run_all_tests():
     """Run all backend tests"""
     result = TestResult()
@@ -345,6 +581,46 @@ def run_all_tests():
     else:
         result.add_fail("YouTube URL Conversion", message)
     
+    # Test 7: RSVP Search
+    print("\n7. Testing GET /api/invitations/{id}/rsvps/search...")
+    success, message = test_rsvp_search(auth_token, invitation_id)
+    if success:
+        result.add_pass("RSVP Search")
+    else:
+        result.add_fail("RSVP Search", message)
+    
+    # Test 8: Idempotent RSVP
+    print("\n8. Testing idempotent POST /api/public/rsvp/{id}...")
+    success, message = test_rsvp_idempotency(auth_token, invitation_id)
+    if success:
+        result.add_pass("Idempotent RSVP Submission")
+    else:
+        result.add_fail("Idempotent RSVP Submission", message)
+    
+    # Test 9: Bulk Invitations from Template
+    print("\n9. Testing POST /api/templates/{id}/invitations...")
+    success, message = test_bulk_invitations_from_template(auth_token)
+    if success:
+        result.add_pass("Bulk Invitations from Template")
+    else:
+        result.add_fail("Bulk Invitations from Template", message)
+    
+    # Test 10: Partial Invitation Update
+    print("\n10. Testing PATCH /api/invitations/{id}...")
+    success, message = test_patch_invitation(auth_token, invitation_id)
+    if success:
+        result.add_pass("Partial Invitation Update")
+    else:
+        result.add_fail("Partial Invitation Update", message)
+    
+    # Test 11: Theme Overrides on the Page
+    print("\n11. Testing theme overrides in the compiled stylesheet...")
+    success, message = test_theme_overrides_reach_page(auth_token)
+    if success:
+        result.add_pass("Theme Overrides Reach Page")
+    else:
+        result.add_fail("Theme Overrides Reach Page", message)
+    
     return result
 
 if __name__ == "__main__":
@@ -0,0 +1,100 @@
+"""
+Shared fixtures for the in-process backend tests (the *_test.py files next to backend_test.py).
+
+Each test module gets its own import of backend/server.py, configured by the module's
+`backend_env` fixture and pointed at a throwaway database that is dropped afterwards.
+Modules are skipped when MongoDB is not reachable at MONGO_URL (default mongodb://localhost:27017).
+
+Usage:
+    python -m pytest -q
+    python -m pytest -q archive_test.py
+"""
+
+import importlib
+import logging
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+BACKEND_DIR = Path(__file__).parent / "backend"
+
+# Runs against a deployed backend over HTTP: python backend_test.py
+collect_ignore = ["backend_test.py"]
+
+@pytest.fixture(scope="module")
+def backend_env():
+    """Environment the module's backend is imported with; modules override this fixture"""
+    return {}
+
+@pytest.fixture(scope="module")
+def server(request, backend_env):
+    """backend/server.py imported fresh with the module's environment and its own database"""
+    module = request.module.__name__.rsplit(".", 1)[-1].removesuffix("_test")
+    env = {
+        "MONGO_URL": os.environ.get("MONGO_URL", "mongodb://localhost:27017"),
+        "DB_NAME": f"undanganku_{module}_test_{uuid.uuid4().hex[:8]}",
+        **backend_env,
+    }
+    try:
+        with MongoClient(env["MONGO_URL"], serverSelectionTimeoutMS=3000) as mongo:
+            mongo.admin.command("ping")
+    except PyMongoError:
+        pytest.skip(f"MongoDB not reachable at {env['MONGO_URL']}")
+
+    with pytest.MonkeyPatch.context() as patch:
+        for name, value in env.items():
+            patch.setenv(name, str(value))
+        patch.syspath_prepend(str(BACKEND_DIR))
+        # server.py's basicConfig does nothing next to pytest's log capture handlers
+        root_level = logging.getLogger().level
+        logging.getLogger().setLevel(logging.INFO)
+        # server.py reads its settings at import, so every module needs its own import
+        sys.modules.pop("server", None)
+        module = importlib.import_module("server")
+        try:
+            yield module
+        finally:
+            module.stop_queued_logging()
+            logging.getLogger().setLevel(root_level)
+            sys.modules.pop("server", None)
+            with MongoClient(env["MONGO_URL"], serverSelectionTimeoutMS=3000) as mongo:
+                mongo.drop_database(env["DB_NAME"])
+
+@pytest.fixture(scope="module")
+def client(server):
+    """TestClient with the app's startup hooks run; shutdown hooks run after the module"""
+    from fastapi.testclient import TestClient
+    with TestClient(server.app) as tc:
+        yield tc
+
+@pytest.fixture(scope="module")
+def register(client):
+    """register(prefix="owner", email=None) -> auth headers for a new user"""
+    def register(prefix="owner", email=None):
+        response = client.post("/api/auth/register", json={
+            "email": email or f"{prefix}_{uuid.uuid4().hex[:8]}@example.com",
+            "password": "testpassword123", "name": prefix
+        })
+        assert response.status_code == 200, f"Register HTTP {response.status_code}: {response.text}"
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return register
+
+@pytest.fixture(scope="module")
+def create_invitation(client):
+    """create_invitation(headers, event_date="2030-01-01", **fields) -> the created invitation"""
+    def create_invitation(headers, event_date="2030-01-01", **fields):
+        couple = {"name": "A", "full_name": "A B", "father_name": "F", "mother_name": "M", "child_order": "1"}
+        response = client.post("/api/invitations", json={
+            "theme": "floral", "groom": couple, "bride": {**couple, "name": "S"},
+            "events": [{"name": "Akad", "date": event_date, "time_start": "08:00", "time_end": "10:00",
+                        "venue_name": "Masjid", "address": "Jakarta"}],
+            **fields
+        }, headers=headers)
+        assert response.status_code == 200, f"Create invitation HTTP {response.status_code}: {response.text}"
+        return response.json()
+    return create_invitation
@@ -0,0 +1,73 @@
+// Builds the body for PATCH /api/invitations/:id from the loaded invitation and the edited form
+
+const MERGE_FIELDS = [
+  'groom', 'bride', 'events', 'opening_text', 'closing_text', 'video_url', 'streaming_url', 'settings'
+];
+const ITEM_FIELDS = ['love_story', 'gallery', 'gifts'];
+
+const isPlainObject = (value) => value !== null && typeof value === 'object' && !Array.isArray(value);
+
+const sameValue = (a, b) => JSON.stringify(a) === JSON.stringify(b);
+
+// JSON Merge Patch: changed keys only, nested objects diffed key by key, arrays replaced whole
+export const mergeDiff = (before, after) => {
+  const patch = {};
+  Object.keys(after).forEach((key) => {
+    if (sameValue(before?.[key], after[key])) return;
+    if (isPlainObject(before?.[key]) && isPlainObject(after[key])) {
+      patch[key] = mergeDiff(before[key], after[key]);
+    } else {
+      patch[key] = after[key];
+    }
+  });
+  return patch;
+};
+
+// add/update/remove/order by item id, or null when the list is unchanged
+export const itemsDiff = (before = [], after = []) => {
+  const beforeById = Object.fromEntries(before.map((item) => [item.id, item]));
+  const afterIds = new Set(after.map((item) => item.id));
+
+  const ops = { add: [], update: {}, remove: [] };
+  after.forEach((item) => {
+    if (!beforeById[item.id]) {
+      ops.add.push(item);
+    } else if (!sameValue(beforeById[item.id], item)) {
+      ops.update[item.id] = mergeDiff(beforeById[item.id], item);
+    }
+  });
+  ops.remove = before.filter((item) => !afterIds.has(item.id)).map((item) => item.id);
+
+  // Kept items stay in place and new ones are appended, anything else needs an explicit order
+  const expected = [
+    ...before.filter((item) => afterIds.has(item.id)).map((item) => item.id),
+    ...ops.add.map((item) => item.id)
+  ];
+  const order = after.map((item) => item.id);
+  if (!sameValue(expected, order)) ops.order = order;
+
+  const changed = ops.add.length || ops.remove.length || Object.keys(ops.update).length || ops.order;
+  return changed ? ops : null;
+};
+
+export const buildInvitationPatch = (original, current) => {
+  const { music_list: musicBefore, ...settingsBefore } = original.settings || {};
+  const { music_list: musicAfter, ...settingsAfter } = current.settings || {};
+
+  const pick = (source, settings) => ({
+    ...Object.fromEntries(MERGE_FIELDS.map((field) => [field, source[field]])),
+    settings
+  });
+  const changes = mergeDiff(pick(original, settingsBefore), pick(current, settingsAfter));
+
+  const patch = {};
+  if (Object.keys(changes).length) patch.changes = changes;
+  ITEM_FIELDS.forEach((field) => {
+    const ops = itemsDiff(original[field], current[field]);
+    if (ops) patch[field] = ops;
+  });
+  const musicOps = itemsDiff(musicBefore, musicAfter);
+  if (musicOps) patch.music_list = musicOps;
+
+  return Object.keys(patch).length ? patch : null;
+};
@@ -14,7 +14,7 @@ import {
 } from 'lucide-react';
 
 // Theme imports
-import { ThemeProvider, THEMES } from '@/themes/ThemeProvider';
+import { ThemeProvider, useTheme, readCompiledTheme } from '@/themes/ThemeProvider';
 import '@/themes/AdatTheme.css';
 import '@/themes/FloralTheme.css';
 import '@/themes/ModernTheme.css';
@@ -30,7 +30,11 @@ import {
   LoveStoryTimeline
 } from '@/components/invitation';
 
-const API_URL = `${process.env.REACT_APP_BACKEND_URL}/api`;
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+const API_URL = `${BACKEND_URL}/api`;
+
+// Local uploads are stored as /uploads/... paths, object storage URLs are already absolute
+const mediaUrl = (url) => (/^\/(?!\/)/.test(url) ? `${BACKEND_URL}${url}` : url);
 
 const InvitationContent = ({ invitation, guestName }) => {
   const [showCover, setShowCover] = useState(true);
@@ -40,8 +44,8 @@ const InvitationContent = ({ invitation, guestName }) => {
   
   const sectionsRef = useRef([]);
 
-  // Get theme data
-  const theme = THEMES[invitation.theme] || THEMES.floral;
+  // Theme data with the owner's color/font overrides from the compiled stylesheet
+  const theme = useTheme();
 
   // RSVP Form
   const [rsvpForm, setRsvpForm] = useState({
@@ -51,6 +55,7 @@ const InvitationContent = ({ invitation, guestName }) => {
     guest_count: 1
   });
   const [rsvpLoading, setRsvpLoading] = useState(false);
+  const pendingRsvp = useRef(null);
 
   // Message Form
   const [messageForm, setMessageForm] = useState({
@@ -121,10 +126,20 @@ const InvitationContent = ({ invitation, guestName }) => {
     e.preventDefault();
     setRsvpLoading(true);
     try {
-      await axios.post(`${API_URL}/public/rsvp/${invitation.id}`, rsvpForm);
+      // New key per submission, reused only when retrying the exact same answer after a failure,
+      // so several guests RSVPing from one device never share a key
+      const payload = JSON.stringify(rsvpForm);
+      if (pendingRsvp.current?.payload !== payload) {
+        pendingRsvp.current = { payload, key: crypto.randomUUID() };
+      }
+      await axios.post(`${API_URL}/public/rsvp/${invitation.id}`, rsvpForm, {
+        headers: { 'Idempotency-Key': pendingRsvp.current.key }
+      });
+      pendingRsvp.current = null;
       toast.success('Konfirmasi kehadiran berhasil dikirim!');
       setRsvpForm({ ...rsvpForm, phone: '', guest_count: 1 });
     } catch (error) {
+      if (error.response?.status === 409) pendingRsvp.current = null;
       toast.error('Gagal mengirim konfirmasi');
     } finally {
       setRsvpLoading(false);
@@ -532,11 +547,33 @@ const InvitationContent = ({ invitation, guestName }) => {
                     key={item.id} 
                     className={`gallery-item ${index === 0 ? 'wide' : ''}`}
                   >
-                    <img 
-                      src={item.url} 
-                      alt={item.caption || `Gallery ${index + 1}`}
-                      className="w-full h-full object-cover"
-                    />
+                    {item.variants?.length > 0 ? (
+                      <picture>
+                        <source
+                          type="image/webp"
+                          srcSet={item.variants.filter((v) => v.format === 'webp').map((v) => `${mediaUrl(v.url)} ${v.width}w`).join(', ')}
+                          sizes={index === 0 ? '100vw' : '50vw'}
+                        />
+                        <img
+                          src={mediaUrl(item.url)}
+                          srcSet={item.variants.filter((v) => v.format === 'jpeg').map((v) => `${mediaUrl(v.url)} ${v.width}w`).join(', ')}
+                          sizes={index === 0 ? '100vw' : '50vw'}
+                          width={item.width}
+                          height={item.height}
+                          loading="lazy"
+                          decoding="async"
+                          alt={item.caption || `Gallery ${index + 1}`}
+                          className="w-full h-full object-cover"
+                          style={item.placeholder ? { backgroundImage: `url(${item.placeholder})`, backgroundSize: 'cover' } : undefined}
+                        />
+                      </picture>
+                    ) : (
+                      <img
+                        src={item.url}
+                        alt={item.caption || `Gallery ${index + 1}`}
+                        className="w-full h-full object-cover"
+                      />
+                    )}
                   </div>
                 ))}
               </div>
@@ -862,6 +899,7 @@ const InvitationPage = () => {
   
   const [invitation, setInvitation] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [compiledTheme, setCompiledTheme] = useState({});
 
   useEffect(() => {
     fetchInvitation();
@@ -879,6 +917,18 @@ const InvitationPage = () => {
     }
   };
 
+  // Compiled theme stylesheet (colors, fonts, ornaments) served with immutable caching;
+  // once loaded, its values (the owner's overrides included) style the whole page
+  useEffect(() => {
+    if (!invitation?.theme_css_url) return;
+    const link = document.createElement('link');
+    link.rel = 'stylesheet';
+    link.href = `${BACKEND_URL}${invitation.theme_css_url}`;
+    link.onload = () => setCompiledTheme(readCompiledTheme(invitation.theme || 'floral'));
+    document.head.appendChild(link);
+    return () => link.remove();
+  }, [invitation?.theme_css_url, invitation?.theme]);
+
   if (loading) {
     return (
       <div className="min-h-screen flex items-center justify-center bg-secondary">
@@ -903,7 +953,7 @@ const InvitationPage = () => {
   }
 
   return (
-    <ThemeProvider theme={invitation.theme || 'floral'}>
+    <ThemeProvider theme={invitation.theme || 'floral'} overrides={compiledTheme}>
       <InvitationContent invitation={invitation} guestName={guestName} />
     </ThemeProvider>
   );
@@ -74,11 +74,12 @@ const initialFormData = {
     music_url: '',
     music_list: [],
     active_music_id: '',
-    primary_color: '#B76E79',
-    secondary_color: '#F5E6E8',
-    accent_color: '#D4AF37',
-    font_heading: 'Playfair Display',
-    font_body: 'Manrope',
+    // Empty colors/fonts follow the chosen theme
+    primary_color: '',
+    secondary_color: '',
+    accent_color: '',
+    font_heading: '',
+    font_body: '',
     auto_scroll: true,
     show_countdown: true,
     show_love_story: true,
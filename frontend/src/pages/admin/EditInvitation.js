@@ -7,6 +7,8 @@ import { Input } from '@/components/ui/input';
 import { Textarea } from '@/components/ui/textarea';
 import { Label } from '@/components/ui/label';
 import { toast } from 'sonner';
+import { buildInvitationPatch } from '@/lib/invitationPatch';
+import { THEMES } from '@/themes/ThemeProvider';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from '@/components/ui/tabs';
 import { 
   Heart, User, Calendar, MapPin, Image, 
@@ -20,6 +22,8 @@ const EditInvitation = () => {
   const { getAuthHeaders } = useAuth();
   const navigate = useNavigate();
   const [formData, setFormData] = useState(null);
+  // Last saved version, PATCHes are diffed against it and carry its updated_at
+  const [original, setOriginal] = useState(null);
   const [loading, setLoading] = useState(true);
   const [saving, setSaving] = useState(false);
   const [activeTab, setActiveTab] = useState('couple');
@@ -34,6 +38,7 @@ const EditInvitation = () => {
         headers: getAuthHeaders()
       });
       setFormData(response.data);
+      setOriginal(response.data);
     } catch (error) {
       console.error('Failed to fetch invitation:', error);
       toast.error('Gagal memuat undangan');
@@ -136,27 +141,30 @@ const EditInvitation = () => {
       return;
     }
 
+    const patch = buildInvitationPatch(original, formData);
+    if (!patch) {
+      toast.success('Tidak ada perubahan untuk disimpan');
+      return;
+    }
+
     setSaving(true);
     try {
-      await axios.put(`${API_URL}/invitations/${invitationId}`, {
-        groom: formData.groom,
-        bride: formData.bride,
-        events: formData.events,
-        love_story: formData.love_story,
-        gallery: formData.gallery,
-        gifts: formData.gifts,
-        opening_text: formData.opening_text,
-        closing_text: formData.closing_text,
-        video_url: formData.video_url,
-        streaming_url: formData.streaming_url,
-        settings: formData.settings
+      const response = await axios.patch(`${API_URL}/invitations/${invitationId}`, {
+        updated_at: original.updated_at,
+        ...patch
       }, {
         headers: getAuthHeaders()
       });
+      setFormData(response.data);
+      setOriginal(response.data);
       toast.success('Undangan berhasil diperbarui!');
     } catch (error) {
       console.error('Failed to update invitation:', error);
-      toast.error('Gagal memperbarui undangan');
+      if (error.response?.status === 409) {
+        toast.error('Undangan sudah diubah di tab lain. Muat ulang halaman untuk melihat versi terbaru.');
+      } else {
+        toast.error('Gagal memperbarui undangan');
+      }
     } finally {
       setSaving(false);
     }
@@ -170,6 +178,9 @@ const EditInvitation = () => {
     );
   }
 
+  // Empty color settings follow the theme
+  const themeData = THEMES[formData.theme] || THEMES.floral;
+
   return (
     <div data-testid="edit-invitation-page">
       <div className="flex items-center justify-between mb-6">
@@ -520,22 +531,22 @@ const EditInvitation = () => {
               <div>
                 <Label>Warna Primer</Label>
                 <div className="flex gap-2 mt-1">
-                  <Input type="color" value={formData.settings.primary_color} onChange={(e) => updateFormData('settings', 'primary_color', e.target.value)} className="w-12 h-10 p-1" />
-                  <Input value={formData.settings.primary_color} onChange={(e) => updateFormData('settings', 'primary_color', e.target.value)} className="flex-1" />
+                  <Input type="color" value={formData.settings.primary_color || themeData.primaryColor} onChange={(e) => updateFormData('settings', 'primary_color', e.target.value)} className="w-12 h-10 p-1" />
+                  <Input value={formData.settings.primary_color || ''} placeholder={themeData.primaryColor} onChange={(e) => updateFormData('settings', 'primary_color', e.target.value)} className="flex-1" />
                 </div>
               </div>
               <div>
                 <Label>Warna Sekunder</Label>
                 <div className="flex gap-2 mt-1">
-                  <Input type="color" value={formData.settings.secondary_color} onChange={(e) => updateFormData('settings', 'secondary_color', e.target.value)} className="w-12 h-10 p-1" />
-                  <Input value={formData.settings.secondary_color} onChange={(e) => updateFormData('settings', 'secondary_color', e.target.value)} className="flex-1" />
+                  <Input type="color" value={formData.settings.secondary_color || themeData.secondaryColor} onChange={(e) => updateFormData('settings', 'secondary_color', e.target.value)} className="w-12 h-10 p-1" />
+                  <Input value={formData.settings.secondary_color || ''} placeholder={themeData.secondaryColor} onChange={(e) => updateFormData('settings', 'secondary_color', e.target.value)} className="flex-1" />
                 </div>
               </div>
               <div>
                 <Label>Warna Aksen</Label>
                 <div className="flex gap-2 mt-1">
-                  <Input type="color" value={formData.settings.accent_color} onChange={(e) => updateFormData('settings', 'accent_color', e.target.value)} className="w-12 h-10 p-1" />
-                  <Input value={formData.settings.accent_color} onChange={(e) => updateFormData('settings', 'accent_color', e.target.value)} className="flex-1" />
+                  <Input type="color" value={formData.settings.accent_color || themeData.accentColor} onChange={(e) => updateFormData('settings', 'accent_color', e.target.value)} className="w-12 h-10 p-1" />
+                  <Input value={formData.settings.accent_color || ''} placeholder={themeData.accentColor} onChange={(e) => updateFormData('settings', 'accent_color', e.target.value)} className="flex-1" />
                 </div>
               </div>
             </div>
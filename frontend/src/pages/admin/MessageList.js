@@ -23,7 +23,7 @@ import {
   AlertDialogHeader,
   AlertDialogTitle,
 } from '@/components/ui/alert-dialog';
-import { Heart, ArrowLeft, Trash2, MessageCircle, Reply, Send } from 'lucide-react';
+import { Heart, ArrowLeft, Trash2, MessageCircle, Reply, Send, Search } from 'lucide-react';
 
 const API_URL = `${process.env.REACT_APP_BACKEND_URL}/api`;
 
@@ -37,13 +37,28 @@ const MessageList = () => {
   const [replyMessage, setReplyMessage] = useState(null);
   const [replyText, setReplyText] = useState('');
   const [replyLoading, setReplyLoading] = useState(false);
+  const [query, setQuery] = useState('');
 
   useEffect(() => {
-    fetchMessages();
-  }, [invitationId]);
+    if (loading) {
+      fetchMessages();
+      return;
+    }
+    // Server-side search, debounced while typing
+    const timer = setTimeout(fetchMessages, 300);
+    return () => clearTimeout(timer);
+  }, [invitationId, query]);
 
   const fetchMessages = async () => {
     try {
+      if (query.trim()) {
+        const response = await axios.get(`${API_URL}/invitations/${invitationId}/messages/search`, {
+          params: { q: query, limit: 100 },
+          headers: getAuthHeaders()
+        });
+        setMessages(response.data.items);
+        return;
+      }
       const response = await axios.get(`${API_URL}/invitations/${invitationId}/messages`, {
         headers: getAuthHeaders()
       });
@@ -91,6 +106,19 @@ const MessageList = () => {
     }
   };
 
+  const handleModeration = async (msg, status) => {
+    try {
+      await axios.put(`${API_URL}/messages/${msg.id}/moderation`,
+        { status },
+        { headers: getAuthHeaders() }
+      );
+      toast.success(status === 'approved' ? 'Ucapan ditampilkan' : 'Ucapan disembunyikan');
+      fetchMessages();
+    } catch (error) {
+      toast.error('Gagal memperbarui ucapan');
+    }
+  };
+
   if (loading) {
     return (
       <div className="flex items-center justify-center h-64">
@@ -111,6 +139,17 @@ const MessageList = () => {
         </div>
       </div>
 
+      <div className="relative mb-4">
+        <Search className="w-4 h-4 absolute left-3 top-1/2 -translate-y-1/2 text-muted-foreground" />
+        <Input
+          placeholder="Cari nama tamu atau isi ucapan"
+          value={query}
+          onChange={(e) => setQuery(e.target.value)}
+          className="pl-9 bg-white"
+          data-testid="message-search-input"
+        />
+      </div>
+
       {messages.length === 0 ? (
         <div className="bg-white rounded-xl border p-12 text-center">
           <MessageCircle className="w-12 h-12 text-primary/30 mx-auto mb-4" />
@@ -135,6 +174,12 @@ const MessageList = () => {
                           year: 'numeric'
                         })}
                       </span>
+                      {msg.status === 'held' && (
+                        <span className="text-xs px-2 py-0.5 rounded-full bg-red-50 text-red-600">Ditahan</span>
+                      )}
+                      {msg.status === 'flagged' && (
+                        <span className="text-xs px-2 py-0.5 rounded-full bg-amber-50 text-amber-600">Perlu ditinjau</span>
+                      )}
                     </div>
                     <p className="text-foreground/80">{msg.message}</p>
                     
@@ -148,6 +193,16 @@ const MessageList = () => {
                 </div>
                 
                 <div className="flex items-center gap-2">
+                  {msg.status && msg.status !== 'approved' && (
+                    <Button
+                      variant="outline"
+                      size="sm"
+                      onClick={() => handleModeration(msg, 'approved')}
+                      data-testid={`approve-msg-${msg.id}`}
+                    >
+                      Tampilkan
+                    </Button>
+                  )}
                   <Button
                     variant="outline"
                     size="sm"
@@ -3,6 +3,7 @@ import { useParams, useNavigate } from 'react-router-dom';
 import { useAuth } from '@/context/AuthContext';
 import axios from 'axios';
 import { Button } from '@/components/ui/button';
+import { Input } from '@/components/ui/input';
 import { toast } from 'sonner';
 import {
   Table,
@@ -13,6 +14,7 @@ import {
   TableRow,
 } from '@/components/ui/table';
 import { Badge } from '@/components/ui/badge';
+import { ResponsiveContainer, BarChart, Bar, XAxis, YAxis, Tooltip, Legend } from 'recharts';
 import {
   AlertDialog,
   AlertDialogAction,
@@ -23,7 +25,7 @@ import {
   AlertDialogHeader,
   AlertDialogTitle,
 } from '@/components/ui/alert-dialog';
-import { Heart, ArrowLeft, Trash2, Users, CheckCircle, XCircle, HelpCircle } from 'lucide-react';
+import { Heart, ArrowLeft, Trash2, Users, CheckCircle, XCircle, HelpCircle, Search } from 'lucide-react';
 
 const API_URL = `${process.env.REACT_APP_BACKEND_URL}/api`;
 
@@ -33,21 +35,50 @@ const RSVPList = () => {
   const navigate = useNavigate();
   const [rsvps, setRsvps] = useState([]);
   const [stats, setStats] = useState(null);
+  const [timeseries, setTimeseries] = useState([]);
   const [loading, setLoading] = useState(true);
   const [deleteId, setDeleteId] = useState(null);
+  const [query, setQuery] = useState('');
 
   useEffect(() => {
     fetchData();
   }, [invitationId]);
 
+  // Server-side search, debounced while typing
+  useEffect(() => {
+    if (loading) return;
+    const timer = setTimeout(() => {
+      if (query.trim()) {
+        searchRsvps(query);
+      } else {
+        fetchData();
+      }
+    }, 300);
+    return () => clearTimeout(timer);
+  }, [query]);
+
+  const searchRsvps = async (q) => {
+    try {
+      const response = await axios.get(`${API_URL}/invitations/${invitationId}/rsvps/search`, {
+        params: { q, limit: 100 },
+        headers: getAuthHeaders()
+      });
+      setRsvps(response.data.items);
+    } catch (error) {
+      toast.error('Gagal mencari RSVP');
+    }
+  };
+
   const fetchData = async () => {
     try {
-      const [rsvpRes, statsRes] = await Promise.all([
+      const [rsvpRes, statsRes, timeseriesRes] = await Promise.all([
         axios.get(`${API_URL}/invitations/${invitationId}/rsvps`, { headers: getAuthHeaders() }),
-        axios.get(`${API_URL}/invitations/${invitationId}/stats`, { headers: getAuthHeaders() })
+        axios.get(`${API_URL}/invitations/${invitationId}/stats`, { headers: getAuthHeaders() }),
+        axios.get(`${API_URL}/invitations/${invitationId}/timeseries`, { headers: getAuthHeaders() })
       ]);
       setRsvps(rsvpRes.data);
       setStats(statsRes.data);
+      setTimeseries(timeseriesRes.data.points);
     } catch (error) {
       console.error('Failed to fetch data:', error);
       toast.error('Gagal memuat data');
@@ -122,6 +153,37 @@ const RSVPList = () => {
         </div>
       )}
 
+      {/* RSVP & ucapan per hari */}
+      {timeseries.length > 0 && (
+        <div className="bg-white rounded-xl border p-4 mb-6" data-testid="rsvp-timeseries-chart">
+          <p className="text-sm text-muted-foreground mb-2">RSVP & ucapan per hari</p>
+          <ResponsiveContainer width="100%" height={220}>
+            <BarChart data={timeseries}>
+              <XAxis dataKey="bucket" fontSize={12} />
+              <YAxis allowDecimals={false} fontSize={12} />
+              <Tooltip />
+              <Legend />
+              <Bar dataKey="attending" name="Hadir" stackId="rsvp" fill="#16a34a" />
+              <Bar dataKey="not_attending" name="Tidak Hadir" stackId="rsvp" fill="#ef4444" />
+              <Bar dataKey="uncertain" name="Belum Pasti" stackId="rsvp" fill="#eab308" />
+              <Bar dataKey="total_messages" name="Ucapan" fill="#B76E79" />
+            </BarChart>
+          </ResponsiveContainer>
+        </div>
+      )}
+
+      {/* Search */}
+      <div className="relative mb-4">
+        <Search className="w-4 h-4 absolute left-3 top-1/2 -translate-y-1/2 text-muted-foreground" />
+        <Input
+          placeholder="Cari nama atau nomor WhatsApp"
+          value={query}
+          onChange={(e) => setQuery(e.target.value)}
+          className="pl-9 bg-white"
+          data-testid="rsvp-search-input"
+        />
+      </div>
+
       {/* Table */}
       <div className="bg-white rounded-xl border overflow-hidden">
         {rsvps.length === 0 ? (
@@ -64,6 +64,36 @@ export const THEMES = {
   }
 };
 
+// Custom properties the compiled theme stylesheet (/api/themes/css/{fingerprint}.css) sets, by theme key
+export const THEME_CSS_VARIABLES = {
+  primaryColor: '--theme-primary',
+  secondaryColor: '--theme-secondary',
+  accentColor: '--theme-accent',
+  fontHeading: '--theme-font-heading',
+  fontBody: '--theme-font-body'
+};
+
+// Colors and fonts the loaded compiled stylesheet gives an invitation of this theme,
+// i.e. the theme with the owner's overrides applied
+export const readCompiledTheme = (themeId) => {
+  const probe = document.createElement('div');
+  probe.className = `invitation-container theme-${themeId}`;
+  probe.hidden = true;
+  document.body.appendChild(probe);
+  const styles = getComputedStyle(probe);
+  const compiled = {};
+  Object.entries(THEME_CSS_VARIABLES).forEach(([key, name]) => {
+    let value = styles.getPropertyValue(name).trim();
+    if (key.startsWith('font')) {
+      // "'Montserrat', serif" -> "Montserrat"
+      value = value.split(',')[0].replace(/['"]/g, '').trim();
+    }
+    if (value) compiled[key] = value;
+  });
+  probe.remove();
+  return compiled;
+};
+
 const ThemeContext = createContext(null);
 
 export const useTheme = () => {
@@ -74,8 +104,8 @@ export const useTheme = () => {
   return context;
 };
 
-export const ThemeProvider = ({ theme, children }) => {
-  const themeData = THEMES[theme] || THEMES.floral;
+export const ThemeProvider = ({ theme, overrides = {}, children }) => {
+  const themeData = { ...(THEMES[theme] || THEMES.floral), ...overrides };
   
   return (
     <ThemeContext.Provider value={themeData}>
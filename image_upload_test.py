@@ -0,0 +1,96 @@
+"""
+Image Upload Tests for Wedding Invitation App - Responsive Variants Focus
+Drives POST /api/upload/image in-process (local upload storage) and checks:
+  - every variant width is produced as WebP and JPEG, capped at the source width
+  - variants are real, decodable images with camera metadata (EXIF) stripped
+  - oversized uploads, decompression-bomb sized images and non-images are rejected
+  - direct (presigned) uploads answer 501 on local storage instead of failing
+
+Needs MongoDB at MONGO_URL (default mongodb://localhost:27017) for the auth steps.
+
+Usage:
+    python -m pytest image_upload_test.py
+"""
+
+import io
+import os
+
+import pytest
+from PIL import Image
+
+@pytest.fixture(scope="module")
+def backend_env():
+    return {"STORAGE_BACKEND": "local", "IMAGE_MAX_UPLOAD_MB": "2"}
+
+@pytest.fixture(scope="module")
+def headers(register):
+    return register("images")
+
+def jpeg_bytes(width, height, with_exif=False):
+    img = Image.new("RGB", (width, height), (180, 90, 60))
+    buffer = io.BytesIO()
+    if with_exif:
+        exif = Image.Exif()
+        exif[0x010F] = "KameraTest"  # Make
+        exif[0x0112] = 1  # Orientation
+        img.save(buffer, "JPEG", exif=exif.tobytes())
+    else:
+        img.save(buffer, "JPEG")
+    return buffer.getvalue()
+
+def upload(tc, headers, name, data, content_type="image/jpeg"):
+    return tc.post("/api/upload/image", files={"file": (name, data, content_type)}, headers=headers)
+
+def cleanup(tc, server, variants):
+    for variant in variants:
+        tc.portal.call(server.storage.delete, variant["url"].split("/uploads/", 1)[1])
+
+def test_variants_generated(client, server, headers):
+    """A large photo yields every width in both formats, decodable and without EXIF"""
+    response = upload(client, headers, "foto.jpg", jpeg_bytes(2400, 1600, with_exif=True))
+    assert response.status_code == 200, f"HTTP {response.status_code}: {response.text}"
+    data = response.json()
+    try:
+        expected = {(w, f) for w in server.IMAGE_VARIANT_WIDTHS for f in ("webp", "jpeg")}
+        assert {(v["width"], v["format"]) for v in data["variants"]} == expected
+        assert data["width"] == max(server.IMAGE_VARIANT_WIDTHS)
+        assert data["placeholder"].startswith("data:image/jpeg")
+
+        for variant in data["variants"]:
+            img = Image.open(io.BytesIO(client.get(variant["url"]).content))
+            assert (img.format.lower(), img.size) == (variant["format"], (variant["width"], variant["height"]))
+            assert variant["height"] == round(1600 * variant["width"] / 2400), f"Aspect ratio not kept for {variant['width']}px"
+            assert not img.getexif().get(0x010F), f"EXIF survived in {variant['url']}"
+    finally:
+        cleanup(client, server, data["variants"])
+
+def test_small_image_not_upscaled(client, server, headers):
+    """Widths above the source are capped at the source width instead of upscaled"""
+    response = upload(client, headers, "kecil.png", jpeg_bytes(500, 400), "image/png")
+    assert response.status_code == 200, f"HTTP {response.status_code}: {response.text}"
+    data = response.json()
+    cleanup(client, server, data["variants"])
+    assert sorted({v["width"] for v in data["variants"]}) == [320, 500]
+
+def test_rejected_uploads(client, headers):
+    """Too many bytes (413), too many pixels, non-images and wrong extensions (400)"""
+    bomb = io.BytesIO()
+    Image.new("1", (8000, 7000)).save(bomb, "PNG")
+    cases = [
+        ("oversized bytes", upload(client, headers, "besar.jpg", os.urandom(2 * 1024 * 1024 + 10)), 413),
+        ("too many pixels", upload(client, headers, "bom.png", bomb.getvalue(), "image/png"), 400),
+        ("not an image", upload(client, headers, "palsu.jpg", b"bukan gambar sama sekali"), 400),
+        ("wrong extension", upload(client, headers, "catatan.txt", jpeg_bytes(50, 50), "text/plain"), 400),
+    ]
+    for name, response, expected in cases:
+        assert response.status_code == expected, f"{name}: expected HTTP {expected}, got {response.status_code}"
+
+def test_direct_upload_unsupported(client, headers):
+    """Local storage cannot presign: /upload/presign and /upload/complete are a clean 501"""
+    responses = [
+        client.post("/api/upload/presign", json={"kind": "image", "filename": "foto.jpg", "content_type": "image/jpeg"},
+                    headers=headers),
+        client.post("/api/upload/complete", json={"kind": "image", "key": "incoming/x/foto.jpg", "filename": "foto.jpg"},
+                    headers=headers),
+    ]
+    assert [r.status_code for r in responses] == [501, 501]
@@ -0,0 +1,82 @@
+"""
+Message Moderation Tests for Wedding Invitation App - Blocklist Focus
+Drives the backend in-process against a temporary blocklist and checks:
+  - word terms only match whole words, URL fragments match anywhere
+  - "flag" terms show the message marked as flagged, "hold" terms hide it from guests
+  - the owner can approve a held message, after which guests see it; other users cannot
+
+Needs MongoDB at MONGO_URL (default mongodb://localhost:27017).
+
+Usage:
+    python -m pytest moderation_test.py
+"""
+
+import pytest
+
+BLOCKLIST = """# test blocklist
+flag:babi
+hold:bangsat
+hold:bit.ly/
+"""
+
+@pytest.fixture(scope="module")
+def backend_env(tmp_path_factory):
+    blocklist = tmp_path_factory.mktemp("moderation") / "blocklist.txt"
+    blocklist.write_text(BLOCKLIST, encoding="utf-8")
+    return {"MODERATION_BLOCKLIST_PATH": blocklist}
+
+@pytest.fixture(scope="module")
+def owner(register):
+    return register("owner")
+
+@pytest.fixture(scope="module")
+def invitation_id(create_invitation, owner):
+    return create_invitation(owner)["id"]
+
+def post_message(tc, invitation_id, message):
+    return tc.post(f"/api/public/messages/{invitation_id}", json={"guest_name": "Tamu", "message": message}).json()
+
+def public_ids(tc, invitation_id):
+    return {m["id"] for m in tc.get(f"/api/public/messages/{invitation_id}").json()}
+
+def test_word_boundaries(server):
+    """Terms inside longer words do not match; whole words and URL fragments do"""
+    matcher = server.BlocklistMatcher(server.load_blocklist(server.MODERATION_BLOCKLIST_PATH))
+    cases = {
+        "Semoga kebabian selalu": [],
+        "Sate babinya enak": [],
+        "Dasar BABI!": [("babi", "flag")],
+        "babi": [("babi", "flag")],
+        "promo di https://bit.ly/xyz": [("bit.ly/", "hold")],
+        "(bit.ly/abc)": [("bit.ly/", "hold")],
+        "rabbit.ly/abc": [],
+    }
+    for text, expected in cases.items():
+        assert sorted(matcher.scan(text)) == expected, f"{text!r}"
+
+def test_flag_and_hold(client, invitation_id):
+    """Clean and flagged messages are public, held ones are not"""
+    clean = post_message(client, invitation_id, "Selamat menempuh hidup baru, kebabian!")
+    flagged = post_message(client, invitation_id, "dasar babi")
+    held = post_message(client, invitation_id, "Bangsat, klik bit.ly/promo")
+
+    assert (clean["status"], flagged["status"], held["status"]) == ("approved", "flagged", "held")
+    assert flagged["flagged_terms"] == ["babi"]
+    assert held["flagged_terms"] == ["bangsat", "bit.ly/"]
+    assert public_ids(client, invitation_id) == {clean["id"], flagged["id"]}, "Held message visible to guests, or shown messages missing"
+
+def test_approve_flow(client, register, owner, invitation_id):
+    """The owner approves a held message and guests then see it; other users cannot moderate it"""
+    other = register("other")
+    owner_messages = client.get(f"/api/invitations/{invitation_id}/messages", headers=owner).json()
+    held = next(m for m in owner_messages if m["status"] == "held")
+
+    response = client.put(f"/api/messages/{held['id']}/moderation", json={"status": "approved"}, headers=other)
+    assert response.status_code in (403, 404), "Other user moderated the message"
+
+    response = client.put(f"/api/messages/{held['id']}/moderation", json={"status": "approved"}, headers=owner)
+    assert response.status_code == 200 and response.json()["status"] == "approved", f"Approve HTTP {response.status_code}: {response.text}"
+    assert held["id"] in public_ids(client, invitation_id), "Approved message not visible to guests"
+
+    client.put(f"/api/messages/{held['id']}/moderation", json={"status": "held"}, headers=owner)
+    assert held["id"] not in public_ids(client, invitation_id), "Message held again is still visible to guests"
@@ -0,0 +1,151 @@
+"""
+MongoDB Resilience Tests for Wedding Invitation App - Time Budget & Circuit Breaker Focus
+Puts a TCP proxy that can inject latency between the backend and MongoDB, then checks:
+  - slow Mongo calls are cut off at the route's time budget instead of the 30 s driver timeouts
+  - guests get the last served (stale) invitation while Mongo is slow, owners get a 503
+  - repeated failures trip the breaker, after which requests fail fast without touching Mongo
+  - once latency is gone, a probe request after the cooldown closes the breaker again
+
+Needs MongoDB at MONGO_URL (default mongodb://localhost:27017), reachable directly over TCP.
+
+Usage:
+    python -m pytest mongo_resilience_test.py
+"""
+
+import os
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+import pytest
+
+PROXY_PORT = 5077
+INJECTED_LATENCY_SECONDS = 3
+COOLDOWN_SECONDS = 1
+
+class LatencyProxy:
+    """Forwards TCP connections to MongoDB, delaying every reply chunk by `delay` seconds"""
+
+    def __init__(self, target_host, target_port):
+        self.target = (target_host, target_port)
+        self.delay = 0.0
+        self.listener = socket.create_server(("127.0.0.1", PROXY_PORT))
+        threading.Thread(target=self.accept_loop, daemon=True).start()
+
+    def accept_loop(self):
+        while True:
+            try:
+                client, _ = self.listener.accept()
+            except OSError:
+                return
+            upstream = socket.create_connection(self.target)
+            threading.Thread(target=self.pipe, args=(client, upstream, False), daemon=True).start()
+            threading.Thread(target=self.pipe, args=(upstream, client, True), daemon=True).start()
+
+    def pipe(self, source, dest, delayed):
+        try:
+            while True:
+                data = source.recv(65536)
+                if not data:
+                    break
+                if delayed and self.delay:
+                    time.sleep(self.delay)
+                dest.sendall(data)
+        except OSError:
+            pass
+        finally:
+            source.close()
+            dest.close()
+
+    def close(self):
+        self.listener.close()
+
+@pytest.fixture(scope="module")
+def proxy():
+    target = urlparse(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    proxy = LatencyProxy(target.hostname or "localhost", target.port or 27017)
+    yield proxy
+    proxy.close()
+
+@pytest.fixture(scope="module")
+def backend_env(proxy):
+    """Connected through the proxy, with short budgets and cooldown"""
+    return {
+        "MONGO_URL": f"mongodb://127.0.0.1:{PROXY_PORT}/?directConnection=true",
+        "MONGO_PUBLIC_TIME_BUDGET_SECONDS": "0.5",
+        "MONGO_DEFAULT_TIME_BUDGET_SECONDS": "1.5",
+        "MONGO_BREAKER_MIN_REQUESTS": "4",
+        "MONGO_BREAKER_WINDOW_SECONDS": "30",
+        "MONGO_BREAKER_COOLDOWN_SECONDS": COOLDOWN_SECONDS,
+        # Keep background workers off the proxied connection while latency is injected
+        "NOTIFY_POLL_SECONDS": "3600",
+        "VIEW_FLUSH_SECONDS": "3600",
+    }
+
+@pytest.fixture(scope="module")
+def owner(register):
+    return register("resilience")
+
+@pytest.fixture(scope="module")
+def invitation_id(create_invitation, owner):
+    return create_invitation(owner)["id"]
+
+@pytest.fixture(autouse=True)
+def fast_proxy_afterwards(proxy):
+    yield
+    proxy.delay = 0
+
+def timed(call, *args, **kwargs):
+    start = time.perf_counter()
+    response = call(*args, **kwargs)
+    return response, time.perf_counter() - start
+
+def test_slow_queries_cut_at_budget(client, proxy, owner, invitation_id):
+    """With injected latency, guests get the stale invitation and owners a 503, both within budget"""
+    # Serve it once so there is something stale to fall back to
+    response = client.get(f"/api/public/invitation/{invitation_id}")
+    assert response.status_code == 200, f"Warm-up HTTP {response.status_code}"
+    fresh = response.json()
+
+    proxy.delay = INJECTED_LATENCY_SECONDS
+    response, elapsed = timed(client.get, f"/api/public/invitation/{invitation_id}")
+    assert response.status_code == 200 and "Warning" in response.headers, f"Expected a stale 200, got HTTP {response.status_code}"
+    assert response.json() == fresh, "Stale payload differs from the last one served"
+    assert elapsed <= 1.5, f"Public request took {elapsed:.2f}s with a 0.5s budget"
+
+    response, elapsed = timed(client.get, "/api/invitations", headers=owner)
+    assert response.status_code == 503 and "Retry-After" in response.headers, f"Expected 503 with Retry-After, got HTTP {response.status_code}"
+    assert elapsed <= 2.5, f"Owner request took {elapsed:.2f}s with a 1.5s budget"
+
+def test_breaker_trips_and_fails_fast(client, proxy, owner, invitation_id):
+    """Failures trip the breaker; afterwards requests are answered without waiting on Mongo"""
+    proxy.delay = INJECTED_LATENCY_SECONDS
+    for _ in range(10):
+        if client.get("/api/health/mongo").json()["breaker"]["state"] == "open":
+            break
+        client.get("/api/invitations", headers=owner)
+    metrics = client.get("/api/health/mongo").json()["breaker"]
+    assert metrics["state"] == "open" and metrics["trips"] == 1, f"Breaker did not trip: {metrics}"
+
+    response, elapsed = timed(client.get, "/api/invitations", headers=owner)
+    assert response.status_code == 503 and elapsed <= 0.2, f"Open breaker answered HTTP {response.status_code} after {elapsed:.2f}s"
+    response, elapsed = timed(client.get, f"/api/public/invitation/{invitation_id}")
+    assert response.status_code == 200 and "Warning" in response.headers and elapsed <= 0.2, \
+        f"Open breaker should serve the stale invitation fast, got HTTP {response.status_code} after {elapsed:.2f}s"
+
+    # Routes that don't use the database keep answering while the breaker is open
+    for url in ("/api/", "/api/themes", "/api/themes/floral"):
+        assert client.get(url).status_code == 200, f"Open breaker rejected {url}, which doesn't use Mongo"
+
+    assert client.get("/api/health/mongo").json()["breaker"]["rejected"] == 2, "Rejected requests not counted"
+
+def test_breaker_recovers(client, proxy, owner):
+    """Once Mongo is fast again, the first request after the cooldown closes the breaker"""
+    proxy.delay = 0
+    time.sleep(COOLDOWN_SECONDS + 0.2)
+
+    response = client.get("/api/invitations", headers=owner)
+    assert response.status_code == 200, f"Probe request HTTP {response.status_code}: {response.text}"
+    metrics = client.get("/api/health/mongo").json()["breaker"]
+    assert metrics["state"] == "closed" and metrics["recoveries"] == 1, f"Breaker did not recover: {metrics}"
@@ -0,0 +1,228 @@
+"""
+Owner Notification Tests for Wedding Invitation App - Digest Delivery Focus
+Runs a local HTTP receiver standing in for an owner's webhook, points the backend at it and checks:
+  - RSVPs and messages are batched per owner into one digest once enough events are pending
+  - idempotent RSVP retries don't produce extra notifications
+  - failed deliveries are retried with backoff and keep the same digest id
+  - a lone event is still delivered once it is older than the digest window
+  - webhook URLs pointing at private, loopback or link-local addresses are refused on save and on send
+  - deliveries that keep failing are dead-lettered with an expiry
+  - each owner only gets the channels they enabled, and a retry skips channels that already succeeded
+
+Needs MongoDB at MONGO_URL (default mongodb://localhost:27017).
+
+Usage:
+    python -m pytest notification_test.py
+"""
+
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+RECEIVER_PORT = 5066
+
+class Receiver:
+    """Records digests POSTed to it; can be told to fail the next N requests"""
+
+    def __init__(self):
+        self.requests = []
+        self.fail_next = 0
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                receiver.requests.append((self.headers.get("X-Undanganku-Digest"), body))
+                if receiver.fail_next:
+                    receiver.fail_next -= 1
+                    self.send_response(500)
+                else:
+                    self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", RECEIVER_PORT), Handler)
+        self.url = f"http://127.0.0.1:{RECEIVER_PORT}/hooks/undangan"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def clear(self):
+        self.requests = []
+
+class EmailRecorder:
+    """Stands in for the SMTP sender, records (address, digest) per send"""
+
+    def __init__(self):
+        self.sent = []
+
+    def destination(self, owner):
+        return owner["email"] if (owner.get("notification_settings") or {}).get("email") else None
+
+    async def send(self, destination, digest):
+        self.sent.append((destination, digest))
+
+@pytest.fixture(scope="module")
+def backend_env():
+    """Small digest thresholds and fast retries"""
+    return {
+        "NOTIFY_CHANNELS": "webhook,email",
+        # The local receiver is on loopback, which webhook URLs may not use otherwise
+        "NOTIFY_WEBHOOK_ALLOWED_HOSTS": "127.0.0.1",
+        "NOTIFY_MAX_ATTEMPTS": "3",
+        "NOTIFY_DIGEST_MAX_EVENTS": "5",
+        "NOTIFY_DIGEST_SECONDS": "3600",
+        "NOTIFY_BACKOFF_BASE_SECONDS": "0.2",
+        # The tests drive delivery passes themselves
+        "NOTIFY_POLL_SECONDS": "3600",
+    }
+
+@pytest.fixture(scope="module")
+def receiver():
+    receiver = Receiver()
+    yield receiver
+    receiver.server.shutdown()
+
+@pytest.fixture(autouse=True)
+def fresh_receiver(receiver):
+    receiver.clear()
+    receiver.fail_next = 0
+
+@pytest.fixture(scope="module")
+def setup_owner(client, register, create_invitation, receiver):
+    """setup_owner(webhook=True, email=False) -> id of an invitation whose owner enabled those channels"""
+    def setup_owner(webhook=True, email=False):
+        headers = register("notify")
+        client.put("/api/auth/notifications", json={"webhook_url": receiver.url if webhook else "", "email": email},
+                   headers=headers)
+        return create_invitation(headers)["id"]
+    return setup_owner
+
+def add_guest_activity(tc, invitation_id, rsvps, messages):
+    for i in range(rsvps):
+        rsvp = {"guest_name": f"Tamu {uuid.uuid4().hex[:4]}", "phone": f"0812{i:08d}", "attendance": "hadir", "guest_count": 2}
+        key = str(uuid.uuid4())
+        tc.post(f"/api/public/rsvp/{invitation_id}", json=rsvp, headers={"Idempotency-Key": key})
+        # Retried submission, must not notify twice
+        tc.post(f"/api/public/rsvp/{invitation_id}", json=rsvp, headers={"Idempotency-Key": key})
+    for _ in range(messages):
+        tc.post(f"/api/public/messages/{invitation_id}", json={"guest_name": "Tamu", "message": "Selamat menempuh hidup baru"})
+
+def deliver_until(tc, server, done, timeout=10):
+    """Run delivery passes until done() or the timeout; returns events delivered per pass"""
+    passes = []
+    deadline = time.time() + timeout
+    while time.time() < deadline and not done(passes):
+        passes.append(tc.portal.call(server.deliver_due_digests))
+        time.sleep(0.1)
+    return passes
+
+def test_events_batched_per_owner(client, server, receiver, setup_owner):
+    """Events wait until the batch threshold, then go out as one digest"""
+    invitation_id = setup_owner()
+    add_guest_activity(client, invitation_id, rsvps=3, messages=1)
+
+    delivered = client.portal.call(server.deliver_due_digests)
+    assert not delivered and not receiver.requests, f"Delivered {delivered} events before the batch threshold"
+
+    add_guest_activity(client, invitation_id, rsvps=0, messages=1)
+    delivered = client.portal.call(server.deliver_due_digests)
+    assert (delivered, len(receiver.requests)) == (5, 1), "Expected one digest with 5 events"
+
+    digest = receiver.requests[0][1]
+    assert digest["counts"] == {"rsvp": 3, "message": 2}
+    assert all(event["invitation_id"] == invitation_id for event in digest["events"]), "Digest contains events from another invitation"
+
+def test_failed_delivery_retried(client, server, receiver, setup_owner):
+    """A failing webhook is retried with backoff, with a stable digest id"""
+    invitation_id = setup_owner()
+    add_guest_activity(client, invitation_id, rsvps=2, messages=3)
+    receiver.fail_next = 2
+
+    attempts = deliver_until(client, server, lambda passes: passes and passes[-1])
+    assert attempts[-1] == 5, f"Digest never delivered, attempts: {attempts}"
+    assert len(receiver.requests) == 3, "Expected 2 failures and 1 success"
+    assert len({digest_id for digest_id, _ in receiver.requests}) == 1, "Retries used different digest ids"
+    # Backoff: passes in between found nothing due
+    assert len(attempts) >= 4, f"Retries were not backed off: {attempts}"
+    assert not client.portal.call(server.db.notification_outbox.count_documents, {}), "Events left in the outbox after delivery"
+
+def test_lone_event_delivered_after_window(client, server, receiver, setup_owner):
+    """A single event goes out once it is older than the digest window"""
+    invitation_id = setup_owner()
+    add_guest_activity(client, invitation_id, rsvps=1, messages=0)
+
+    server.NOTIFY_DIGEST_SECONDS = 0
+    delivered = client.portal.call(server.deliver_due_digests)
+    assert (delivered, len(receiver.requests)) == (1, 1), "Expected the lone RSVP to be delivered"
+
+def test_private_webhook_refused(client, server, receiver, register, setup_owner):
+    """Webhook URLs resolving to internal addresses are refused on save and dead-lettered on send"""
+    headers = register("notify")
+    for url in ("http://localhost:8001/", "http://169.254.169.254/latest/meta-data/", "http://10.0.0.1/hook",
+                "http://[::1]/hook", "http://[::ffff:127.0.0.1]/hook", "ftp://example.com/hook"):
+        response = client.put("/api/auth/notifications", json={"webhook_url": url}, headers=headers)
+        assert response.status_code == 400, f"{url} accepted on save"
+
+    # A URL stored before the check existed is refused at send time, without a request
+    invitation_id = setup_owner()
+    owner_id = client.portal.call(server.db.invitations.find_one, {"id": invitation_id})["user_id"]
+    client.portal.call(server.db.users.update_one, {"id": owner_id},
+                       {"$set": {"notification_settings.webhook_url": "http://127.0.0.2:5066/hooks"}})
+    add_guest_activity(client, invitation_id, rsvps=0, messages=5)
+    delivered = client.portal.call(server.deliver_due_digests)
+    events = client.portal.call(lambda: server.db.notification_outbox.find({"owner_id": owner_id}).to_list(None))
+    assert not delivered and not receiver.requests, "Digest sent to a loopback webhook"
+    assert {event["status"] for event in events} == {"dead"}, "Refused digest not dead-lettered"
+    assert all(event.get("expires_at") for event in events), "Dead letters have no expiry"
+    client.portal.call(server.db.notification_outbox.delete_many, {"owner_id": owner_id})
+
+def test_dead_letter_after_max_attempts(client, server, receiver, setup_owner):
+    """A webhook that keeps failing stops being retried and expires from the outbox"""
+    invitation_id = setup_owner()
+    add_guest_activity(client, invitation_id, rsvps=0, messages=5)
+    receiver.fail_next = 100
+
+    query = {"status": {"$in": ["pending", "sending"]}}
+    deliver_until(client, server, lambda passes: not client.portal.call(server.db.notification_outbox.count_documents, query))
+    receiver.fail_next = 0
+
+    events = client.portal.call(lambda: server.db.notification_outbox.find({"status": "dead"}, {"_id": 0}).to_list(None))
+    assert (len(events), len(receiver.requests)) == (5, server.NOTIFY_MAX_ATTEMPTS)
+    for event in events:
+        assert event["attempts"] == server.NOTIFY_MAX_ATTEMPTS and "500" in event["last_error"], f"Dead letter lacks attempts/last error: {event}"
+    indexes = client.portal.call(server.db.notification_outbox.index_information)
+    assert any(index.get("expireAfterSeconds") == 0 and index["key"] == [("expires_at", 1)] for index in indexes.values()), \
+        "No TTL index on expires_at"
+    client.portal.call(server.db.notification_outbox.delete_many, {"status": "dead"})
+
+def test_per_owner_channels(client, server, receiver, setup_owner):
+    """Owners get only the channels they enabled; a retry doesn't resend on channels that succeeded"""
+    email = EmailRecorder()
+    original_senders = dict(server.notification_senders)
+    server.notification_senders["email"] = email
+    try:
+        webhook_only = setup_owner()
+        email_only = setup_owner(webhook=False, email=True)
+        both = setup_owner(email=True)
+        for invitation_id in (webhook_only, email_only, both):
+            add_guest_activity(client, invitation_id, rsvps=0, messages=5)
+
+        # Every owner's first webhook attempt fails, so only the owner with both channels retries
+        receiver.fail_next = 2
+        client.portal.call(server.deliver_due_digests)
+        assert len(email.sent) == 2, "Expected 2 email digests"
+
+        deliver_until(client, server, lambda passes: not client.portal.call(server.db.notification_outbox.count_documents, {}))
+    finally:
+        server.notification_senders.clear()
+        server.notification_senders.update(original_senders)
+
+    assert len(receiver.requests) == 4
+    assert {digest["events"][0]["invitation_id"] for _, digest in receiver.requests} == {webhook_only, both}
+    assert len(email.sent) == 2, "Email resent on retry"
+    assert {digest["events"][0]["invitation_id"] for _, digest in email.sent} == {email_only, both}
@@ -0,0 +1,109 @@
+"""
+Ownership Tests for Wedding Invitation App - Owner-Scoped RSVP/Message Mutations Focus
+Drives the backend in-process and checks:
+  - another user's RSVPs and messages cannot be changed or deleted (403), unknown ids are 404
+  - legacy RSVPs/messages without owner_id are backfilled lazily on the owner's first mutation,
+    and never on someone else's attempt
+  - `python jobs.py backfill-owners` backfills every legacy document
+
+Needs MongoDB at MONGO_URL (default mongodb://localhost:27017).
+
+Usage:
+    python -m pytest ownership_test.py
+"""
+
+import os
+import subprocess
+import sys
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).parent / "backend"
+
+@pytest.fixture(scope="module")
+def owner(register):
+    return register("owner")
+
+@pytest.fixture(scope="module")
+def other(register):
+    return register("other")
+
+@pytest.fixture(scope="module")
+def invitation_id(create_invitation, owner):
+    return create_invitation(owner)["id"]
+
+def insert_legacy_rows(tc, server, invitation_id, count=2):
+    """RSVPs and messages as stored before owner_id existed"""
+    now = datetime.now(timezone.utc).isoformat()
+    rsvps = [{"id": str(uuid.uuid4()), "invitation_id": invitation_id, "guest_name": f"Lama {i}", "phone": "",
+              "attendance": "hadir", "guest_count": 1, "created_at": now} for i in range(count)]
+    messages = [{"id": str(uuid.uuid4()), "invitation_id": invitation_id, "guest_name": f"Lama {i}",
+                 "message": "Selamat", "reply": "", "created_at": now} for i in range(count)]
+    tc.portal.call(server.db.rsvps.insert_many, rsvps)
+    tc.portal.call(server.db.messages.insert_many, messages)
+    return [r["id"] for r in rsvps], [m["id"] for m in messages]
+
+def missing_owner(tc, server, invitation_id):
+    query = {"invitation_id": invitation_id, "owner_id": {"$exists": False}}
+    return (tc.portal.call(server.db.rsvps.count_documents, query)
+            + tc.portal.call(server.db.messages.count_documents, query))
+
+def test_other_users_rejected(client, owner, other, invitation_id):
+    """Every RSVP/message mutation by another user is a 403 and changes nothing"""
+    rsvp = client.post(f"/api/public/rsvp/{invitation_id}", json={
+        "guest_name": "Budi", "phone": "0811", "attendance": "hadir", "guest_count": 2
+    }).json()
+    message = client.post(f"/api/public/messages/{invitation_id}", json={"guest_name": "Budi", "message": "Selamat"}).json()
+
+    attempts = [
+        ("delete rsvp", client.delete(f"/api/rsvps/{rsvp['id']}", headers=other)),
+        ("reply", client.put(f"/api/messages/{message['id']}/reply", json={"reply": "Hai"}, headers=other)),
+        ("moderate", client.put(f"/api/messages/{message['id']}/moderation", json={"status": "held"}, headers=other)),
+        ("delete message", client.delete(f"/api/messages/{message['id']}", headers=other)),
+    ]
+    for name, response in attempts:
+        assert response.status_code == 403, f"Other user {name}"
+
+    for name, response in (("rsvp", client.delete(f"/api/rsvps/{uuid.uuid4()}", headers=owner)),
+                           ("message", client.delete(f"/api/messages/{uuid.uuid4()}", headers=owner))):
+        assert response.status_code == 404, f"Unknown {name} id"
+
+    messages = client.get(f"/api/invitations/{invitation_id}/messages", headers=owner).json()
+    rsvps = client.get(f"/api/invitations/{invitation_id}/rsvps", headers=owner).json()
+    assert len(rsvps) == 1 and not messages[0]["reply"] and messages[0]["status"] == "approved", \
+        "A rejected mutation changed the owner's data"
+
+def test_lazy_backfill(client, server, owner, other, invitation_id):
+    """Legacy rows stay untouched on another user's attempt and are backfilled by the owner's"""
+    rsvp_ids, message_ids = insert_legacy_rows(client, server, invitation_id)
+
+    response = client.put(f"/api/messages/{message_ids[0]}/reply", json={"reply": "Hai"}, headers=other)
+    assert response.status_code == 403
+    assert missing_owner(client, server, invitation_id) == 4, "Another user's attempt backfilled legacy rows"
+
+    response = client.put(f"/api/messages/{message_ids[0]}/reply", json={"reply": "Terima kasih"}, headers=owner)
+    assert response.status_code == 200 and response.json()["reply"] == "Terima kasih", \
+        f"Owner reply on a legacy message HTTP {response.status_code}: {response.text}"
+    response = client.delete(f"/api/rsvps/{rsvp_ids[0]}", headers=owner)
+    assert response.status_code == 200, f"Owner delete of a legacy RSVP HTTP {response.status_code}: {response.text}"
+    assert not missing_owner(client, server, invitation_id), "Legacy rows still without owner_id"
+
+def test_backfill_job(client, server, create_invitation, owner, invitation_id):
+    """jobs.py backfill-owners stores owner_id on every legacy RSVP and message"""
+    insert_legacy_rows(client, server, invitation_id, count=3)
+    other_invitation = create_invitation(owner)["id"]
+    insert_legacy_rows(client, server, other_invitation, count=2)
+
+    completed = subprocess.run(
+        [sys.executable, "jobs.py", "backfill-owners"],
+        cwd=BACKEND_DIR, env=os.environ.copy(), capture_output=True, text=True, timeout=120
+    )
+    assert completed.returncode == 0, f"Job exited {completed.returncode}: {completed.stderr[-300:]}"
+    assert "Backfilled owner_id on 10 document(s)" in completed.stdout
+    assert not missing_owner(client, server, invitation_id) + missing_owner(client, server, other_invitation)
+
+    owner_id = client.get("/api/auth/me", headers=owner).json()["id"]
+    assert client.portal.call(server.db.messages.distinct, "owner_id", {"invitation_id": other_invitation}) == [owner_id]
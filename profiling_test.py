@@ -0,0 +1,80 @@
+"""
+Request Profiling Tests for Wedding Invitation App - Admin Opt-In Profiler Focus
+Drives the backend in-process and checks:
+  - only admins (ADMIN_EMAILS) can get a profiling token or read profiles
+  - a request carrying the token is profiled: phase breakdown, Mongo time and downloadable stacks
+  - requests without a valid token are not profiled while the sample rate is 0
+  - with a sample rate set, requests are profiled without any header
+
+Needs MongoDB at MONGO_URL (default mongodb://localhost:27017).
+
+Usage:
+    python -m pytest profiling_test.py
+"""
+
+import uuid
+
+import pytest
+
+ADMIN_EMAIL = f"admin_{uuid.uuid4().hex[:8]}@example.com"
+
+@pytest.fixture(scope="module")
+def backend_env():
+    return {"ADMIN_EMAILS": ADMIN_EMAIL, "PROFILING_SAMPLE_RATE": "0"}
+
+@pytest.fixture(scope="module")
+def admin(register):
+    return register("admin", email=ADMIN_EMAIL)
+
+@pytest.fixture(scope="module")
+def owner(register):
+    return register("owner")
+
+def test_admin_only(client, admin, owner):
+    """Tokens and profiles are admin-only"""
+    for method, url in (("post", "/api/admin/profiling/token"), ("get", "/api/admin/profiling")):
+        assert getattr(client, method)(url, headers=owner).status_code == 403, f"Non-admin {method.upper()} {url}"
+    response = client.post("/api/admin/profiling/token", headers=admin)
+    assert response.status_code == 200 and response.json()["header"] == "X-Profile-Token", \
+        f"Admin token HTTP {response.status_code}: {response.text}"
+
+def test_token_profiles_request(client, admin, owner):
+    """A request with the token gets a profile id; the profile has phases, Mongo time and stacks"""
+    token = client.post("/api/admin/profiling/token", headers=admin).json()
+    couple = {"name": "A", "full_name": "A B", "father_name": "F", "mother_name": "M", "child_order": "1"}
+    template_id = client.post("/api/templates", json={"name": "Paket", "data": {
+        "bride": couple,
+        "events": [{"name": "Akad", "date": "2030-01-01", "time_start": "08:00", "time_end": "10:00",
+                    "venue_name": "Masjid", "address": "Jakarta"}]
+    }}, headers=owner).json()["id"]
+    rows = [{"groom": {**couple, "name": f"Pria{i}"}} for i in range(300)]
+
+    response = client.post(f"/api/templates/{template_id}/invitations", json={"rows": rows},
+                           headers={**owner, token["header"]: token["token"]})
+    profile_id = response.headers.get("X-Profile-Id")
+    assert response.status_code == 200 and profile_id, f"Profiled request HTTP {response.status_code}, profile id {profile_id}"
+
+    plain = client.get("/api/invitations", headers=owner)
+    forged = client.get("/api/invitations", headers={**owner, "X-Profile-Token": "not-a-token"})
+    assert "X-Profile-Id" not in plain.headers and "X-Profile-Id" not in forged.headers, "Request without a valid token was profiled"
+
+    profile = client.get(f"/api/admin/profiling/{profile_id}", headers=admin).json()
+    assert profile["route"] == "/api/templates/{template_id}/invitations"
+    assert profile["mongo_ops"] >= 1
+    assert profile["samples"] and profile["stacks"] and "awaiting" in profile["phases"], f"Profile has no samples or phases: {profile['phases']}"
+
+    folded = client.get(f"/api/admin/profiling/{profile_id}?format=folded", headers=admin)
+    assert "attachment" in folded.headers.get("content-disposition", "")
+    assert "bulk_create_invitations" in folded.text, "Folded stacks download missing the route handler"
+
+def test_sample_rate(client, admin, owner):
+    """With a sample rate of 1 every request is profiled, back to none at 0"""
+    response = client.put("/api/admin/profiling", json={"sample_rate": 1}, headers=admin)
+    assert response.status_code == 200, f"Set sample rate HTTP {response.status_code}: {response.text}"
+    sampled = client.get("/api/invitations", headers=owner)
+    client.put("/api/admin/profiling", json={"sample_rate": 0}, headers=admin)
+    after = client.get("/api/invitations", headers=owner)
+
+    assert "X-Profile-Id" in sampled.headers and "X-Profile-Id" not in after.headers, "Sample rate not applied"
+    profiles = client.get("/api/admin/profiling", headers=admin).json()["profiles"]
+    assert profiles[0]["trigger"] == "sample"
@@ -0,0 +1,188 @@
+"""
+Read Routing Tests for Wedding Invitation App - Replica Set Focus
+Starts a local replica set (3 mongod nodes, or REPLICA_SET_NODES; `mongod` must be on PATH),
+points the backend at it and checks which member each query is routed to:
+  - public guest reads (invitation payload, guestbook, theme stylesheets) -> secondary
+  - owner dashboard reads right after their own writes -> primary
+
+Skipped when mongod is not on PATH.
+
+Usage:
+    python -m pytest replica_set_test.py                        # three-node replica set
+    REPLICA_SET_NODES=1 python -m pytest replica_set_test.py    # single-node replica set
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import pytest
+from pymongo import MongoClient, monitoring
+
+BASE_PORT = 27217
+REPLSET_NAME = "rs-undanganku-test"
+NODE_COUNT = int(os.environ.get("REPLICA_SET_NODES", "3"))
+
+class CommandRecorder(monitoring.CommandListener):
+    """Records (command, collection, server address) for every command the backend sends"""
+
+    def __init__(self):
+        self.commands = []
+        self.recording = True
+
+    def started(self, event):
+        if self.recording:
+            collection = event.command.get(event.command_name)
+            self.commands.append((event.command_name, collection, event.connection_id))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def clear(self):
+        self.commands = []
+
+    def servers_for(self, command_name, collection):
+        return {address for name, coll, address in self.commands if name == command_name and coll == collection}
+
+def start_replica_set(node_count):
+    """Start mongod processes and initiate the replica set, returns (processes, data_dir, members)"""
+    data_dir = tempfile.mkdtemp(prefix="undanganku-rs-")
+    processes = []
+    members = []
+    for i in range(node_count):
+        port = BASE_PORT + i
+        db_path = Path(data_dir) / f"node{i}"
+        db_path.mkdir()
+        processes.append(subprocess.Popen(
+            ["mongod", "--replSet", REPLSET_NAME, "--port", str(port), "--dbpath", str(db_path),
+             "--bind_ip", "127.0.0.1", "--quiet"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        ))
+        members.append(f"127.0.0.1:{port}")
+
+    # Wait for the first node, then initiate with it as the preferred primary
+    seed = MongoClient(members[0], directConnection=True, serverSelectionTimeoutMS=30000)
+    seed.admin.command("ping")
+    seed.admin.command("replSetInitiate", {
+        "_id": REPLSET_NAME,
+        "members": [
+            {"_id": i, "host": host, "priority": 2 if i == 0 else 1}
+            for i, host in enumerate(members)
+        ]
+    })
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        status = seed.admin.command("replSetGetStatus")
+        states = [m["stateStr"] for m in status["members"]]
+        if states.count("PRIMARY") == 1 and states.count("SECONDARY") == node_count - 1:
+            break
+        time.sleep(0.5)
+    else:
+        raise RuntimeError(f"Replica set did not become ready: {states}")
+    seed.close()
+
+    return processes, data_dir, members
+
+def stop_replica_set(processes, data_dir):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    shutil.rmtree(data_dir, ignore_errors=True)
+
+def wait_for_replication(members, db_name, collection, query):
+    """Block until every secondary has the document, so secondary reads can hit"""
+    deadline = time.time() + 30
+    for host in members:
+        node = MongoClient(host, directConnection=True, readPreference="secondaryPreferred")
+        while node[db_name][collection].find_one(query) is None:
+            if time.time() > deadline:
+                raise RuntimeError(f"{host} did not replicate {collection} {query}")
+            time.sleep(0.1)
+        node.close()
+
+@pytest.fixture(scope="module")
+def members():
+    if not shutil.which("mongod"):
+        pytest.skip("mongod not found on PATH")
+    processes, data_dir, members = start_replica_set(NODE_COUNT)
+    yield members
+    stop_replica_set(processes, data_dir)
+
+@pytest.fixture(scope="module")
+def recorder():
+    recorder = CommandRecorder()
+    # Listeners registered globally apply to clients created afterwards (the backend's client)
+    monitoring.register(recorder)
+    yield recorder
+    # pymongo has no unregister, so stop recording the clients of later modules
+    recorder.recording = False
+    recorder.clear()
+
+@pytest.fixture(scope="module")
+def backend_env(members, recorder):
+    return {
+        "MONGO_URL": f"mongodb://{','.join(members)}/?replicaSet={REPLSET_NAME}",
+        "MONGO_PUBLIC_READ_PREFERENCE": "secondaryPreferred",
+    }
+
+@pytest.fixture(scope="module")
+def primary(members):
+    client = MongoClient(members[0], directConnection=True)
+    primary = client.admin.command("hello")["primary"]
+    client.close()
+    host, port = primary.split(":")
+    return (host, int(port))
+
+@pytest.fixture(scope="module")
+def owner(register):
+    return register("rs")
+
+@pytest.fixture(scope="module")
+def invitation_id(client, server, members, create_invitation, owner):
+    """An invitation with a guestbook message, replicated to every member"""
+    invitation_id = create_invitation(owner)["id"]
+    client.post(f"/api/public/messages/{invitation_id}", json={"guest_name": "Tamu", "message": "Selamat"})
+    wait_for_replication(members, server.db_name, "public_payloads", {"key": f"messages:{invitation_id}"})
+    wait_for_replication(members, server.db_name, "public_payloads", {"key": f"invitation:{invitation_id}"})
+    return invitation_id
+
+def test_public_reads_use_secondary(client, recorder, primary, invitation_id):
+    """Public invitation, guestbook and stylesheet reads are routed to a secondary"""
+    recorder.clear()
+    payload = client.get(f"/api/public/invitation/{invitation_id}").json()
+    client.get(f"/api/public/messages/{invitation_id}")
+    client.get(payload["theme_css_url"])
+
+    servers = recorder.servers_for("find", "public_payloads") | recorder.servers_for("find", "theme_stylesheets")
+    assert servers, "No public reads were recorded"
+    if NODE_COUNT == 1:
+        # secondaryPreferred falls back to the only member
+        assert servers == {primary}
+    else:
+        assert primary not in servers, f"Public reads hit the primary {primary}: {servers}"
+
+def test_owner_reads_stay_on_primary(client, recorder, primary, owner, invitation_id):
+    """Owner reads immediately after a write see that write (primary reads)"""
+    invitation = client.get(f"/api/invitations/{invitation_id}", headers=owner).json()
+    invitation["opening_text"] = f"Updated {uuid.uuid4().hex[:6]}"
+
+    recorder.clear()
+    client.put(f"/api/invitations/{invitation_id}", json=invitation, headers=owner)
+    updated = client.get(f"/api/invitations/{invitation_id}", headers=owner).json()
+    client.get(f"/api/invitations/{invitation_id}/messages", headers=owner)
+
+    assert updated["opening_text"] == invitation["opening_text"], "Owner did not read their own write"
+    assert recorder.servers_for("find", "invitations") | recorder.servers_for("find", "messages") == {primary}, \
+        "Owner reads left the primary"
@@ -0,0 +1,122 @@
+"""
+Upload Storage Tests for Wedding Invitation App - S3 Direct Upload Focus
+Starts an in-process S3 mock (moto server), points the backend at it and checks:
+  - S3Storage save/size/read/delete against the bucket
+  - presigned POST uploads straight to the bucket, then /upload/complete records them
+  - images uploaded directly are resized into variants and the raw original removed
+
+Needs MongoDB at MONGO_URL (default mongodb://localhost:27017) for the API steps.
+
+Usage:
+    python -m pytest storage_test.py
+"""
+
+import io
+import os
+import uuid
+
+import boto3
+import pytest
+import requests
+from moto.server import ThreadedMotoServer
+from PIL import Image
+
+MOTO_PORT = 5055
+S3_ENDPOINT = f"http://127.0.0.1:{MOTO_PORT}"
+BUCKET = "undanganku-storage-test"
+
+@pytest.fixture(scope="module")
+def s3():
+    """Client for the moto S3 server, with the test bucket created"""
+    moto = ThreadedMotoServer(ip_address="127.0.0.1", port=MOTO_PORT, verbose=False)
+    moto.start()
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("AWS_ACCESS_KEY_ID", os.environ.get("AWS_ACCESS_KEY_ID", "testing"))
+        patch.setenv("AWS_SECRET_ACCESS_KEY", os.environ.get("AWS_SECRET_ACCESS_KEY", "testing"))
+        s3 = boto3.client("s3", endpoint_url=S3_ENDPOINT, region_name="us-east-1")
+        s3.create_bucket(Bucket=BUCKET)
+        yield s3
+    moto.stop()
+
+@pytest.fixture(scope="module")
+def backend_env(s3):
+    return {
+        "STORAGE_BACKEND": "s3",
+        "S3_BUCKET": BUCKET,
+        "S3_ENDPOINT_URL": S3_ENDPOINT,
+        "S3_REGION": "us-east-1",
+    }
+
+@pytest.fixture(scope="module")
+def owner(register):
+    return register("storage")
+
+def jpeg_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (800, 600), (200, 120, 80)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+def presign(tc, headers, kind, filename, content_type):
+    response = tc.post("/api/upload/presign", json={"kind": kind, "filename": filename, "content_type": content_type},
+                       headers=headers)
+    assert response.status_code == 200, f"Presign HTTP {response.status_code}: {response.text}"
+    return response.json()
+
+def test_storage_roundtrip(client, server):
+    """S3Storage saves, sizes, reads and deletes objects in the bucket"""
+    async def roundtrip():
+        key = f"music/roundtrip-{uuid.uuid4().hex[:6]}.mp3"
+        url = await server.storage.save(key, io.BytesIO(b"ID3 test audio"), "audio/mpeg")
+        size = await server.storage.size(key)
+        body = await server.storage.read(key)
+        await server.storage.delete(key)
+        return url, size, body, await server.storage.size(key)
+
+    url, size, body, size_after_delete = client.portal.call(roundtrip)
+    assert url.startswith(f"{S3_ENDPOINT}/{BUCKET}/music/"), f"Unexpected public URL: {url}"
+    assert (size, body) == (14, b"ID3 test audio")
+    assert size_after_delete is None, "Object still exists after delete"
+
+def test_presigned_music_upload(client, register, owner, s3):
+    """Music goes browser -> bucket via presigned POST, the API only records it"""
+    presigned = presign(client, owner, "music", "lagu.mp3", "audio/mpeg")
+    upload = requests.post(
+        presigned["upload_url"], data=presigned["fields"],
+        files={"file": ("lagu.mp3", b"ID3 direct upload", "audio/mpeg")}, timeout=10
+    )
+    assert upload.status_code in (200, 201, 204), f"Direct upload HTTP {upload.status_code}: {upload.text}"
+
+    # Another user must not be able to claim this key
+    complete = {"kind": "music", "key": presigned["key"], "filename": "lagu.mp3"}
+    assert client.post("/api/upload/complete", json=complete, headers=register("other")).status_code == 403
+
+    response = client.post("/api/upload/complete", json=complete, headers=owner)
+    assert response.status_code == 200, f"Complete HTTP {response.status_code}: {response.text}"
+    assert response.json()["url"] == presigned["url"]
+
+    stored = s3.get_object(Bucket=BUCKET, Key=presigned["key"])
+    assert stored["Body"].read() == b"ID3 direct upload" and stored["ContentType"] == "audio/mpeg", \
+        "Uploaded object does not match what the browser sent"
+
+def test_presigned_image_upload(client, owner, s3):
+    """Directly uploaded images are processed into variants and the raw original removed"""
+    presigned = presign(client, owner, "image", "foto.jpg", "image/jpeg")
+    requests.post(
+        presigned["upload_url"], data=presigned["fields"],
+        files={"file": ("foto.jpg", jpeg_bytes(), "image/jpeg")}, timeout=10
+    )
+
+    response = client.post("/api/upload/complete", json={
+        "kind": "image", "key": presigned["key"], "filename": "foto.jpg"
+    }, headers=owner)
+    assert response.status_code == 200, f"Complete HTTP {response.status_code}: {response.text}"
+    data = response.json()
+
+    assert data["variants"] and all(v["url"].startswith(f"{S3_ENDPOINT}/{BUCKET}/images/") for v in data["variants"]), \
+        f"Variants not stored in the bucket: {data['variants']}"
+    assert data["width"] == 800, "Largest variant not capped at the source width"
+
+    head = s3.head_object(Bucket=BUCKET, Key=data["url"].split(f"/{BUCKET}/", 1)[1])
+    assert "immutable" in head.get("CacheControl", ""), f"Variant missing immutable Cache-Control: {head.get('CacheControl')}"
+    assert not s3.list_objects_v2(Bucket=BUCKET, Prefix=presigned["key"]).get("KeyCount", 0), \
+        "Raw original (with EXIF) was not removed from incoming/"
@@ -0,0 +1,102 @@
+"""
+View Analytics Tests for Wedding Invitation App - Page Views & Unique Visitors Focus
+Checks the in-memory view tracking and its flush to MongoDB:
+  - HyperLogLog unique-visitor estimates stay within 3 standard errors (~5%) up to 1M visitors
+  - sketches survive serialization and merge into the union of their visitors
+  - public invitation views are counted in memory and written with one bulk_write per flush
+  - the owner dashboard reports views and unique visitors per day
+
+Needs MongoDB at MONGO_URL (default mongodb://localhost:27017).
+
+Usage:
+    python -m pytest view_analytics_test.py
+"""
+
+import pytest
+
+@pytest.fixture(scope="module")
+def backend_env():
+    # The tests flush explicitly
+    return {"VIEW_FLUSH_SECONDS": "3600", "VIEW_FLUSH_CHUNK": "2"}
+
+def test_hll_accuracy(server):
+    """Estimates within 3 standard errors of the true count across cardinalities"""
+    std_error = 1.04 / (1 << server.VIEW_HLL_PRECISION) ** 0.5
+    for count in (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000):
+        sketch = server.HyperLogLog()
+        for i in range(count):
+            sketch.add(f"visitor-{count}-{i}".encode())
+        error = abs(sketch.estimate() - count) / count
+        assert error <= 3 * std_error, f"{count} visitors estimated as {sketch.estimate()} ({error:.1%} off)"
+
+        # Re-adding the same visitors must not change anything
+        if count <= 10_000:
+            before = sketch.estimate()
+            for i in range(count):
+                sketch.add(f"visitor-{count}-{i}".encode())
+            assert sketch.estimate() == before, f"Repeat visitors changed the estimate at {count}"
+
+def test_hll_merge_and_serialization(server):
+    """Serialized sketches round-trip; merged sketches estimate the union"""
+    sparse, dense_a, dense_b = server.HyperLogLog(), server.HyperLogLog(), server.HyperLogLog()
+    for i in range(20):
+        sparse.add(f"s-{i}".encode())
+    for i in range(60_000):
+        dense_a.add(f"u-{i}".encode())
+    for i in range(40_000, 100_000):
+        dense_b.add(f"u-{i}".encode())
+
+    for sketch in (sparse, dense_a):
+        assert server.HyperLogLog.from_bytes(sketch.to_bytes()).estimate() == sketch.estimate(), \
+            "Serialized sketch estimates differently"
+    assert len(sparse.to_bytes()) <= 100, f"Sparse sketch serialized to {len(sparse.to_bytes())} bytes"
+
+    dense_a.merge(dense_b)
+    dense_a.merge(sparse)
+    assert abs(dense_a.estimate() - 100_020) / 100_020 <= 0.05, f"Union of 100,020 visitors estimated as {dense_a.estimate()}"
+
+def test_views_dashboard(client, server, register, create_invitation):
+    """Views are counted in memory, flushed in one bulk write and reported per day"""
+    headers = register("views")
+    invitation_id = create_invitation(headers)["id"]
+
+    # 40 guests, each opening the invitation 3 times
+    for round_ in range(3):
+        for guest in range(40):
+            client.get(f"/api/public/invitation/{invitation_id}", headers={"X-Forwarded-For": f"10.1.0.{guest}"})
+
+    assert not client.portal.call(server.db.invitation_views.count_documents, {"invitation_id": invitation_id}), \
+        "Views were written before the flush"
+    assert client.portal.call(server.flush_view_counters) == 1, "Expected one upsert for one invitation-day"
+    assert client.portal.call(server.flush_view_counters) == 0, "Second flush with no new views wrote again"
+
+    # More views after the first flush accumulate into the same document
+    client.get(f"/api/public/invitation/{invitation_id}", headers={"X-Forwarded-For": "10.2.0.1"})
+    client.portal.call(server.flush_view_counters)
+
+    stats = client.get(f"/api/invitations/{invitation_id}/views", headers=headers).json()
+    assert (stats["total_views"], stats["unique_visitors"]) == (121, 41)
+    assert len(stats["points"]) == 1 and stats["points"][0]["views"] == 121, f"Unexpected daily points: {stats['points']}"
+
+def test_chunked_flush(client, server):
+    """Many invitation-days flush in chunks; views recorded mid-flush go out with the next one"""
+    days = [(f"chunk-{i}", "2030-01-0" + str(1 + i % 2)) for i in range(5)]
+    for invitation_id, day in days:
+        server.view_tracker.record(invitation_id, invitation_id.encode(), day=day)
+
+    # A view landing while the first chunk is being serialized in the worker thread
+    original_build = server.ViewTracker.build_updates
+    def build_then_record(pending):
+        server.view_tracker.entries[days[0]][0] += 1
+        server.ViewTracker.build_updates = staticmethod(original_build)
+        return original_build(pending)
+    server.ViewTracker.build_updates = staticmethod(build_then_record)
+    try:
+        written = client.portal.call(server.flush_view_counters)
+    finally:
+        server.ViewTracker.build_updates = staticmethod(original_build)
+    assert written == len(days), f"Expected {len(days)} upserts over 3 chunks"
+    assert client.portal.call(server.flush_view_counters) == 1, "View recorded during the flush was not left pending"
+
+    assert client.portal.call(server.db.invitation_views.count_documents, {"invitation_id": {"$regex": "^chunk-"}}) == len(days)
+    assert client.portal.call(server.db.invitation_views.find_one, {"invitation_id": days[0][0]})["views"] == 2